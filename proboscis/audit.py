@@ -0,0 +1,278 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Finds tests which depend on each other without saying so.
+
+Running with "--audit" (or "--audit=N" for N shuffled runs) runs the plan
+several times, each in a process forked from this one so every run starts
+from the same state: once in the usual order, then in N random orders which
+still honor every declared dependency, and then each case by itself with
+only the cases it critically depends on.
+
+Cases which pass in some runs but fail in others are reported, along with
+the cases which always ran before them when they passed (which they may
+need) and those which always ran before them when they failed (which may be
+interfering with them). The cases which behaved the same every time are
+saved in .proboscis/audit.json as safe to run in parallel.
+
+"""
+
+import os
+import random
+import sys
+import time
+import traceback
+
+from proboscis.case import CaseObserver
+from proboscis.case import ERROR
+from proboscis.case import FAIL
+from proboscis.case import PASS
+from proboscis.case import RETRY
+from proboscis.case import SKIP
+from proboscis.case import worst_outcome
+from proboscis.fixtures import activate
+from proboscis.fixtures import FixtureManager
+from proboscis.parallel import BatchRunner
+from proboscis.parallel import LocalExecutor
+from proboscis.sorting import critical_prerequisites
+from proboscis.sorting import prerequisite_closure
+from proboscis.sorting import sort_cases
+from proboscis.storage import load_json
+from proboscis.storage import save_json
+from proboscis.storage import state_path
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+def call_in_child(func):
+    """Calls func in a forked process and returns what it returned.
+
+    Output from the child is discarded. Returns None if func raised.
+
+    """
+    reader, writer = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(reader)
+            null = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(null, 1)
+            os.dup2(null, 2)
+            result = None
+            try:
+                result = func()
+            except Exception:
+                traceback.print_exc()
+            output = os.fdopen(writer, 'wb')
+            pickle.dump(result, output, pickle.HIGHEST_PROTOCOL)
+            output.close()
+        finally:
+            os._exit(0)
+    os.close(writer)
+    source = os.fdopen(reader, 'rb')
+    try:
+        data = source.read()
+    finally:
+        source.close()
+        os.waitpid(pid, 0)
+    if not data:
+        return None
+    return pickle.loads(data)
+
+
+class OutcomeRecorder(CaseObserver):
+    """Notes the outcome of each case and the order they ran in."""
+
+    def __init__(self):
+        self.outcomes = {}
+        self.order = []
+
+    def case_finished(self, case, outcome, duration):
+        identity = case.identity
+        if identity is None or outcome == RETRY:
+            return
+        if identity in self.outcomes:
+            self.outcomes[identity] = worst_outcome(self.outcomes[identity],
+                                                    outcome)
+        else:
+            self.order.append(identity)
+            self.outcomes[identity] = outcome
+
+
+class AuditRun(object):
+    """The cases included in one run, the order they ran and their outcomes.
+
+    Cases which were included but never reported were skipped because
+    something they depend on failed.
+
+    """
+
+    def __init__(self, label, included, order, outcomes):
+        self.label = label
+        self.included = included
+        self.positions = dict((identity, index)
+                              for index, identity in enumerate(order))
+        self.outcomes = outcomes
+
+    def outcome(self, identity):
+        if identity not in self.included:
+            return None
+        return self.outcomes.get(identity, SKIP)
+
+    def ran_before(self, first, second):
+        return first in self.positions and \
+            self.positions[first] < self.positions.get(second, -1)
+
+
+class IsolationAudit(object):
+    """Runs a plan in several orders and subsets to compare the outcomes."""
+
+    def __init__(self, plan, loader=None, runs=3, seed=None, isolated=True,
+                 stream=None, path=None):
+        self.plan = plan
+        self.loader = loader
+        self.runs = runs
+        if seed is None:
+            seed = int(time.time())
+        self.seed = seed
+        self.isolated = isolated
+        self.stream = stream or sys.stdout
+        self.path = path or state_path("audit.json")
+        self.results = []
+        self.unstable = {}
+        self.safe = []
+
+    @staticmethod
+    def is_supported():
+        return hasattr(os, 'fork')
+
+    def run_cases(self, label, cases):
+        """Runs cases in a forked process and records an AuditRun."""
+        def run():
+            recorder = OutcomeRecorder()
+            fixtures = FixtureManager(cases)
+            activate(fixtures)
+            observers = [recorder, fixtures]
+            executor = LocalExecutor(cases, self.loader, observers)
+            try:
+                BatchRunner(cases, executor, stream=open(os.devnull, 'w'),
+                            observers=observers).run()
+            finally:
+                fixtures.run_finished()
+            return recorder.order, recorder.outcomes
+        result = call_in_child(run) or ([], {})
+        included = set(case.identity for case in cases
+                       if case.identity is not None)
+        self.results.append(AuditRun(label, included, *result))
+
+    def collect(self):
+        """Does every run the audit calls for."""
+        rng = random.Random(self.seed)
+        self.run_cases("plan order", self.plan.tests)
+        for number in range(self.runs):
+            cases = sort_cases(self.plan.tests, lambda case: rng.random())
+            self.run_cases("random order %d" % (number + 1), cases)
+        if self.isolated:
+            prerequisites = critical_prerequisites(self.plan.tests)
+            for case in self.plan.tests:
+                if case.identity is None:
+                    continue
+                members = prerequisite_closure([case], prerequisites)
+                self.run_cases("%s alone" % case.identity,
+                               [member for member in self.plan.tests
+                                if member in members])
+
+    def analyze(self):
+        """Finds the cases whose outcome changed and suspects for each."""
+        prerequisites = critical_prerequisites(self.plan.tests)
+        identities = [case.identity for case in self.plan.tests
+                      if case.identity is not None]
+        self.unstable = {}
+        self.safe = []
+        for case in self.plan.tests:
+            identity = case.identity
+            if identity is None:
+                continue
+            outcomes = [(run, run.outcome(identity)) for run in self.results]
+            passed = [run for run, outcome in outcomes if outcome == PASS]
+            failed = [run for run, outcome in outcomes
+                      if outcome in (FAIL, ERROR)]
+            if not passed or not failed:
+                self.safe.append(identity)
+                continue
+            declared = set(member.identity for member
+                           in prerequisite_closure([case], prerequisites))
+            needs = []
+            interferes = []
+            for other in identities:
+                if other in declared:
+                    continue
+                before_passes = [run.ran_before(other, identity)
+                                 for run in passed]
+                before_failures = [run.ran_before(other, identity)
+                                   for run in failed]
+                if all(before_passes) and not all(before_failures):
+                    needs.append(other)
+                if all(before_failures) and not all(before_passes):
+                    interferes.append(other)
+            self.unstable[identity] = {
+                "passed": [run.label for run in passed],
+                "failed": [run.label for run in failed],
+                "needs": needs,
+                "interferes": interferes,
+            }
+
+    def save(self):
+        data = load_json(self.path, {})
+        data.update({"seed": self.seed, "unstable": self.unstable,
+                     "safe": self.safe})
+        save_json(self.path, data)
+
+    def report(self):
+        write = self.stream.write
+        write("Isolation audit: %d runs, seed %d\n"
+              % (len(self.results), self.seed))
+        for identity in sorted(self.unstable):
+            details = self.unstable[identity]
+            write("\n%s passed in %d runs and failed in %d (such as %s).\n"
+                  % (identity, len(details["passed"]),
+                     len(details["failed"]), details["failed"][0]))
+            if details["needs"]:
+                write("    Passed only when these ran first:\n")
+                for other in details["needs"]:
+                    write("        %s\n" % other)
+            if details["interferes"]:
+                write("    Failed only when these ran first:\n")
+                for other in details["interferes"]:
+                    write("        %s\n" % other)
+        write("\n%d of %d cases behaved the same in every run and are safe "
+              "to run in parallel.\n"
+              % (len(self.safe), len(self.safe) + len(self.unstable)))
+        self.stream.flush()
+
+    def run(self):
+        """Audits the plan. Returns True if no case changed outcome."""
+        if not self.is_supported():
+            raise RuntimeError("The isolation audit requires os.fork.")
+        self.collect()
+        self.analyze()
+        self.save()
+        self.report()
+        return not self.unstable
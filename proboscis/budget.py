@@ -0,0 +1,173 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Fits a run into a time budget, such as "--time-budget=30m".
+
+Each case's duration is estimated from the results history and its value
+comes from its priority, with recent failures and changed source worth more.
+The plan is cut down to the cases giving the most value per second, always
+along with the cases they critically depend on. If the run still reaches the
+deadline it stops before starting another test. Either way the tests left
+out are reported at the end.
+
+"""
+
+import re
+import sys
+import time
+
+from proboscis.case import CaseObserver
+from proboscis.case import ERROR
+from proboscis.case import FAIL
+from proboscis.case import PASS
+from proboscis.history import RECENT_RUNS
+from proboscis.sorting import add_class_teardowns
+from proboscis.sorting import critical_prerequisites
+from proboscis.sorting import prerequisite_closure
+
+
+# Estimates are never below this, so free looking cases still cost something.
+MINIMUM_DURATION = 0.001
+
+# Used for cases with no history when no other case has any either.
+DEFAULT_DURATION = 1.0
+
+_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "": 1.0}
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)([hms]?)")
+
+
+def parse_duration(text):
+    """Reads a duration such as "90", "45s", "30m" or "1h30m" as seconds."""
+    parts = _DURATION.findall(text)
+    if not parts or "".join(number + unit for number, unit in parts) \
+       != text.strip():
+        raise ValueError("Can't read %r as a duration; try 90s, 30m or 1h."
+                         % text)
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    if minutes:
+        return "%dm%02ds" % (minutes, seconds)
+    return "%ds" % seconds
+
+
+class TimeBudget(CaseObserver):
+    """Chooses what to run within a budget and stops at the deadline.
+
+    The clock starts when this is created.
+
+    """
+
+    def __init__(self, seconds, history, stream=None):
+        self.seconds = seconds
+        self.history = history
+        self.stream = stream or sys.stdout
+        self.started = time.time()
+        self.left_out = []
+        self.planned = []
+        self.finished = set()
+        self.stopped = False
+
+    def estimate(self, case):
+        """Returns the mean duration of a case in recent runs, or None."""
+        durations = [record["duration"] for record
+                     in self.history.records(case.identity)[-RECENT_RUNS:]
+                     if record["outcome"] in (PASS, FAIL, ERROR)]
+        if not durations:
+            return None
+        return max(sum(durations) / len(durations), MINIMUM_DURATION)
+
+    def value(self, case):
+        """Returns how much running a case is worth."""
+        value = 2.0 ** case.entry.info.priority
+        age = self.history.runs_since_failure(case.identity)
+        if age is not None and age < RECENT_RUNS:
+            value *= 4
+        if self.history.source_changed(case):
+            value *= 2
+        return value
+
+    def select(self, plan):
+        """Cuts plan down to the most valuable cases fitting the budget."""
+        costs = {}
+        unknown = []
+        for case in plan.tests:
+            if case.identity is None:
+                costs[case] = 0.0
+            else:
+                costs[case] = self.estimate(case)
+                if costs[case] is None:
+                    unknown.append(case)
+        known = sorted(cost for cost in costs.values() if cost)
+        default = known and known[len(known) // 2] or DEFAULT_DURATION
+        for case in unknown:
+            costs[case] = default
+
+        prerequisites = critical_prerequisites(plan.tests)
+        candidates = []
+        for position, case in enumerate(plan.tests):
+            if case.identity is None:
+                continue
+            members = prerequisite_closure([case], prerequisites)
+            cost = sum(costs[member] for member in members)
+            candidates.append((-self.value(case) / cost, position, members))
+        candidates.sort(key=lambda candidate: candidate[:2])
+
+        chosen = set()
+        spent = 0.0
+        for ratio, position, members in candidates:
+            extra = sum(costs[member] for member in members
+                        if member not in chosen)
+            if spent + extra <= self.seconds:
+                chosen.update(members)
+                spent += extra
+        add_class_teardowns(plan.tests, chosen)
+        self.left_out = [case for case in plan.tests
+                         if case not in chosen and case.identity is not None]
+        plan.tests = [case for case in plan.tests
+                      if case in chosen or case.identity is None]
+        self.planned = [case for case in plan.tests
+                        if case.identity is not None]
+
+    def should_stop(self):
+        if not self.stopped and time.time() - self.started >= self.seconds:
+            self.stopped = True
+        return self.stopped
+
+    def case_finished(self, case, outcome, duration):
+        self.finished.add(case)
+
+    def run_finished(self):
+        """Reports the tests which didn't run because of the budget."""
+        not_reached = []
+        if self.stopped:
+            not_reached = [case for case in self.planned
+                           if case not in self.finished]
+        if not self.left_out and not not_reached:
+            return
+        self.stream.write("\nTime budget of %s:\n"
+                          % format_duration(self.seconds))
+        for message, cases in (
+                ("Left out %d test%s which didn't fit:", self.left_out),
+                ("Stopped at the deadline before %d test%s:", not_reached)):
+            if cases:
+                self.stream.write(message % (len(cases),
+                                             len(cases) != 1 and "s" or "")
+                                  + "\n")
+                for case in cases:
+                    self.stream.write("    %s\n" % case.identity)
+        self.stream.flush()
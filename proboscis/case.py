@@ -22,6 +22,7 @@ unittest equivalents.
 
 import os
 import pydoc
+import time
 import types
 import unittest
 import sys
@@ -31,8 +32,18 @@ from functools import wraps
 
 from proboscis import compatability
 from proboscis import dependencies
+from proboscis import result_cache
+from proboscis import results
 from proboscis import SkipTest
 from proboscis.sorting import TestGraph
+from proboscis.sorting import add_class_teardowns
+from proboscis.sorting import count_resource_setups
+from proboscis.sorting import critical_prerequisites
+from proboscis.sorting import peak_live_states
+from proboscis.sorting import prerequisite_closure
+from proboscis.sorting import sort_cases
+from proboscis.sorting import sort_cases_by_locality
+from proboscis.sorting import sort_cases_by_resources
 from proboscis.core import TestMethodClassEntry
 from proboscis.decorators import DEFAULT_REGISTRY
 
@@ -40,6 +51,22 @@ from proboscis.decorators import DEFAULT_REGISTRY
 # TestProgram normally. Its how the examples are tested.
 OVERRIDE_DEFAULT_STREAM = None
 
+PASS = "pass"
+SKIP = "skip"
+FAIL = "fail"
+ERROR = "error"
+# Reported when an attempt fails but the case will be tried again.
+RETRY = "retry"
+
+_SEVERITY = {PASS: 0, SKIP: 1, FAIL: 2, ERROR: 3}
+
+
+def worst_outcome(first, second):
+    """Returns whichever of two outcomes is the more severe."""
+    if _SEVERITY[second] > _SEVERITY[first]:
+        return second
+    return first
+
 
 class TestPlan(object):
     """Grabs information from the TestRegistry and creates a test plan."""
@@ -52,6 +79,7 @@ class TestPlan(object):
     @staticmethod
     def create_from_registry(registry):
         """Returns a sorted TestPlan from a TestRegistry instance."""
+        registry.flush()
         return TestPlan(registry.groups, registry.tests, registry.factories)
 
     @staticmethod
@@ -97,13 +125,22 @@ class TestPlan(object):
     def create_cases(test_entries, factories):
         tests = []
         entries = {}
+        instance_counts = {}
+        factory_entries = set()  # Entries may be shared by other registries.
         for factory in factories:
             list = factory()
             for item in list:
                 cases = TestPlan.create_cases_from_instance(factory, item)
+                if cases:
+                    entry = cases[0].entry.parent or cases[0].entry
+                    factory_entries.add(entry)
+                    index = instance_counts.get(entry, 0)
+                    instance_counts[entry] = index + 1
+                    for case in cases:
+                        case.factory_index = index
                 tests += cases
         for entry in test_entries:
-            if not entry.is_child and not entry.used_by_factory:
+            if not entry.is_child and entry not in factory_entries:
                 test_cases = TestPlan._create_test_cases_for_entry(entry)
                 entries[entry] = test_cases
                 tests += test_cases
@@ -161,6 +198,60 @@ class TestPlan(object):
         self.tests = list(reversed(filtered_list))
 
 
+    def select(self, cases):
+        """Whittles down test list to the given cases and their prerequisites.
+
+        Unlike filter this works on individual cases, so one instance made
+        by a factory can be picked without the others. Everything a chosen
+        case critically depends on (such as a before_class method) is kept,
+        transitively, but cases it merely runs after are not, except for the
+        after_class methods of each class instance partly kept.
+
+        """
+        keep = prerequisite_closure(cases,
+                                    critical_prerequisites(self.tests))
+        add_class_teardowns(self.tests, keep)
+        self.tests = [case for case in self.tests if case in keep]
+
+    def reorder(self, key):
+        """Re-orders the tests, running those with the lowest key first.
+
+        Dependencies are still honored; key only decides between tests
+        which are free to run at the same point in the plan.
+
+        """
+        self.tests = sort_cases(self.tests, key)
+
+    def reorder_by_locality(self):
+        """Re-orders the tests so each class instance is used contiguously.
+
+        This keeps as few instances (and whatever they hold open) alive at
+        once as dependencies allow.
+
+        """
+        self.tests = sort_cases_by_locality(self.tests)
+
+    def reorder_by_resources(self):
+        """Re-orders the tests so those sharing resources run together."""
+        self.tests = sort_cases_by_resources(self.tests)
+
+
+def entry_identity(entry, factory_index=None):
+    """Returns the identity of a case for entry (see TestCase.identity)."""
+    home = entry.home
+    if home is None:
+        return None
+    name = getattr(home, '__qualname__', None)
+    if name is None:
+        name = home.__name__
+        if entry.is_child:
+            name = "%s.%s" % (entry.parent.home.__name__, name)
+    identity = "%s:%s" % (home.__module__, name)
+    if factory_index is not None:
+        identity += "[%d]" % factory_index
+    return identity
+
+
 class TestCase(object):
     """Represents an instance of a TestEntry.
 
@@ -171,11 +262,42 @@ class TestCase(object):
     There may be multiple TestCase instances for each TestEntry instance.
 
     """
+    __slots__ = ('entry', 'dependents', 'dependency_failure', 'state',
+                 'factory_index')
+
     def __init__(self, entry, state=None):
         self.entry = entry
         self.dependents = []  # This is populated when we sort the tests.
         self.dependency_failure = None
         self.state = state
+        self.factory_index = None  # Which instance a factory made this from.
+
+    @property
+    def identity(self):
+        """A name for this case which stays the same from run to run.
+
+        This is the module and qualified name of the test, followed by the
+        instance number in brackets if the case was made by a factory. Cases
+        which don't run anything (such as groups of groups) return None.
+
+        """
+        return entry_identity(self.entry, self.factory_index)
+
+    def prerequisite_identity(self, target):
+        """Returns the identity of the case of a depends_on target.
+
+        A method of the same class is taken to mean the one on the same
+        instance. Returns None if target isn't a registered test.
+
+        """
+        entry = getattr(target, '_proboscis_entry_', None)
+        if entry is None:
+            return None
+        factory_index = None
+        if entry.is_child and self.entry.is_child and \
+           entry.parent is self.entry.parent:
+            factory_index = self.factory_index
+        return entry_identity(entry, factory_index)
 
     def check_dependencies(self, test_self):
         """If a dependency has failed, SkipTest is raised."""
@@ -212,32 +334,92 @@ class TestCase(object):
                str(self.entry.info) + ")"
 
 
+class CaseObserver(object):
+    """Base class for objects which want to know as each case runs.
+
+    Pass instances to TestProgram using the "observers" argument. For
+    unittest.TestCase classes the methods are called once for each test
+    method in the class.
+
+    """
+
+    def case_started(self, case):
+        """Called just before a case runs."""
+
+    def case_finished(self, case, outcome, duration):
+        """Called after a case runs.
+
+        The outcome is one of PASS, SKIP, FAIL or ERROR and the duration is
+        in seconds. When running batches, a failed attempt of a case which
+        will be retried is reported with the outcome RETRY.
+
+        """
+
+    def should_stop(self):
+        """Return True to stop the run before another case starts."""
+        return False
+
+    def run_finished(self):
+        """Called once every case has run."""
+
+
+def find_case(test):
+    """Returns the TestCase a unittest (or Nose) test was made from."""
+    if dependencies.use_nose:
+        root = getattr(test, "test", test)
+    else:
+        root = test
+    return getattr(root, "__proboscis_case__", None)
+
+
 class TestResultListener():
     """Implements methods of TestResult to be informed of test failures."""
 
     def __init__(self, chain_to_cls):
         self.chain_to_cls = chain_to_cls
+        self.observers = []
+        self.outcome = PASS
+        self.started = None
+
+    def startTest(self, test):
+        self.outcome = PASS
+        self.started = time.time()
+        case = find_case(test)
+        if case is not None:
+            for observer in self.observers:
+                observer.case_started(case)
+        self.chain_to_cls.startTest(self, test)
+
+    def stopTest(self, test):
+        self.chain_to_cls.stopTest(self, test)
+        case = find_case(test)
+        if case is not None:
+            duration = time.time() - self.started
+            for observer in self.observers:
+                observer.case_finished(case, self.outcome, duration)
+        for observer in self.observers:
+            if observer.should_stop():
+                self.shouldStop = True
 
     def addError(self, test, err):
+        self.outcome = worst_outcome(self.outcome, ERROR)
         self.onError(test)
         self.chain_to_cls.addError(self, test, err)
 
     def addFailure(self, test, err):
+        self.outcome = worst_outcome(self.outcome, FAIL)
         self.onError(test)
         self.chain_to_cls.addFailure(self, test, err)
 
     def addSkip(self, test, err):
+        self.outcome = worst_outcome(self.outcome, SKIP)
         self.onError(test)
         self.chain_to_cls.addSkip(self, test, err)
 
     def onError(self, test):
         """Notify a test entry and its dependents of failure."""
-        if dependencies.use_nose:
-            root = test.test
-        else:
-            root = test
-        if hasattr(root, "__proboscis_case__"):
-            case = root.__proboscis_case__
+        case = find_case(test)
+        if case is not None:
             case.fail_test()
 
 
@@ -260,17 +442,22 @@ class TestResult(TestResultListener, dependencies.TextTestResult):
         dependencies.TextTestResult.__init__(self, *args, **kwargs)
 
 
-def test_runner_cls(wrapped_cls, cls_name):
+def test_runner_cls(wrapped_cls, cls_name, observers=None):
     """Creates a test runner class which uses Proboscis TestResult."""
     new_dict = wrapped_cls.__dict__.copy()
 
     if dependencies.use_nose:
         def cb_make_result(self):
-            return TestResult(self.stream, self.descriptions, self.verbosity,
-                              self.config)
+            result = TestResult(self.stream, self.descriptions,
+                                self.verbosity, self.config)
+            result.observers = observers or []
+            return result
     else:
         def cb_make_result(self):
-            return TestResult(self.stream, self.descriptions, self.verbosity)
+            result = TestResult(self.stream, self.descriptions,
+                                self.verbosity)
+            result.observers = observers or []
+            return result
     new_dict["_makeResult"] = cb_make_result
     return type(cls_name, (wrapped_cls,), new_dict)
 
@@ -302,10 +489,75 @@ def skippable_func(test_case, func):
     return testng_method_mistake_capture_func
 
 
+def retrying_func(test_case, func):
+    """Calls func again when it fails in a way the test may retry.
+
+    Dependents only learn of the failure once the retries run out, since
+    until then nothing reaches the TestResult.
+
+    """
+    info = test_case.entry.info
+    if not info.retries:
+        return func
+
+    @wraps(func)
+    def retry_func(*args):
+        attempt = 0
+        while True:
+            try:
+                return func(*args)
+            except SkipTest:
+                raise
+            except info.retry_on:
+                if attempt >= info.retries:
+                    raise
+                time.sleep(info.retry_delay(attempt))
+                attempt += 1
+    return retry_func
+
+
+def returning_func(test_case, func, *args):
+    """Calls func with values returned by prerequisites and keeps its own.
+
+    Arguments named after a test in depends_on are given the value that
+    test returned (see proboscis.results). Any other args come first. A
+    cacheable test which already passed with the same code isn't called
+    (see proboscis.result_cache).
+
+    """
+    targets = dict((getattr(target, '__name__', None), target)
+                   for target in test_case.entry.info.depends_on)
+    wanted = [name for name in results.argument_names(func)[len(args):]
+              if name in targets]
+
+    @wraps(func)
+    def result_func():
+        store = results.active_store()
+        cache = None
+        if test_case.entry.info.cacheable:
+            cache = result_cache.active_cache()
+        if cache is not None:
+            found, value = cache.load(test_case)
+            if found:
+                if value is not None:
+                    store.put(test_case.identity, value)
+                return
+        kwargs = {}
+        for name in wanted:
+            kwargs[name] = store.get(
+                test_case.prerequisite_identity(targets[name]))
+        value = func(*args, **kwargs)
+        if value is not None:
+            store.put(test_case.identity, value)
+        if cache is not None:
+            cache.save(test_case, value)
+    return result_func
+
+
 class FunctionTest(unittest.FunctionTestCase):
     """Wraps a single function as a test runnable by unittest / nose."""
 
-    def __init__(self, test_case):
+    def __init__(self, test_case, retry=True):
         func = test_case.entry.home
         _old_setup = None
         if hasattr(func, 'setup'):  # Don't destroy nose-style setup
@@ -315,6 +567,9 @@ class FunctionTest(unittest.FunctionTestCase):
             if _old_setup is not None:
                 _old_setup()
         self.__proboscis_case__ = test_case
+        func = returning_func(test_case, func)
+        if retry:
+            func = retrying_func(test_case, func)
         sfunc = skippable_func(self, func)
         unittest.FunctionTestCase.__init__(self, testFunc=sfunc, setUp=cb_check)
 
@@ -341,7 +596,7 @@ class TestMethodState(object):
 class MethodTest(unittest.FunctionTestCase):
     """Wraps a method as a test runnable by unittest."""
 
-    def __init__(self, test_case):
+    def __init__(self, test_case, retry=True):
         assert test_case.state is not None
         #TODO: Figure out how to attach calls to BeforeMethod and BeforeClass,
         #      AfterMethod and AfterClass. It should be easy enough to
@@ -350,9 +605,11 @@ class MethodTest(unittest.FunctionTestCase):
             test_case.check_dependencies(self)
         @wraps(test_case.entry.home)
         def func(self=None):  # Called by FunctionTestCase
-            func = test_case.entry.home
-            func(test_case.state.get_state())
+            returning_func(test_case, test_case.entry.home,
+                           test_case.state.get_state())()
         self.__proboscis_case__ = test_case
+        if retry:
+            func = retrying_func(test_case, func)
         sfunc = skippable_func(self, func)
         unittest.FunctionTestCase.__init__(self, testFunc=sfunc, setUp=cb_check)
 
@@ -389,10 +646,16 @@ def decorate_class(setUp_method=None, tearDown_method=None):
 
 
 class TestSuiteCreator(object):
-    """Turns Proboscis test cases into elements to be run by unittest."""
+    """Turns Proboscis test cases into elements to be run by unittest.
+
+    With retry False, tests are not retried when they fail; whoever runs
+    them is expected to do so instead.
 
-    def __init__(self, loader):
+    """
+
+    def __init__(self, loader, retry=True):
         self.loader = loader
+        self.retry = retry
 
     def loadTestsFromTestEntry(self, test_case):
         """Wraps a test class in magic so it will skip on dependency failures.
@@ -414,10 +677,10 @@ class TestSuiteCreator(object):
         raise RuntimeError("Unknown test type:" + str(type(home)))
 
     def wrap_function(self, test_case):
-        return [FunctionTest(test_case)]
+        return [FunctionTest(test_case, self.retry)]
 
     def wrap_method(self, test_case):
-        return [MethodTest(test_case)]
+        return [MethodTest(test_case, self.retry)]
 
     def wrap_unittest_test_case_class(self, test_case):
         original_cls = test_case.entry.home
@@ -469,7 +732,46 @@ class TestProgram(dependencies.TestProgram):
                        addFailure and addError methods.
     :param stream: By default this is standard out.
     :param argv: By default this is sys.argv. Proboscis parses this for the
-                 --group argument.
+                 --group argument, as well as --workers=N which runs the
+                 plan in N processes forked once the tests are imported.
+                 With --workers, --relax=hints lets tests start before
+                 those they merely run after, and --relax=idle only does
+                 so when a worker would otherwise sit idle.
+                 --daemon starts a proboscis.daemon.TestDaemon instead of
+                 running the tests, and --watch re-runs the tests affected
+                 by each change to a source file. --record-impact notes the
+                 code each test runs so a later --changed=PATH (a diff or
+                 list of files) can run only the tests the changes affect.
+                 --history saves each test's outcome and duration, and a
+                 journal of the tests finished so far, in .proboscis.
+                 --last-failed runs only the tests which failed last time,
+                 along with the tests they depend on. --order=failed-first
+                 runs recently failed tests as early as their dependencies
+                 allow, then tests whose source changed; --order=changed-first
+                 does the reverse. --order=locality finishes the methods of
+                 one class instance before starting on another, and
+                 --order=resources runs tests sharing resources together.
+                 --resume uses the journal to skip the tests finished by
+                 a run which was interrupted, so only a run started with
+                 --history (or --resume) can be resumed; without a
+                 journal, --resume warns and runs every test.
+                 --time-budget=30m runs the most valuable tests expected
+                 to fit in the time given and stops starting tests once it
+                 is used up. --quarantine moves
+                 tests the results history shows to be flaky, and the tests
+                 depending on them, to a lane run after the others
+                 which doesn't affect the exit status. --audit (or
+                 --audit=N) runs the plan in N random orders and each test
+                 on its own, reporting tests whose outcome depends on what
+                 ran before them; --audit-seed=S repeats an earlier audit.
+                 --no-test-cache runs cacheable tests even if they already
+                 passed with the same code. --discover=DIR reads the tests
+                 in DIR without importing them and imports only the
+                 modules the selected groups need; with it --show-plan and
+                 --list-groups print what was read.
+    :param plan: A TestPlan to run instead of creating one from the registry.
+    :param observers: A list of CaseObserver instances to tell as each test
+                      case runs.
     """
     def __init__(self,
                  registry=DEFAULT_REGISTRY,
@@ -481,10 +783,80 @@ class TestProgram(dependencies.TestProgram):
                  testRunner=None,
                  stream=None,
                  argv=None,
+                 plan=None,
+                 observers=None,
                  *args, **kwargs):
         groups = groups or []
         argv = argv or sys.argv
         argv = self.extract_groups_from_argv(argv, groups)
+        discover = []
+        argv = self.extract_option_from_argv(argv, "discover", discover)
+        workers = []
+        argv = self.extract_option_from_argv(argv, "workers", workers)
+        changed = []
+        argv = self.extract_option_from_argv(argv, "changed", changed)
+        order = []
+        argv = self.extract_option_from_argv(argv, "order", order)
+        time_budget = []
+        argv = self.extract_option_from_argv(argv, "time-budget", time_budget)
+        relax = []
+        argv = self.extract_option_from_argv(argv, "relax", relax)
+        audit = []
+        argv = self.extract_option_from_argv(argv, "audit", audit)
+        audit_seed = []
+        argv = self.extract_option_from_argv(argv, "audit-seed", audit_seed)
+        if "--audit" in argv:
+            argv = [arg for arg in argv if arg != "--audit"]
+            audit.append(3)
+        self.observers = list(observers or [])
+        self.quarantine = None
+        self.results = results.ResultStore()
+        # Results are only saved when asked for or needed by an option.
+        record = "--history" in argv
+        uses_history = record or time_budget or "--last-failed" in argv \
+            or "--quarantine" in argv \
+            or (order and order[-1] in ("failed-first", "changed-first"))
+        self.history = None
+        if uses_history:
+            from proboscis.history import ResultHistory
+            self.history = ResultHistory()
+            self.observers.append(self.history)
+        from proboscis.journal import Journal
+        resume = "--resume" in argv
+        argv = [arg for arg in argv if arg != "--resume"]
+        self.journal = Journal(resume=resume)
+        if record or resume:
+            self.observers.append(self.journal)
+        if "--record-impact" in argv:
+            from proboscis.impact import ImpactRecorder
+            self.observers.append(ImpactRecorder())
+            argv = [arg for arg in argv if arg != "--record-impact"]
+        if "--daemon" in argv:
+            def serve():
+                from proboscis.daemon import TestDaemon
+                TestDaemon(registry, program_name=argv[0]).serve_forever()
+            self.__run = serve
+            return
+        if "--watch" in argv:
+            def watch():
+                from proboscis.watch import Watcher
+                watch_argv = [arg for arg in argv if arg != "--watch"]
+                Watcher(registry, watch_argv, groups).watch_forever()
+            self.__run = watch
+            return
+        if discover:
+            from proboscis import discovery
+            files = discovery.DiscoveryIndex().scan(discover[-1])
+            paths = discovery.select_modules(files, groups)
+            if "--list-groups" in argv:
+                self.__run = lambda: discovery.write_groups(files, sys.stdout)
+                return
+            if "--show-plan" in argv:
+                self.__run = lambda: discovery.write_plan(files, paths,
+                                                          sys.stdout)
+                return
+            discovery.import_modules(paths)
+        argv = [arg for arg in argv if arg != "--history"]
         if "suite" in kwargs:
             raise ValueError("'suite' is not a valid argument, as Proboscis " \
                              "creates the suite.")
@@ -505,7 +877,8 @@ class TestProgram(dependencies.TestProgram):
 
         if testRunner is None:
             runner_cls = test_runner_cls(dependencies.TextTestRunner,
-                                         "ProboscisTestRunner")
+                                         "ProboscisTestRunner",
+                                         self.observers)
             if dependencies.use_nose:
                 testRunner = runner_cls(stream,
                                         verbosity=3,  # config.verbosity,
@@ -514,13 +887,66 @@ class TestProgram(dependencies.TestProgram):
                 testRunner = runner_cls(stream, verbosity=3)
 
         #registry.sort()
-        self.plan = TestPlan.create_from_registry(registry)
+        self.plan = plan or TestPlan.create_from_registry(registry)
 
         if len(groups) > 0:
             self.plan.filter(group_names=groups)
+        if changed:
+            self.filter_by_changes(changed[-1])
+        if "--last-failed" in argv:
+            argv = [arg for arg in argv if arg != "--last-failed"]
+            self.plan.select(self.history.failed_cases(self.plan.tests))
+        if resume:
+            self.journal.resume(self.plan)
+        if order:
+            self.order_plan(order[-1])
+        if "--quarantine" in argv:
+            argv = [arg for arg in argv if arg != "--quarantine"]
+            from proboscis.quarantine import QuarantineLane
+            from proboscis.quarantine import split_plan
+            flaky = self.history.flaky_cases(self.plan.tests)
+            lane = split_plan(self.plan, flaky)
+            main = set(self.plan.tests)
+            self.quarantine = QuarantineLane(
+                lane, self.__loader, stream,
+                [case for case in lane if case not in main])
+        if time_budget:
+            from proboscis.budget import parse_duration
+            from proboscis.budget import TimeBudget
+            budget = TimeBudget(parse_duration(time_budget[-1]),
+                                self.history, stream)
+            budget.select(self.plan)
+            self.observers.append(budget)
+        from proboscis.fixtures import activate
+        from proboscis.fixtures import FixtureManager
+        self.fixtures = FixtureManager(self.plan.tests)
+        activate(self.fixtures)
+        self.observers.append(self.fixtures)
+        results.activate(self.results)
+        cache = None
+        if "--no-test-cache" in argv:
+            argv = [arg for arg in argv if arg != "--no-test-cache"]
+        elif [case for case in self.plan.tests if case.entry.info.cacheable]:
+            cache = result_cache.ResultCache(self.plan.tests)
+        result_cache.activate(cache)
         self.cases = self.plan.tests
         if "--show-plan" in argv:
             self.__run = self.show_plan
+        elif audit:
+            def run():
+                from proboscis.audit import IsolationAudit
+                seed = None
+                if audit_seed:
+                    seed = int(audit_seed[-1])
+                sys.exit(not IsolationAudit(self.plan, self.__loader,
+                                            int(audit[-1]), seed,
+                                            stream=stream).run())
+            self.__run = run
+        elif workers:
+            def run():
+                self.run_batched(int(workers[-1]), stream,
+                                 relax and relax[-1] or None)
+            self.__run = run
         else:
             self.__suite = self.create_test_suite_from_entries(config,
                                                                self.cases)
@@ -572,19 +998,111 @@ class TestProgram(dependencies.TestProgram):
                 new_argv.append(arg)
         return new_argv
 
+    def extract_option_from_argv(self, argv, name, values):
+        """Like extract_groups_from_argv, but for any "--name=value" option.
+
+        Each value found is appended to the list "values".
+
+        """
+        prefix = "--%s=" % name
+        new_argv = [argv[0]]
+        for arg in argv[1:]:
+            if arg.startswith(prefix):
+                values.append(arg[len(prefix):])
+            else:
+                new_argv.append(arg)
+        return new_argv
+
+    def filter_by_changes(self, path):
+        """Keeps only tests impacted by the changes described in a file.
+
+        The file may be a unified diff or a list of changed file names, and
+        is compared to what "--record-impact" saw each test touch.
+
+        """
+        from proboscis import impact
+        source = open(path, 'r')
+        try:
+            changes = impact.parse_changes(source.read())
+        finally:
+            source.close()
+        homes = impact.impacted_homes(self.plan.tests, changes)
+        self.plan.filter(classes=homes)
+
+    def order_plan(self, policy):
+        """Re-orders the plan by one of the "--order" policies."""
+        from proboscis.history import HistoryOrder
+        if policy == "locality":
+            self.plan.reorder_by_locality()
+        elif policy == "resources":
+            self.plan.reorder_by_resources()
+        elif policy in ("failed-first", "changed-first"):
+            self.plan.reorder(HistoryOrder(self.history,
+                                           policy == "changed-first"))
+        else:
+            raise ValueError("Unknown order %r; expected failed-first, "
+                             "changed-first, locality or resources."
+                             % policy)
+
+    def run_batched(self, workers, stream, relax=None):
+        """Runs the plan with proboscis.parallel instead of unittest.
+
+        With more than one worker, each batch of tests runs in a process
+        forked from this one so the test modules aren't imported again.
+        If given, relax says how to treat runs_after edges (see
+        proboscis.parallel.CaseScheduler).
+
+        """
+        from proboscis import parallel
+        if workers > 1 and parallel.ForkServerExecutor.is_supported():
+            executor = parallel.ForkServerExecutor(self.cases, workers,
+                                                   self.__loader,
+                                                   self.observers)
+        else:
+            executor = parallel.LocalExecutor(self.cases, self.__loader,
+                                              self.observers)
+        runner = parallel.BatchRunner(self.cases, executor, stream=stream,
+                                      observers=self.observers, relax=relax)
+        sys.exit(not runner.run())
+
     def run_and_exit(self):
         """Calls unittest or Nose to run all tests.
 
         unittest will call sys.exit on completion.
 
         """
-        self.__run()
+        stopped = None
+        try:
+            try:
+                self.__run()
+            except SystemExit:
+                stopped = sys.exc_info()[1]
+        finally:
+            for observer in self.observers:
+                observer.run_finished()
+            self.results.clear()
+        # The lane runs once the exit is no longer being handled, so its
+        # tracebacks don't include it.
+        if self.quarantine is not None:
+            self.quarantine.start()
+            self.quarantine.wait()
+        if stopped is not None:
+            raise stopped
 
     def show_plan(self):
         """Prints information on test entries and the order they will run."""
         print("   *  *  *  Test Plan  *  *  *")
         for case in self.cases:
             case.write_doc(sys.stdout)
+        peak = peak_live_states(self.cases)
+        if peak:
+            print("Most class instances alive at once: %d" % peak)
+        setups = count_resource_setups(self.cases)
+        if setups:
+            print("Resource setups: %d (%s)"
+                  % (sum(setups.values()),
+                     ", ".join("%s: %d" % item
+                               for item in sorted(setups.items()))))
 
     @property
     def test_suite(self):
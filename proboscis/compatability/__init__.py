@@ -25,6 +25,28 @@ else:
     from proboscis.compatability.exceptions_2_5 import capture_type_error
 
 
+def _entry_functions(cls):
+    """Returns (name, function) for the decorated functions of a class.
+
+    Unlike inspect.getmembers this only reads the __dict__ of each class in
+    the MRO, so properties and other descriptors are never evaluated. The
+    pairs are sorted by name as getmembers would.
+
+    """
+    seen = set()
+    found = []
+    for klass in inspect.getmro(cls):
+        for name, value in vars(klass).items():
+            if name in seen:
+                continue
+            seen.add(name)
+            if isinstance(value, types.FunctionType) and \
+                hasattr(value, '_proboscis_entry_'):
+                found.append((name, value))
+    found.sort()
+    return found
+
+
 if sys.version_info >= (3, 0):
     import imp
     reload = imp.reload
@@ -37,6 +59,9 @@ if sys.version_info >= (3, 0):
     def get_method_function(method):
         return method
 
+    def get_class_entry_methods(cls):
+        return [func for name, func in _entry_functions(cls)]
+
 
 else:
     reload = reload
@@ -49,6 +74,9 @@ else:
     def get_method_function(method):
         return method.im_func
 
+    def get_class_entry_methods(cls):
+        return [getattr(cls, name) for name, func in _entry_functions(cls)]
+
 
 _IS_JYTHON = "Java" in str(sys.version) or hasattr(sys, 'JYTHON_JAR')
 
@@ -45,6 +45,8 @@ class TestGroup(object):
     groups, and one group may have multiple test cases.
 
     """
+    __slots__ = ('name', 'entries')
+
     def __init__(self, name):
         self.name = name
         self.entries = []
@@ -53,6 +55,11 @@ class TestGroup(object):
         """Adds a TestEntry to this group."""
         self.entries.append(entry)
 
+    def copy(self):
+        group = TestGroup(self.name)
+        group.entries = list(self.entries)
+        return group
+
 
 def transform_depends_on_target(target):
     if isinstance(target, types.MethodType):
@@ -61,9 +68,34 @@ def transform_depends_on_target(target):
         return target
 
 
-class TestEntryInfo:
+def extend_unique(items, new_items):
+    """Appends those of new_items not yet in a list, returning them.
+
+    Membership is checked against a set so long lists merge in linear time.
+
+    """
+    present = set(items)
+    added = []
+    for item in new_items:
+        if item not in present:
+            present.add(item)
+            items.append(item)
+            added.append(item)
+    return added
+
+
+class TestEntryInfo(object):
     """Represents metadata attached to some kind of test code."""
 
+    __slots__ = ('groups', 'depends_on', 'depends_on_groups', 'enabled',
+                 'enabled_was_specified', 'always_run', 'inherit_groups',
+                 'before_class', 'after_class', 'runs_after',
+                 'runs_after_groups', 'priority', 'priority_was_specified',
+                 'retries', 'retries_was_specified', 'retry_on',
+                 'retry_on_was_specified', 'backoff', 'backoff_was_specified',
+                 'resources', 'fixtures', 'cacheable',
+                 'cacheable_was_specified', 'inputs', 'inputs_was_specified')
+
     def __init__(self,
                  groups=None,
                  depends_on=None,
@@ -74,7 +106,15 @@ class TestEntryInfo:
                  runs_after_groups=None,
                  runs_after=None,
                  run_before_class=False,
-                 run_after_class=False):
+                 run_after_class=False,
+                 priority=None,
+                 retries=None,
+                 retry_on=None,
+                 backoff=None,
+                 resources=None,
+                 fixtures=None,
+                 cacheable=None,
+                 inputs=None):
         groups = groups or []
         depends_on_list = depends_on or []
         depends_on_classes = depends_on_classes or []
@@ -98,6 +138,26 @@ class TestEntryInfo:
         self.after_class = run_after_class
         self.runs_after = set(transform_depends_on_target(target)
                               for target in runs_after)
+        self.priority_was_specified = priority is not None
+        self.priority = priority or 0
+        self.retries_was_specified = retries is not None
+        self.retries = retries or 0
+        self.retry_on_was_specified = retry_on is not None
+        if retry_on is None:
+            retry_on = (Exception,)
+        elif isinstance(retry_on, type):
+            retry_on = (retry_on,)
+        self.retry_on = tuple(retry_on)
+        self.backoff_was_specified = backoff is not None
+        self.backoff = backoff or 0
+        self.resources = list(resources or [])
+        self.fixtures = []
+        for fixture in fixtures or []:
+            self.add_fixture(fixture)
+        self.cacheable_was_specified = cacheable is not None
+        self.cacheable = cacheable or False
+        self.inputs_was_specified = inputs is not None
+        self.inputs = inputs
 
         if run_before_class and run_after_class:
             raise RuntimeError("It is illegal to set 'before_class' and "
@@ -109,30 +169,45 @@ class TestEntryInfo:
         Returns the groups this entry was added to.
 
         """
-        added_groups = []
-        for group in parent_entry.groups:
-            if group not in self.groups:
-                self.groups.append(group)
-                added_groups.append(group)
-        for item in parent_entry.depends_on_groups:
-            if item not in self.depends_on_groups:
-                self.depends_on_groups.append(item)
-        for item in parent_entry.depends_on:
-            if item not in self.depends_on:
-                self.depends_on.add(item)
-        for item in parent_entry.runs_after:
-            if item not in self.runs_after:
-                self.runs_after.add(item)
-        for item in parent_entry.runs_after_groups:
-            if item not in self.runs_after_groups:
-                self.runs_after_groups.append(item)
+        added_groups = extend_unique(self.groups, parent_entry.groups)
+        extend_unique(self.depends_on_groups, parent_entry.depends_on_groups)
+        self.depends_on.update(parent_entry.depends_on)
+        self.runs_after.update(parent_entry.runs_after)
+        extend_unique(self.runs_after_groups, parent_entry.runs_after_groups)
+        extend_unique(self.resources, parent_entry.resources)
+        extend_unique(self.fixtures, parent_entry.fixtures)
         if parent_entry.enabled_was_specified and \
             not self.enabled_was_specified:
             self.enabled = parent_entry.enabled
         if parent_entry.always_run:
             self.always_run = True
+        if parent_entry.priority_was_specified and \
+            not self.priority_was_specified:
+            self.priority = parent_entry.priority
+        for name in ('retries', 'retry_on', 'backoff', 'cacheable', 'inputs'):
+            if getattr(parent_entry, name + '_was_specified') and \
+                not getattr(self, name + '_was_specified'):
+                setattr(self, name, getattr(parent_entry, name))
         return added_groups
 
+    def add_fixture(self, fixture):
+        """Notes a fixture is used, which also makes its name a resource."""
+        if fixture not in self.fixtures:
+            self.fixtures.append(fixture)
+        if fixture.name not in self.resources:
+            self.resources.append(fixture.name)
+
+    def retry_delay(self, attempt):
+        """Returns how long to wait before retrying after the given attempt.
+
+        Attempts count from zero. A numeric backoff doubles after each
+        attempt; a callable backoff is passed the attempt number.
+
+        """
+        if callable(self.backoff):
+            return self.backoff(attempt)
+        return self.backoff * (2 ** attempt)
+
     def __repr__(self):
         return "TestEntryInfo(groups=" + str(self.groups) + \
                ", depends_on=" + str(self.depends_on) + \
@@ -151,24 +226,24 @@ class TestEntryInfo:
 class TestEntry(object):
     """Represents a function, method, or unittest.TestCase and its info."""
 
+    __slots__ = ('home', 'homes', 'info', 'parent', '__method_cls',
+                 '__method', '__used_by_factory')
+
     def __init__(self, home, info):
         self.home = home
         self.homes = set([home])
         self.info = info
+        self.parent = None  # The TestMethodClassEntry of a method.
         self.__method_cls = None
         self.__method = None
         self.__used_by_factory = False
-        for dep_list in (self.info.depends_on, self.info.runs_after):
-            for dep in dep_list:
-                if dep is self.home:
-                    raise RuntimeError("TestEntry depends on its own class:" +
-                                       str(self))
-        for dependency_group in self.info.depends_on_groups:
-            for my_group in self.info.groups:
-                if my_group == dependency_group:
-                    raise RuntimeError("TestEntry depends on a group it " \
-                                       "itself belongs to: " + str(self))
-
+        if self.home in self.info.depends_on or \
+            self.home in self.info.runs_after:
+            raise RuntimeError("TestEntry depends on its own class:" +
+                               str(self))
+        if set(self.info.groups).intersection(self.info.depends_on_groups):
+            raise RuntimeError("TestEntry depends on a group it " \
+                               "itself belongs to: " + str(self))
 
     def contains(self, group_names, classes):
         """True if this belongs to any of the given groups or classes."""
@@ -178,7 +253,7 @@ class TestEntry(object):
         for cls in classes:
             if cls == self.home:
                 return True
-        if hasattr(self, 'parent'):
+        if self.parent is not None:
             return self.parent.contains_shallow(group_names, classes)
         return False
 
@@ -239,6 +314,8 @@ class TestMethodClassEntry(TestEntry):
 
     """
 
+    __slots__ = ('children',)
+
     def __init__(self, home, info, children):
         super(TestMethodClassEntry, self).__init__(home, info)
         self.children = children
@@ -264,10 +341,60 @@ class TestRegistry(object):
     All of Proboscis's decorators (@test, @before_class, etc) and the register
     function use a default instance of this class, however its also possible to
     instantiate multiple copies and add tests to them directly.
+
+    A lazy registry only records what it's asked to register, so decorators
+    do almost nothing at import time. Everything recorded is registered, in
+    order, by flush(), which is called when a plan is created from it.
+    Mistakes such as applying a decorator twice are then reported by flush
+    rather than at import.
+
+    fork() and snapshot() return copies which share this registry's lists
+    until one of them is changed, so several plans can be built in one
+    process without importing the tests again. The entries themselves are
+    shared.
     """
-    def __init__(self):
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+        self.frozen = False
         self.reset()
 
+    def fork(self):
+        """Returns a registry starting with everything registered here.
+
+        Whatever is registered afterwards in either only goes to that one.
+
+        """
+        self.flush()
+        self._shared = True
+        copy = TestRegistry(lazy=self.lazy)
+        copy.tests = self.tests
+        copy.groups = self.groups
+        copy.classes = self.classes
+        copy.factories = self.factories
+        copy._shared = True
+        return copy
+
+    def snapshot(self):
+        """Returns a read-only fork of this registry to build plans from."""
+        copy = self.fork()
+        copy.frozen = True
+        return copy
+
+    def _own(self):
+        """Copies what's shared with forks before changing it."""
+        if self.frozen:
+            raise RuntimeError("A registry snapshot can't be changed.")
+        if not self._shared:
+            return
+        self.tests = list(self.tests)
+        self.groups = dict((name, group.copy())
+                           for name, group in self.groups.items())
+        self.classes = dict((home, list(entries))
+                            for home, entries in self.classes.items())
+        self.factories = list(self.factories)
+        self.pending = list(self.pending)
+        self._shared = False
+
     def _change_function_to_method(self, method, cls, cls_info):
         """Add an entry to a method by altering its function entry."""
         function = compatability.get_method_function(method)
@@ -285,6 +412,7 @@ class TestRegistry(object):
         :param group_name: The group to create.
         """
         if not group_name in self.groups:
+            self._own()
             self.groups[group_name] = TestGroup(group_name)
 
     def get_group(self, group_name):
@@ -326,6 +454,14 @@ class TestRegistry(object):
         global default registry.
 
         """
+        if self.lazy:
+            self._own()
+            self.pending.append((test_home, kwargs))
+            return test_home
+        return self._register_now(test_home, **kwargs)
+
+    def _register_now(self, test_home=None, **kwargs):
+        self._own()
         info = TestEntryInfo(**kwargs)
         if test_home is None:
             return self._register_empty_test_case(info)
@@ -336,6 +472,13 @@ class TestRegistry(object):
         else:
             return self._register_test_class(test_home, info)
 
+    def flush(self):
+        """Registers whatever a lazy registry recorded, in one pass."""
+        pending = self.pending
+        self.pending = []
+        for test_home, kwargs in pending:
+            self._register_now(test_home, **kwargs)
+
     def register_factory(self, func):
         """Turns a function into a Proboscis test instance factory.
 
@@ -344,6 +487,7 @@ class TestRegistry(object):
 
         :param func: the function to be added.
         """
+        self._own()
         self.factories.append(func)
 
     def _register_empty_test_case(self, info):
@@ -385,32 +529,58 @@ class TestRegistry(object):
     def _register_test_class(self, cls, info):
         """Registers the methods within a class."""
         test_entries = []
-        methods = compatability.get_class_methods(cls)
-        before_class_methods = []
+        methods = compatability.get_class_entry_methods(cls)
+        before_class_homes = []
         after_class_methods = []
         for method in methods:
-            func = compatability.get_method_function(method)
-            if hasattr(func, "_proboscis_entry_"):
-                entry = self._change_function_to_method(method, cls, info)
-                test_entries.append(entry)
-                if entry.info.before_class:
-                    before_class_methods.append(entry)
-                elif entry.info.after_class:
-                    after_class_methods.append(entry)
-        for before_entry in before_class_methods:
+            entry = self._change_function_to_method(method, cls, info)
+            test_entries.append(entry)
+            if entry.info.before_class:
+                before_class_homes.append(entry.home)
+            elif entry.info.after_class:
+                after_class_methods.append(entry)
+        if before_class_homes:
             for test_entry in test_entries:
                 if not test_entry.info.before_class:
-                    test_entry.info.depends_on.add(before_entry.home)
-        for after_entry in after_class_methods:
-            for test_entry in test_entries:
-                if not test_entry.info.after_class:
-                    after_entry.info.depends_on.add(test_entry.home)
+                    test_entry.info.depends_on.update(before_class_homes)
+        if after_class_methods:
+            other_homes = [test_entry.home for test_entry in test_entries
+                           if not test_entry.info.after_class]
+            for after_entry in after_class_methods:
+                after_entry.info.depends_on.update(other_homes)
         entry = TestMethodClassEntry(cls, info, test_entries)
         self._register_entry(entry)
         return entry.home
 
+    def remove_module(self, module_name):
+        """Forgets every test and factory defined in the given module.
+
+        This is used before re-importing a module so its decorators can
+        register the new versions of its tests.
+
+        """
+        self.flush()
+        self._own()
+
+        def defined_in_module(home):
+            return getattr(home, '__module__', None) == module_name
+        self.tests = [entry for entry in self.tests
+                      if not defined_in_module(entry.home)]
+        for group in self.groups.values():
+            group.entries = [entry for entry in group.entries
+                             if not defined_in_module(entry.home)]
+        for home in list(self.classes.keys()):
+            if defined_in_module(home):
+                del self.classes[home]
+        self.factories = [factory for factory in self.factories
+                          if not defined_in_module(factory)]
+
     def reset(self):
         """Wipes the registry."""
+        if self.frozen:
+            raise RuntimeError("A registry snapshot can't be changed.")
+        self._shared = False
+        self.pending = []
         self.tests = []
         self.groups = {}
         self.classes = {}
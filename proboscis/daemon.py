@@ -0,0 +1,240 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keeps tests imported in a long lived process so re-runs start instantly.
+
+Start the daemon by passing "--daemon" to the script which calls TestProgram:
+
+    python run_tests.py --daemon
+
+Then ask it to run tests using the thin client in this module, which accepts
+the same arguments the script would:
+
+    python -m proboscis.daemon --group=service.users
+
+Each run happens in a process forked from the daemon, so tests can't disturb
+the imported modules or the plan kept by the daemon. Before each run any
+changed test module is re-imported, along with the modules using it.
+
+"""
+
+import json
+import os
+import socket
+import sys
+import traceback
+
+from proboscis.case import TestPlan
+from proboscis.case import TestProgram
+from proboscis.reloading import ModuleReloader
+from proboscis.storage import make_parent_directory
+from proboscis.storage import state_path
+
+
+EXIT_MARKER = b"\0proboscis-exit:"
+
+
+def default_address():
+    return state_path("daemon.sock")
+
+
+def exit_code(system_exit):
+    """Turns the code carried by a SystemExit into a process exit status."""
+    code = system_exit.code
+    if code is None or isinstance(code, int):
+        return int(code or 0)
+    return 1
+
+
+def run_in_child(func, output_fd=None):
+    """Calls func in a forked process, returning the child's exit status.
+
+    If func raises SystemExit its code is used as the exit status. If
+    output_fd is given the child's standard out and error are sent there.
+
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            if output_fd is not None:
+                os.dup2(output_fd, 1)
+                os.dup2(output_fd, 2)
+            try:
+                func()
+                code = 0
+            except SystemExit:
+                code = exit_code(sys.exc_info()[1])
+            except Exception:
+                traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    status = os.waitpid(pid, 0)[1]
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    return 1
+
+
+def _encode(text):
+    if isinstance(text, bytes):
+        return text
+    return text.encode("utf-8")
+
+
+class TestDaemon(object):
+    """Serves requests to run tests from an already populated registry."""
+
+    def __init__(self, registry, address=None, program_name=None,
+                 root=None):
+        self.registry = registry
+        self.address = address or default_address()
+        self.program_name = program_name or sys.argv[0]
+        self.reloader = ModuleReloader(registry, root)
+        self.plan = None
+        self.running = False
+
+    @staticmethod
+    def is_supported():
+        return hasattr(socket, 'AF_UNIX') and hasattr(os, 'fork')
+
+    def serve_forever(self):
+        """Accepts requests one at a time until told to stop."""
+        if not self.is_supported():
+            raise RuntimeError("The Proboscis daemon requires Unix sockets "
+                               "and os.fork.")
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        make_parent_directory(self.address)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.address)
+        server.listen(5)
+        print("Proboscis daemon listening on %s" % self.address)
+        self.running = True
+        try:
+            while self.running:
+                connection = server.accept()[0]
+                try:
+                    self.handle(connection)
+                finally:
+                    connection.close()
+        finally:
+            server.close()
+            os.remove(self.address)
+
+    def prepare(self):
+        """Reloads changed modules and builds the plan if needed.
+
+        Returns the names of the modules which were reloaded.
+
+        """
+        reloaded = set()
+        changed = self.reloader.changed()
+        if changed:
+            reloaded = self.reloader.reload(changed)
+            self.plan = None
+        if self.plan is None:
+            self.plan = TestPlan.create_from_registry(self.registry)
+        return reloaded
+
+    def handle(self, connection):
+        reader = connection.makefile('rb')
+        try:
+            request = json.loads(reader.readline().decode("utf-8"))
+        finally:
+            reader.close()
+        if request.get("stop"):
+            self.running = False
+            connection.sendall(EXIT_MARKER + b"0")
+            return
+        try:
+            reloaded = self.prepare()
+        except Exception:
+            connection.sendall(_encode(traceback.format_exc()))
+            connection.sendall(EXIT_MARKER + b"2")
+            return
+        if reloaded:
+            connection.sendall(_encode("Reloaded %s\n"
+                                       % ", ".join(sorted(reloaded))))
+
+        def run():
+            program = TestProgram(registry=self.registry, plan=self.plan,
+                                  argv=[self.program_name] +
+                                       request.get("argv", []))
+            program.run_and_exit()
+        code = run_in_child(run, connection.fileno())
+        connection.sendall(EXIT_MARKER + _encode(str(code)))
+
+
+class DaemonClient(object):
+    """Asks a running TestDaemon to run tests and streams back the output."""
+
+    def __init__(self, address=None):
+        self.address = address or default_address()
+
+    def _send(self, request, stream):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.address)
+        try:
+            connection.sendall(_encode(json.dumps(request) + "\n"))
+            tail = b""
+            while True:
+                data = connection.recv(4096)
+                if not data:
+                    break
+                if tail or b"\0" in data:
+                    tail += data
+                    continue
+                stream.write(data)
+                stream.flush()
+        finally:
+            connection.close()
+        output, marker, code = tail.partition(EXIT_MARKER)
+        if output:
+            stream.write(output)
+        if not marker:
+            return 1
+        return int(code.decode("utf-8"))
+
+    def run(self, argv, stream=None):
+        """Runs tests as if argv were passed to the daemon's script.
+
+        Returns the exit code of the run.
+
+        """
+        return self._send({"argv": list(argv)}, stream or _binary_stdout())
+
+    def stop(self):
+        """Tells the daemon to exit."""
+        return self._send({"stop": True}, _binary_stdout())
+
+
+def _binary_stdout():
+    return getattr(sys.stdout, 'buffer', sys.stdout)
+
+
+def main(argv=None):
+    argv = list(argv or sys.argv)[1:]
+    client = DaemonClient()
+    if "--stop" in argv:
+        sys.exit(client.stop())
+    sys.exit(client.run(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@
 
 """Decorators useful to the tests."""
 
+import os
 from functools import wraps
 
 from proboscis.asserts import assert_raises_instance
@@ -22,7 +23,9 @@ from proboscis import compatability
 from proboscis.core import TestRegistry
 
 
-DEFAULT_REGISTRY = TestRegistry()
+# Setting PROBOSCIS_LAZY_REGISTRATION=1 defers registration until planning.
+DEFAULT_REGISTRY = TestRegistry(
+    lazy=os.environ.get("PROBOSCIS_LAZY_REGISTRATION", "0") != "0")
 
 
 def expect_exception(exception_type):
@@ -113,6 +116,31 @@ def test(home=None, **kwargs):
     :param enabled: By default, true. If set to false this test will not run.
     :param always_run: If true this test will run even if the tests listed in
                        depends_on or depends_on_groups have failed.
+    :param priority: How valuable this test is when a time budget means not
+                     everything can run. Each step up doubles its value. By
+                     default this is 0, or the priority of the class.
+    :param retries: How many times to try a failing test function or method
+                    again before it fails and its dependents are skipped. By
+                    default this is 0.
+    :param retry_on: An exception class, or tuple of them, which may be
+                     retried. Other failures are not. By default any
+                     exception is retried.
+    :param backoff: Seconds to wait before the first retry, doubling for
+                    each one after, or a function given the attempt number
+                    (counting from zero) which returns the seconds to wait.
+    :param resources: A list of strings naming expensive things this test
+                      needs, such as a server or a data set, so that
+                      "--order=resources" can run the tests sharing them
+                      together. By default this is an empty list.
+    :param fixtures: A list of functions decorated with @fixture which this
+                     test calls, so each is built before the first test
+                     using it and torn down after the last. Fixtures also
+                     count as resources.
+    :param cacheable: If true this test is deterministic, so once it passes
+                      it isn't run again until its code or inputs change.
+                      By default this is False.
+    :param inputs: What a cacheable test depends on besides code, or a
+                   function returning it. Its repr is part of the cache key.
     """
     if home:
         return DEFAULT_REGISTRY.register(home, **kwargs)
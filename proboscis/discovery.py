@@ -0,0 +1,285 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Finds tests by reading the source of modules instead of importing them.
+
+Running with "--discover=DIR" parses every Python file under DIR and notes
+the functions, classes and methods decorated with @test, @before_class,
+@after_class or @factory, as well as module level calls to register, along
+with the groups and depends_on_groups they list. Only the modules holding
+tests in the groups selected with "--group", or in the groups those depend
+on, are then imported. "--show-plan" and "--list-groups" print what was
+found without importing anything.
+
+Arguments which aren't literals can't be read this way, so a module using
+them for groups, failing to parse, or holding a factory is always imported,
+and every module is if what a test depends on can't be read. Tests
+created any other way, such as inside functions, are only found if their
+module is imported for another reason. What each file holds is kept in
+.proboscis/discovery.json and only read again once its modification time
+changes.
+
+"""
+
+import ast
+import os
+import sys
+
+from proboscis.storage import load_json
+from proboscis.storage import save_json
+from proboscis.storage import state_path
+
+
+DECORATORS = ("test", "before_class", "after_class", "factory")
+
+
+def call_name(node):
+    """Returns the name of what a decorator or call uses, without its module.
+    """
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def literal_strings(node):
+    """Returns the strings a literal list or tuple holds, or None."""
+    try:
+        value = ast.literal_eval(node)
+    except ValueError:
+        return None
+    if not isinstance(value, (list, tuple)):
+        return None
+    for item in value:
+        if not isinstance(item, str):
+            return None
+    return list(value)
+
+
+def make_record(kind, name, node, call):
+    """Describes one decoration or register call as a dict.
+
+    groups and depends_on_groups are None when they couldn't be read.
+
+    """
+    record = {"kind": kind, "name": name, "line": node.lineno,
+              "groups": [], "depends_on_groups": []}
+    if not isinstance(call, ast.Call):
+        return record
+    if getattr(call, 'starargs', None) or getattr(call, 'kwargs', None):
+        record["groups"] = record["depends_on_groups"] = None
+    for keyword in call.keywords:
+        if keyword.arg is None:  # **kwargs
+            record["groups"] = record["depends_on_groups"] = None
+        elif keyword.arg in ("groups", "depends_on_groups"):
+            record[keyword.arg] = literal_strings(keyword.value)
+    return record
+
+
+def decorations(node, prefix=""):
+    """Returns a record for each Proboscis decorator on a definition."""
+    records = []
+    for decorator in node.decorator_list:
+        kind = call_name(decorator)
+        if kind in DECORATORS:
+            records.append(make_record(kind, prefix + node.name, node,
+                                       decorator))
+    return records
+
+
+def inherit_groups(record, parent):
+    """Adds the groups of a decorated class to one of its methods."""
+    for name in ("groups", "depends_on_groups"):
+        if record[name] is None or parent[name] is None:
+            record[name] = None
+        else:
+            record[name] = record[name] + [group for group in parent[name]
+                                           if group not in record[name]]
+
+
+def parse_source(source, filename="<unknown>"):
+    """Returns records of the tests a module's source declares."""
+    tree = ast.parse(source, filename)
+    records = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            class_records = decorations(node)
+            records += class_records
+            for item in node.body:
+                if not isinstance(item, ast.FunctionDef):
+                    continue
+                for record in decorations(item, node.name + "."):
+                    for parent in class_records:
+                        inherit_groups(record, parent)
+                    records.append(record)
+        elif isinstance(node, ast.FunctionDef):
+            records += decorations(node)
+        elif isinstance(node, ast.Expr) and \
+            isinstance(node.value, ast.Call) and \
+            call_name(node.value) == "register":
+            records.append(make_record("register", None, node, node.value))
+    return records
+
+
+def parse_file(path):
+    """Returns the records of a file, or None if it can't be parsed."""
+    source = open(path, 'r')
+    try:
+        try:
+            return parse_source(source.read(), path)
+        except (SyntaxError, ValueError):
+            return None
+    finally:
+        source.close()
+
+
+class DiscoveryIndex(object):
+    """Maps source files to the records parsed from them."""
+
+    def __init__(self, path=None):
+        self.path = path or state_path("discovery.json")
+        self.files = load_json(self.path, {}).get("files", {})
+        self.changed = False
+
+    def records(self, path):
+        """Returns the records of a file, parsing it only if it changed."""
+        mtime = os.path.getmtime(path)
+        known = self.files.get(path)
+        if known is None or known["mtime"] != mtime:
+            known = {"mtime": mtime, "records": parse_file(path)}
+            self.files[path] = known
+            self.changed = True
+        return known["records"]
+
+    def scan(self, directory):
+        """Returns a dict of path to records for each file holding tests.
+
+        Saves the index if any file had to be parsed.
+
+        """
+        found = {}
+        seen = set()
+        for parent, dirs, names in os.walk(os.path.abspath(directory)):
+            dirs[:] = sorted(name for name in dirs
+                             if not name.startswith("."))
+            for name in sorted(names):
+                if not name.endswith(".py"):
+                    continue
+                path = os.path.join(parent, name)
+                seen.add(path)
+                records = self.records(path)
+                if records is None or records:
+                    found[path] = records
+        for path in list(self.files.keys()):
+            if path.startswith(os.path.abspath(directory) + os.sep) and \
+                path not in seen:
+                del self.files[path]
+                self.changed = True
+        if self.changed:
+            save_json(self.path, {"files": self.files})
+            self.changed = False
+        return found
+
+
+def select_modules(files, groups):
+    """Returns the paths of the files to import to run the given groups.
+
+    Those holding tests in the groups, or in the groups they depend on, are
+    chosen, along with those holding factories or tests whose groups can't
+    be read. If it isn't known what some test depends on, or no groups are
+    given, every file holding tests is chosen.
+
+    """
+    if not groups:
+        return sorted(files.keys())
+    chosen = set()
+    wanted = set(groups)
+    remaining = list(groups)
+    for path, records in files.items():
+        if records is None:
+            chosen.add(path)
+            continue
+        for record in records:
+            if record["depends_on_groups"] is None:
+                return sorted(files.keys())
+            if record["kind"] == "factory" or record["groups"] is None:
+                chosen.add(path)
+                remaining += record["depends_on_groups"]
+    while remaining:
+        group = remaining.pop()
+        wanted.add(group)
+        for path, records in files.items():
+            for record in records or []:
+                if not record["groups"] or group not in record["groups"]:
+                    continue
+                chosen.add(path)
+                for needed in record["depends_on_groups"]:
+                    if needed not in wanted:
+                        wanted.add(needed)
+                        remaining.append(needed)
+    return sorted(chosen)
+
+
+def module_name(path, root):
+    """Returns the name a file under root is imported with."""
+    name = os.path.splitext(os.path.relpath(path, root))[0]
+    name = name.replace(os.sep, ".")
+    if name.endswith(".__init__"):
+        name = name[:-len(".__init__")]
+    return name
+
+
+def import_modules(paths, root=None):
+    """Imports the given files, which must be under root, in order."""
+    root = os.path.abspath(root or os.getcwd())
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    for path in paths:
+        __import__(module_name(path, root))
+
+
+def write_plan(files, paths, stream, root=None):
+    """Prints the tests found in the given files, without importing them."""
+    root = os.path.abspath(root or os.getcwd())
+    stream.write("   *  *  *  Provisional Test Plan  *  *  *\n")
+    for path in paths:
+        stream.write("%s\n" % os.path.relpath(path, root))
+        if files[path] is None:
+            stream.write("    (couldn't be parsed)\n")
+            continue
+        for record in files[path]:
+            if record["kind"] == "register":
+                continue
+            groups = record["groups"]
+            stream.write("    %5d %-13s %s  groups: %s\n"
+                         % (record["line"], record["kind"], record["name"],
+                            groups is None and "?" or ", ".join(groups)))
+
+
+def write_groups(files, stream):
+    """Prints each group found and how many tests declare it."""
+    counts = {}
+    for records in files.values():
+        for record in records or []:
+            if record["kind"] in ("register", "factory") or \
+                record["groups"] is None:
+                continue
+            for group in record["groups"]:
+                counts[group] = counts.get(group, 0) + 1
+    for group in sorted(counts):
+        stream.write("%s (%d)\n" % (group, counts[group]))
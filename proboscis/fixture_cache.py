@@ -0,0 +1,149 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Keeps the values of fixtures declared with cache=True between runs.
+
+Each value is stored in .proboscis/fixtures under the fixture's fingerprint,
+a hash of its name, its source and its inputs, so changing any of those
+builds it again. Values which are buffers (bytes, bytearray or memoryview)
+are written as they are and read back memory-mapped; anything else is
+pickled.
+
+Entries unused for longer than the maximum age are removed, then the least
+recently used ones until the total size is under the limit.
+
+"""
+
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+from proboscis.storage import state_path
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+# Defaults for how much the cache may hold and for how long.
+MAX_BYTES = 1024 * 1024 * 1024
+MAX_AGE = 7 * 24 * 60 * 60.0
+
+_BUFFER = ".bin"
+_PICKLE = ".pickle"
+
+
+def is_buffer(value):
+    return isinstance(value, (bytes, bytearray, memoryview))
+
+
+class FixtureCache(object):
+    """A directory of fixture values named by their fingerprints."""
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.directory = directory or state_path("fixtures")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def path(self, fingerprint, suffix):
+        return os.path.join(self.directory, fingerprint + suffix)
+
+    def load(self, fingerprint):
+        """Returns a tuple of (found, value)."""
+        path = self.path(fingerprint, _BUFFER)
+        if os.path.exists(path):
+            source = open(path, 'rb')
+            try:
+                if os.fstat(source.fileno()).st_size == 0:
+                    value = bytes()  # Empty files can't be mapped.
+                else:
+                    value = mmap.mmap(source.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+            finally:
+                source.close()
+            os.utime(path, None)
+            return (True, value)
+        path = self.path(fingerprint, _PICKLE)
+        if not os.path.exists(path):
+            return (False, None)
+        source = open(path, 'rb')
+        try:
+            try:
+                value = pickle.load(source)
+            except Exception:
+                os.remove(path)  # Written by something incompatible.
+                return (False, None)
+        finally:
+            source.close()
+        os.utime(path, None)
+        return (True, value)
+
+    def store(self, fingerprint, value):
+        """Saves a value, returning False if it couldn't be pickled."""
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             suffix=".tmp")
+        output = os.fdopen(handle, 'wb')
+        try:
+            try:
+                if is_buffer(value):
+                    output.write(value)
+                    suffix = _BUFFER
+                else:
+                    pickle.dump(value, output, pickle.HIGHEST_PROTOCOL)
+                    suffix = _PICKLE
+            finally:
+                output.close()
+        except Exception:
+            os.remove(temp_path)
+            sys.stderr.write("Can't cache fixture value: %s\n"
+                             % sys.exc_info()[1])
+            return False
+        os.rename(temp_path, self.path(fingerprint, suffix))
+        self.evict()
+        return True
+
+    def entries(self):
+        """Returns (last used, size, path) for each entry, oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_BUFFER) and not name.endswith(_PICKLE):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed by another process.
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self, now=None):
+        """Removes entries which are too old, then enough to fit the size."""
+        now = now or time.time()
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        for used, size, path in entries:
+            if now - used <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
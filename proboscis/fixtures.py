@@ -0,0 +1,228 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Expensive things shared by several tests, built lazily.
+
+A fixture is a function decorated with @fixture which returns a value, or
+yields it once and then tears it down. Tests list the fixtures they call in
+the "fixtures" argument of @test. Calling a fixture from a test returns the
+value, building it the first time; once every case in the plan that listed
+it has finished, it's torn down. Whatever is left is torn down when the run
+ends.
+
+The scope decides which tests share a value: "session" builds one for the
+whole run, "group" one for each group (the first group a test belongs to)
+and "class" one for each instance of a test class.
+
+A value can't be shared between processes, so when running with workers the
+tests sharing one are kept in the same worker process.
+
+Fixtures declared with cache=True keep their value between runs (see
+proboscis.fixture_cache) and are only built again once their source or
+inputs change. They must return their value rather than yield it.
+
+"""
+
+import hashlib
+import inspect
+import sys
+import traceback
+import types
+from functools import update_wrapper
+
+from proboscis.case import CaseObserver
+from proboscis.case import RETRY
+from proboscis.fixture_cache import FixtureCache
+from proboscis.history import source_hash
+from proboscis.journal import expected_tests
+
+
+SESSION = "session"
+GROUP = "group"
+CLASS = "class"
+
+SCOPES = (SESSION, GROUP, CLASS)
+
+
+class Fixture(object):
+    """Wraps a function building a value tests share within a scope."""
+
+    def __init__(self, func, scope=SESSION, cache=False, inputs=None):
+        if scope not in SCOPES:
+            raise ValueError("Unknown fixture scope %r; expected one of %s."
+                             % (scope, ", ".join(SCOPES)))
+        if cache and inspect.isgeneratorfunction(func):
+            raise ValueError("Cached fixture %s must return its value, as "
+                             "it's kept after the run." % func.__name__)
+        update_wrapper(self, func)
+        self.func = func
+        self.scope = scope
+        self.name = func.__name__
+        self.cache = cache
+        self.inputs = inputs
+
+    def fingerprint(self):
+        """Returns a hash of this fixture's name, source and inputs."""
+        inputs = self.inputs
+        if callable(inputs):
+            inputs = inputs()
+        text = "%s:%s\n%s\n%r" % (self.func.__module__,
+                                  getattr(self.func, '__qualname__',
+                                          self.name),
+                                  source_hash(self.func), inputs)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def key(self, case):
+        """Returns what decides which instance of this a case gets."""
+        if case is None or self.scope == SESSION:
+            return None
+        if self.scope == GROUP:
+            groups = case.entry.info.groups
+            return groups and groups[0] or None
+        if case.state is not None:
+            return case.state
+        return case
+
+    def __call__(self):
+        return _active.get(self)
+
+    def __repr__(self):
+        return "Fixture(%s, scope=%r)" % (self.name, self.scope)
+
+
+def fixture(func=None, scope=SESSION, cache=False, inputs=None):
+    """Decorates a function which builds something tests share.
+
+    :param scope: "session", "group" or "class". By default "session".
+    :param cache: If true the value is kept between runs.
+    :param inputs: What the value is built from, or a function returning
+                   it, such as the path and modification time of a file.
+                   A cached value is only used while its repr is the same.
+
+    """
+    if func is not None:
+        return Fixture(func, scope, cache, inputs)
+
+    def cb_fixture(func_2):
+        return Fixture(func_2, scope, cache, inputs)
+    return cb_fixture
+
+
+class FixtureManager(CaseObserver):
+    """Builds fixtures when first called and tears them down when unused.
+
+    Given the cases of a plan, counts how many will finish using each
+    instance of a fixture, and tears it down once that many have.
+
+    """
+
+    def __init__(self, cases=(), cache=None):
+        self.cache = cache
+        self.current = None
+        self.values = {}
+        self.built = []
+        self.remaining = {}
+        for case in cases:
+            if not case.entry.info.enabled or case.entry.home is None:
+                continue
+            for used in case.entry.info.fixtures:
+                instance = (used, used.key(case))
+                self.remaining[instance] = self.remaining.get(instance, 0) \
+                    + expected_tests(case)
+
+    def get(self, used):
+        """Returns the value of a fixture for the current case."""
+        instance = (used, used.key(self.current))
+        if instance not in self.values:
+            self.values[instance] = self.build(used)
+            self.built.append(instance)
+        value, generator, error = self.values[instance]
+        if error is not None:
+            raise error
+        return value
+
+    def build(self, used):
+        """Returns a tuple of (value, generator, exception raised)."""
+        try:
+            if used.cache:
+                return (self.build_cached(used), None, None)
+            result = used.func()
+            if isinstance(result, types.GeneratorType):
+                return (next(result), result, None)
+            return (result, None, None)
+        except Exception:
+            return (None, None, sys.exc_info()[1])
+
+    def build_cached(self, used):
+        """Returns a cached fixture's value, building it on a miss."""
+        if self.cache is None:
+            self.cache = FixtureCache()
+        fingerprint = used.fingerprint()
+        found, value = self.cache.load(fingerprint)
+        if not found:
+            value = used.func()
+            self.cache.store(fingerprint, value)
+        return value
+
+    def tear_down(self, instance):
+        value, generator, error = self.values.pop(instance)
+        self.built.remove(instance)
+        if generator is None:
+            return
+        try:
+            next(generator)
+        except StopIteration:
+            return
+        except Exception:
+            sys.stderr.write("Error tearing down fixture %s:\n"
+                             % instance[0].name)
+            traceback.print_exc()
+            return
+        sys.stderr.write("Fixture %s yielded more than once.\n"
+                         % instance[0].name)
+
+    def case_started(self, case):
+        self.current = case
+
+    def case_finished(self, case, outcome, duration):
+        self.current = None
+        if outcome == RETRY:
+            return
+        for used in case.entry.info.fixtures:
+            instance = (used, used.key(case))
+            if instance not in self.remaining:
+                continue
+            self.remaining[instance] -= 1
+            if self.remaining[instance] <= 0 and instance in self.values:
+                self.tear_down(instance)
+
+    def run_finished(self):
+        """Tears down everything still built, newest first."""
+        for instance in reversed(list(self.built)):
+            self.tear_down(instance)
+
+
+_active = FixtureManager()
+
+
+def active_manager():
+    """Returns the FixtureManager fixtures are currently taken from."""
+    return _active
+
+
+def activate(manager):
+    """Makes fixtures take their values from manager."""
+    global _active
+    _active = manager
@@ -0,0 +1,200 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Remembers how each test case did in recent runs.
+
+Results are kept in .proboscis/results.json, keyed by TestCase.identity, so
+they survive from one run to the next even as the plan changes. Each case
+keeps a short list of records, newest last, noting the outcome, how long the
+case took and a hash of its source code when it ran.
+
+"""
+
+import hashlib
+import inspect
+import time
+
+from proboscis.case import CaseObserver
+from proboscis.case import ERROR
+from proboscis.case import FAIL
+from proboscis.case import PASS
+from proboscis.case import RETRY
+from proboscis.case import worst_outcome
+from proboscis.storage import load_json
+from proboscis.storage import save_json
+from proboscis.storage import state_path
+
+
+# How many runs are remembered for each case.
+HISTORY_LENGTH = 20
+
+# How many of the latest runs count as "recent" when ordering by failures.
+RECENT_RUNS = 3
+
+# A case is flaky if its outcome flipped between at least this share of
+# consecutive runs, out of at least FLAKY_MINIMUM_PAIRS, with the same source.
+FLAKY_THRESHOLD = 0.3
+FLAKY_MINIMUM_PAIRS = 3
+
+
+def source_hash(home):
+    """Returns a hash of the source code of a test function or class."""
+    try:
+        source = inspect.getsource(home)
+    except (IOError, OSError, TypeError):
+        return None
+    if not isinstance(source, bytes):
+        source = source.encode("utf-8")
+    return hashlib.sha1(source).hexdigest()
+
+
+class ResultHistory(CaseObserver):
+    """Loads past results and records the results of the current run."""
+
+    def __init__(self, path=None):
+        self.path = path or state_path("results.json")
+        self.cases = load_json(self.path, {}).get("cases", {})
+        self.current = {}
+        self._hashes = {}
+
+    def source_hash(self, case):
+        """Returns the hash of a case's source, computed once per home."""
+        home = case.entry.home
+        if home not in self._hashes:
+            self._hashes[home] = source_hash(home)
+        return self._hashes[home]
+
+    def case_finished(self, case, outcome, duration):
+        identity = case.identity
+        if identity is None or outcome == RETRY:
+            return
+        record = self.current.get(identity)
+        if record is None:
+            self.current[identity] = {"outcome": outcome,
+                                      "duration": duration,
+                                      "time": time.time(),
+                                      "source": self.source_hash(case)}
+        else:  # unittest.TestCase classes finish once per test method.
+            record["outcome"] = worst_outcome(record["outcome"], outcome)
+            record["duration"] += duration
+
+    def run_finished(self):
+        """Adds this run's results to the history and saves it."""
+        if not self.current:
+            return
+        # Re-read the file in case another process saved results meanwhile.
+        latest = load_json(self.path, {}).get("cases", {})
+        for identity, record in self.current.items():
+            records = latest.setdefault(identity, [])
+            records.append(record)
+            del records[:-HISTORY_LENGTH]
+        self.cases = latest
+        self.current = {}
+        save_json(self.path, {"cases": self.cases})
+
+    def records(self, identity):
+        """Returns the saved records for a case, oldest first."""
+        return self.cases.get(identity, [])
+
+    def last_outcome(self, identity):
+        """Returns the outcome of a case in the last run it was part of."""
+        records = self.records(identity)
+        if not records:
+            return None
+        return records[-1]["outcome"]
+
+    def failed_cases(self, cases):
+        """Returns the cases which failed or had errors when last run."""
+        return [case for case in cases
+                if self.last_outcome(case.identity) in (FAIL, ERROR)]
+
+    def runs_since_failure(self, identity):
+        """Returns how many runs ago a case last failed, or None."""
+        records = self.records(identity)
+        for age, record in enumerate(reversed(records)):
+            if record["outcome"] in (FAIL, ERROR):
+                return age
+        return None
+
+    def source_changed(self, case):
+        """True if a case's source differs from when it last ran.
+
+        Cases which have never run count as changed.
+
+        """
+        records = self.records(case.identity)
+        if not records:
+            return True
+        return records[-1].get("source") != self.source_hash(case)
+
+    def flakiness(self, identity):
+        """Returns how often a case's outcome flipped while its source didn't.
+
+        Looks at each pair of consecutive runs in which the case passed or
+        failed with the same source hash, and returns the share in which it
+        went from passing to failing or back, or None if there are fewer
+        than FLAKY_MINIMUM_PAIRS such pairs.
+
+        """
+        records = [record for record in self.records(identity)
+                   if record["outcome"] in (PASS, FAIL, ERROR)]
+        pairs = 0
+        flips = 0
+        for earlier, later in zip(records, records[1:]):
+            source = earlier.get("source")
+            if source is None or source != later.get("source"):
+                continue
+            pairs += 1
+            if (earlier["outcome"] == PASS) != (later["outcome"] == PASS):
+                flips += 1
+        if pairs < FLAKY_MINIMUM_PAIRS:
+            return None
+        return float(flips) / pairs
+
+    def flaky_cases(self, cases, threshold=FLAKY_THRESHOLD):
+        """Returns the cases whose flakiness is at least threshold."""
+        flaky = []
+        for case in cases:
+            if case.identity is None:
+                continue
+            score = self.flakiness(case.identity)
+            if score is not None and score >= threshold:
+                flaky.append(case)
+        return flaky
+
+
+class HistoryOrder(object):
+    """A sort key for TestPlan.reorder which uses a ResultHistory.
+
+    Cases which failed in one of the last few runs sort first, the most
+    recent failures ahead of older ones, followed by cases whose source has
+    changed since they last ran. With changed_first the two are swapped.
+
+    """
+
+    def __init__(self, history, changed_first=False):
+        self.history = history
+        self.changed_first = changed_first
+
+    def __call__(self, case):
+        if case.identity is None:
+            return (RECENT_RUNS, 1)
+        age = self.history.runs_since_failure(case.identity)
+        if age is None or age > RECENT_RUNS:
+            age = RECENT_RUNS
+        changed = not self.history.source_changed(case) and 1 or 0
+        if self.changed_first:
+            return (changed, age)
+        return (age, changed)
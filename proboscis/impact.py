@@ -0,0 +1,244 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Records the code each test runs and picks the tests affected by a change.
+
+Running with "--record-impact" notes which functions (by file and line range)
+run during each case and saves this in .proboscis/impact.json. Later, passing
+"--changed=PATH" where PATH holds either a unified diff or a list of file
+names runs only the cases which touched the changed lines, plus the cases
+they depend on. Cases the index knows nothing about always run.
+
+"""
+
+import dis
+import os
+import re
+import sys
+
+from proboscis.case import CaseObserver
+from proboscis.storage import load_json
+from proboscis.storage import save_json
+from proboscis.storage import state_path
+
+
+def code_line_range(code):
+    """Returns the first and last line numbers of a code object."""
+    lines = [line for offset, line in dis.findlinestarts(code)
+             if line is not None]
+    first = code.co_firstlineno
+    return [first, max(lines + [first])]
+
+
+class ImpactRecorder(CaseObserver):
+    """Records which functions are entered while each case runs.
+
+    Only function entry is watched, never individual lines, and each code
+    object is noted just once per case, which keeps the overhead low. Uses
+    sys.monitoring when it exists (Python 3.12+) and sys.settrace otherwise.
+    A trace function already installed, such as coverage's or a debugger's,
+    keeps being called and is put back after each case. If every tool id
+    sys.monitoring offers is taken, nothing is recorded.
+
+    Cases have to run in this process to be recorded, so this does nothing
+    for cases sent to forked workers.
+
+    """
+
+    def __init__(self, index=None, root=None):
+        self.index = index or ImpactIndex()
+        self.root = os.path.abspath(root or os.getcwd())
+        self.seen = None
+        self.current = None
+        self.touched = {}  # What each case touched during this run.
+        self._tool = None
+        self._previous = None  # The trace function installed before ours.
+
+    def _note(self, code):
+        if code in self.seen:
+            return
+        self.seen.add(code)
+        path = os.path.abspath(code.co_filename)
+        if path.startswith(self.root + os.sep):
+            relative = os.path.relpath(path, self.root)
+            self.current.setdefault(relative, []).append(
+                code_line_range(code))
+
+    def _trace(self, frame, event, arg):
+        if event == 'call':
+            self._note(frame.f_code)
+        if self._previous is not None:
+            return self._previous(frame, event, arg)
+        return None  # Don't trace lines within the function.
+
+    def _on_start(self, code, offset):
+        self._note(code)
+        return sys.monitoring.DISABLE
+
+    def case_started(self, case):
+        self.seen = set()
+        self.current = {}
+        monitoring = getattr(sys, 'monitoring', None)
+        if monitoring is not None:
+            # Ids 3 and 4 aren't reserved for any kind of tool.
+            for tool in (monitoring.COVERAGE_ID, 3, 4):
+                if monitoring.get_tool(tool) is None:
+                    break
+            else:
+                self.current = None  # No id is free, so don't record.
+                return
+            monitoring.use_tool_id(tool, "proboscis")
+            self._tool = tool
+            monitoring.register_callback(tool, monitoring.events.PY_START,
+                                         self._on_start)
+            monitoring.set_events(tool, monitoring.events.PY_START)
+            monitoring.restart_events()
+            return
+        self._previous = sys.gettrace()
+        sys.settrace(self._trace)
+
+    def case_finished(self, case, outcome, duration):
+        if self.current is None:
+            return  # The case didn't run in this process.
+        if self._tool is not None:
+            monitoring = sys.monitoring
+            monitoring.set_events(self._tool, 0)
+            monitoring.register_callback(self._tool,
+                                         monitoring.events.PY_START, None)
+            monitoring.free_tool_id(self._tool)
+            self._tool = None
+        else:
+            sys.settrace(self._previous)
+            self._previous = None
+        if case.identity is not None:
+            # unittest.TestCase classes finish once per test method.
+            touched = self.touched.setdefault(case.identity, {})
+            for path, ranges in self.current.items():
+                known = touched.setdefault(path, [])
+                known += [item for item in ranges if item not in known]
+            self.index.record(case.identity, touched)
+        self.seen = None
+        self.current = None
+
+    def run_finished(self):
+        self.index.save()
+
+
+class ImpactIndex(object):
+    """Maps case identities to the files and line ranges they touched."""
+
+    def __init__(self, path=None):
+        self.path = path or state_path("impact.json")
+        self.cases = load_json(self.path, {}).get("cases", {})
+
+    def record(self, identity, touched):
+        self.cases[identity] = touched
+
+    def save(self):
+        save_json(self.path, {"cases": self.cases})
+
+    def is_impacted(self, identity, changes):
+        """True if a case touched any of the changes.
+
+        Cases which were never recorded count as impacted.
+
+        """
+        touched = self.cases.get(identity)
+        if touched is None:
+            return True
+        for path, ranges in changes.items():
+            if path not in touched:
+                continue
+            if ranges is None:
+                return True
+            for first, last in touched[path]:
+                for start, end in ranges:
+                    if start <= last and first <= end:
+                        return True
+        return False
+
+
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def diff_path(header):
+    """Returns the path of a "--- " or "+++ " line, or None for /dev/null."""
+    path = header[4:].split("\t")[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith("a/") or path.startswith("b/"):
+        path = path[2:]
+    return os.path.normpath(path)
+
+
+def parse_changes(text):
+    """Reads a unified diff, or a list of file names, into a dict.
+
+    Keys are file paths; values are lists of (start, end) line ranges or
+    None when the whole file should be treated as changed. Ranges cover the
+    lines of the new file, widened by one line so deletions count too.
+    Files which were deleted or renamed count as wholly changed, under both
+    their old and new names.
+
+    """
+    changes = {}
+    if not re.search(r"^(\+\+\+ |--- |diff --git |rename from )", text,
+                     re.MULTILINE):
+        for line in text.splitlines():
+            if line.strip():
+                changes[os.path.normpath(line.strip())] = None
+        return changes
+    path = None
+    lines = text.splitlines()
+    for number, line in enumerate(lines):
+        if line.startswith("rename from ") or line.startswith("rename to "):
+            renamed = line.split(" ", 2)[2].strip()
+            changes[os.path.normpath(renamed)] = None
+            path = None
+        elif line.startswith("--- ") and number + 1 < len(lines) and \
+            lines[number + 1].startswith("+++ "):
+            old = diff_path(line)
+            path = diff_path(lines[number + 1])
+            if old is not None and old != path:
+                changes[old] = None
+            if path is not None and changes.get(path, []) is not None:
+                changes.setdefault(path, [])
+            else:
+                path = None
+        elif path is not None:
+            match = _HUNK.match(line)
+            if match:
+                start = int(match.group(1))
+                length = match.group(2)
+                length = length is None and 1 or int(length)
+                changes[path].append((max(start - 1, 0), start + length))
+    return changes
+
+
+def impacted_homes(cases, changes, index=None):
+    """Returns the homes of the cases impacted by changes.
+
+    Pass the result to TestPlan.filter so their dependencies run too.
+
+    """
+    index = index or ImpactIndex()
+    homes = []
+    for case in cases:
+        identity = case.identity
+        if identity is None or case.entry.home in homes:
+            continue
+        if index.is_impacted(identity, changes):
+            homes.append(case.entry.home)
+    return homes
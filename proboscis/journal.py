@@ -0,0 +1,156 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Checkpoints a run so it can be resumed after a crash.
+
+As each case finishes a line of JSON is appended to .proboscis/journal.jsonl
+and flushed. Running with "--resume" reads the journal back and skips the
+cases it lists, except where a remaining case needs one re-run to rebuild
+its state, such as the before_class method of a partly finished class.
+
+The journal is only kept when running with "--history" or "--resume", and
+a run started without "--resume" begins a new one. Resuming when there's
+no journal prints a warning and runs every case.
+
+"""
+
+import json
+import os
+import sys
+import unittest
+
+from proboscis.case import CaseObserver
+from proboscis.case import PASS
+from proboscis.case import RETRY
+from proboscis.case import worst_outcome
+from proboscis.sorting import critical_prerequisites
+from proboscis.sorting import prerequisite_closure
+from proboscis.storage import make_parent_directory
+from proboscis.storage import state_path
+
+
+def read_journal(path):
+    """Returns a dict of identity to (outcome, tests finished).
+
+    Lines which are incomplete or can't be parsed, such as one cut short by
+    a crash, are ignored.
+
+    """
+    entries = {}
+    try:
+        journal = open(path, 'r')
+    except IOError:
+        return entries
+    try:
+        for line in journal:
+            if not line.endswith("\n"):
+                break
+            try:
+                entry = json.loads(line)
+                identity = entry["case"]
+                outcome = entry["outcome"]
+            except (ValueError, KeyError, TypeError):
+                continue
+            if identity in entries:
+                previous, count = entries[identity]
+                entries[identity] = (worst_outcome(previous, outcome),
+                                     count + 1)
+            else:
+                entries[identity] = (outcome, 1)
+    finally:
+        journal.close()
+    return entries
+
+
+def expected_tests(case):
+    """Returns how many times a case will be reported as finished."""
+    home = case.entry.home
+    if isinstance(home, type) and issubclass(home, unittest.TestCase):
+        return max(len(unittest.TestLoader().getTestCaseNames(home)), 1)
+    return 1
+
+
+class Journal(CaseObserver):
+    """Appends the outcome of each case to the journal as it finishes."""
+
+    def __init__(self, path=None, resume=False):
+        self.path = path or state_path("journal.jsonl")
+        self.resuming = resume
+        self.entries = {}
+        self.file = None
+        if resume:
+            self.entries = read_journal(self.path)
+
+    def _open(self):
+        make_parent_directory(self.path)
+        if not self.resuming:
+            return open(self.path, 'w')
+        journal = open(self.path, 'a+')
+        # Cut off a line left half written, so appended lines stay whole.
+        journal.seek(0)
+        contents = journal.read()
+        if contents and not contents.endswith("\n"):
+            journal.seek(0)
+            journal.truncate(contents.rfind("\n") + 1)
+        journal.seek(0, os.SEEK_END)
+        return journal
+
+    def case_finished(self, case, outcome, duration):
+        identity = case.identity
+        if identity is None or outcome == RETRY:
+            return
+        if self.file is None:
+            self.file = self._open()
+        self.file.write(json.dumps({"case": identity,
+                                    "outcome": outcome}) + "\n")
+        self.file.flush()
+
+    def run_finished(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def is_complete(self, case):
+        """True if the journal shows every test in a case finished."""
+        entry = self.entries.get(case.identity)
+        return entry is not None and entry[1] >= expected_tests(case)
+
+    def resume(self, plan, stream=None):
+        """Removes the cases already finished from a plan.
+
+        Finished cases which passed and which a remaining case critically
+        depends on, directly or not, are kept so the state they built (for
+        instance by a before_class method, an earlier method of the same
+        class, or a function listed in depends_on) gets rebuilt. Finished
+        cases which didn't pass still cause their dependents to be skipped.
+
+        If there's no journal a warning is written to stream (by default
+        sys.stderr) and the plan is left alone.
+
+        """
+        if not os.path.exists(self.path):
+            (stream or sys.stderr).write(
+                "No journal found at %s, so every test will run. Only runs "
+                "with --history or --resume can be resumed.\n" % self.path)
+            return
+        keep = prerequisite_closure(
+            [case for case in plan.tests if not self.is_complete(case)],
+            critical_prerequisites(plan.tests),
+            lambda case: self.entries[case.identity][0] == PASS)
+        for case in plan.tests:
+            if case not in keep and \
+               self.entries[case.identity][0] != PASS:
+                case.fail_test()
+        plan.tests = [case for case in plan.tests if case in keep]
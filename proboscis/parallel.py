@@ -0,0 +1,815 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Runs a sorted TestPlan by dispatching batches of cases to executors.
+
+The unittest runner used by TestProgram walks the plan one test at a time.
+This module instead tracks which cases are ready (all of their dependencies
+have finished) and hands them to an executor. Cases nobody depends on can be
+grouped into batches so that a single message to a worker carries many tiny
+tests, with the results coming back as one list of compact tuples.
+
+"""
+
+import heapq
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+import unittest
+
+from proboscis.case import ERROR
+from proboscis.case import FAIL
+from proboscis.case import PASS
+from proboscis.case import RETRY
+from proboscis.case import SKIP
+from proboscis.case import TestSuiteCreator
+from proboscis.case import worst_outcome
+from proboscis.fixtures import active_manager
+from proboscis.journal import expected_tests
+from proboscis.results import active_store
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+# Ways CaseScheduler can relax soft (runs_after) edges.
+RELAX_HINTS = "hints"
+RELAX_IDLE = "idle"
+
+# Scheduling states of a case.
+_BLOCKED, _WAITING, _QUEUED = range(3)
+
+
+def describe_case(case):
+    """Returns a short human readable name for a case."""
+    home = case.entry.home
+    name = getattr(home, '__name__', str(home))
+    return "%s (%s)" % (name, getattr(home, '__module__', '?'))
+
+
+class CaseResult(unittest.TestResult):
+    """Collects the outcome of the unittest tests belonging to one case."""
+
+    def __init__(self):
+        unittest.TestResult.__init__(self)
+        self.outcome = PASS
+        self.details = []
+        self.exception_types = []
+
+    def _add(self, outcome, detail, exception_type=None):
+        self.outcome = worst_outcome(self.outcome, outcome)
+        self.details.append(detail)
+        if outcome in (FAIL, ERROR):
+            self.exception_types.append(exception_type)
+
+    def addError(self, test, err):
+        unittest.TestResult.addError(self, test, err)
+        self._add(ERROR, self._exc_info_to_string(err, test), err[0])
+
+    def addFailure(self, test, err):
+        unittest.TestResult.addFailure(self, test, err)
+        self._add(FAIL, self._exc_info_to_string(err, test), err[0])
+
+    def can_retry(self, retry_on):
+        """True if every failure was an exception of a type in retry_on."""
+        for exception_type in self.exception_types:
+            if exception_type is None or \
+               not issubclass(exception_type, retry_on):
+                return False
+        return len(self.exception_types) > 0
+
+    def addSkip(self, test, reason):
+        unittest.TestResult.addSkip(self, test, reason)
+        self._add(SKIP, str(reason))
+
+    @property
+    def detail(self):
+        return "\n".join(self.details)
+
+
+def is_runnable(case):
+    """False for disabled cases and empty registrations (groups of groups)."""
+    return case.entry.info.enabled and case.entry.home is not None
+
+
+def run_case(case, loader=None, observers=(), attempt=0):
+    """Runs a single case in this process.
+
+    Returns a tuple of (outcome, duration, tests_run, detail). The observers
+    (proboscis.case.CaseObserver instances) are told when it starts and ends.
+
+    The case is tried only once. If it fails in a way it may retry and has
+    retries left after this attempt (counting from zero) the outcome is
+    RETRY, and it's up to the caller to run it again.
+
+    """
+    creator = TestSuiteCreator(loader or unittest.TestLoader(), retry=False)
+    result = CaseResult()
+    for observer in observers:
+        observer.case_started(case)
+    start = time.time()
+    try:
+        for test in creator.loadTestsFromTestEntry(case):
+            test(result)
+    except Exception:
+        result._add(ERROR, "".join(traceback.format_exception(
+            *sys.exc_info())))
+    duration = time.time() - start
+    outcome = result.outcome
+    info = case.entry.info
+    if outcome in (FAIL, ERROR) and attempt < info.retries and \
+       result.can_retry(info.retry_on):
+        outcome = RETRY
+    for observer in observers:
+        observer.case_finished(case, outcome, duration)
+    return (outcome, duration, result.testsRun, result.detail)
+
+
+def run_batch(cases, batch, loader=None, observers=(), attempt=0):
+    """Runs each case index in batch, returning a list of result tuples.
+
+    Each tuple is (index, outcome, duration, tests_run, detail).
+
+    """
+    results = []
+    for index in batch:
+        results.append((index,) + run_case(cases[index], loader, observers,
+                                           attempt))
+    return results
+
+
+class BatchSizer(object):
+    """Decides how many cases to put in a batch from measured durations.
+
+    Keeps a moving average of how long a case takes and sizes batches so
+    each one runs for roughly target seconds. Until something has been
+    measured batches contain a single case.
+
+    """
+
+    def __init__(self, target=0.25, maximum=64, weight=0.2):
+        self.target = target
+        self.maximum = maximum
+        self.weight = weight
+        self.average = None
+
+    def record(self, duration):
+        """Records how long a single case took."""
+        if self.average is None:
+            self.average = duration
+        else:
+            self.average += self.weight * (duration - self.average)
+
+    @property
+    def size(self):
+        if self.average is None:
+            return 1
+        if self.average <= 0:
+            return self.maximum
+        return max(1, min(self.maximum, int(self.target / self.average)))
+
+
+class CaseScheduler(object):
+    """Tracks which cases in a sorted plan are ready to be dispatched.
+
+    A case is ready once every case it depends on (critically or not) has
+    completed. Ready cases are handed out in plan order. Cases which have
+    dependents are always dispatched alone so their dependents are unblocked
+    as soon as they finish; cases without dependents may be grouped, but
+    only with other cases sharing the same affinity key (see affinity_keys).
+
+    Soft edges (runs_after and runs_after_groups) can be relaxed. With
+    relax set to RELAX_HINTS they are ignored, except that ready cases are
+    still handed out in plan order. With RELAX_IDLE they are honored until
+    nothing else is ready, and then the first case held back only by soft
+    edges is released rather than leaving a worker idle.
+
+    """
+
+    def __init__(self, cases, affinity=None, relax=None):
+        if relax not in (None, RELAX_HINTS, RELAX_IDLE):
+            raise ValueError("Unknown relax mode %r." % relax)
+        self.cases = cases
+        self.affinity = affinity or [None] * len(cases)
+        self.relax = relax
+        self.indexes = dict((case, index) for index, case in enumerate(cases))
+        self.critical_pending = [0] * len(cases)
+        self.soft_pending = [0] * len(cases)
+        self.states = [_BLOCKED] * len(cases)
+        self.completed = 0
+        self.ready = []
+        self.waiting = []  # Cases held back only by soft edges.
+        self.resolved = []
+        for case in cases:
+            for dependent in case.dependents:
+                d_index = self.indexes.get(dependent.case)
+                if d_index is None:
+                    continue
+                if dependent.critical:
+                    self.critical_pending[d_index] += 1
+                else:
+                    self.soft_pending[d_index] += 1
+        for index in range(len(cases)):
+            self._update(index)
+
+    def _update(self, index):
+        """Queues a case if its dependencies now allow it."""
+        if self.states[index] == _QUEUED or self.critical_pending[index]:
+            return
+        if not self.soft_pending[index] or self.relax == RELAX_HINTS:
+            self.states[index] = _QUEUED
+            heapq.heappush(self.ready, index)
+        elif self.relax == RELAX_IDLE and self.states[index] == _BLOCKED:
+            self.states[index] = _WAITING
+            heapq.heappush(self.waiting, index)
+
+    def _release_waiting(self):
+        """Queues the first case held back only by soft edges, if any."""
+        while self.waiting:
+            index = heapq.heappop(self.waiting)
+            if self.states[index] == _WAITING:
+                self.states[index] = _QUEUED
+                heapq.heappush(self.ready, index)
+                return True
+        return False
+
+    @property
+    def finished(self):
+        return self.completed == len(self.cases)
+
+    @property
+    def has_ready(self):
+        if not self.ready:
+            self._release_waiting()
+        return len(self.ready) > 0
+
+    def has_dependents(self, index):
+        return len(self.cases[index].dependents) > 0
+
+    def _resolve_without_running(self, index):
+        """Completes cases that shouldn't be sent to an executor.
+
+        Returns True if the case was resolved.
+
+        """
+        case = self.cases[index]
+        if not is_runnable(case):
+            result = (index, PASS, 0.0, 0, "")
+        elif case.dependency_failure is not None and \
+             case.dependency_failure is not case and \
+             not case.entry.info.always_run:
+            result = (index, SKIP, 0.0, 1, "Failure in %s"
+                      % case.dependency_failure.entry.home)
+        else:
+            return False
+        self.resolved.append(result)
+        self.complete(result)
+        return True
+
+    def _pop_ready(self):
+        while self.ready:
+            index = heapq.heappop(self.ready)
+            if not self._resolve_without_running(index):
+                return index
+        return None
+
+    def next_batch(self, size=1):
+        """Returns a list of case indexes to dispatch together.
+
+        The list is empty if nothing is ready. Cases resolved without running
+        (such as those skipped due to a dependency failure) are placed in the
+        "resolved" list, which the caller should drain with pop_resolved.
+
+        """
+        first = self._pop_ready()
+        if first is None:
+            return []
+        batch = [first]
+        if self.has_dependents(first):
+            return batch
+        skipped = []
+        while len(batch) < size:
+            index = self._pop_ready()
+            if index is None:
+                break
+            if self.has_dependents(index) or \
+               self.affinity[index] != self.affinity[first]:
+                skipped.append(index)
+            else:
+                batch.append(index)
+        for index in skipped:
+            heapq.heappush(self.ready, index)
+        return batch
+
+    def pop_resolved(self):
+        """Returns and forgets results for cases resolved without running."""
+        resolved = self.resolved
+        self.resolved = []
+        return resolved
+
+    def complete(self, result):
+        """Marks a case as done given its result tuple."""
+        index, outcome = result[0], result[1]
+        case = self.cases[index]
+        if outcome != PASS:
+            case.fail_test()
+        self.completed += 1
+        for dependent in case.dependents:
+            d_index = self.indexes.get(dependent.case)
+            if d_index is None:
+                continue
+            if dependent.critical:
+                self.critical_pending[d_index] -= 1
+            else:
+                self.soft_pending[d_index] -= 1
+            self._update(d_index)
+
+
+class LocalExecutor(object):
+    """Runs batches in the current process, one at a time.
+
+    Executors accept batches of case indexes through submit and hand back
+    lists of result tuples from collect.
+
+    """
+
+    def __init__(self, cases, loader=None, observers=()):
+        self.cases = cases
+        self.loader = loader
+        self.observers = observers
+        self.finished = []
+
+    @property
+    def has_capacity(self):
+        return len(self.finished) == 0
+
+    @property
+    def busy(self):
+        return len(self.finished) > 0
+
+    def submit(self, batch, attempt=0):
+        self.finished.append(run_batch(self.cases, batch, self.loader,
+                                       self.observers, attempt))
+
+    def collect(self, timeout=None):
+        """Returns the result batches which have finished since last called."""
+        finished = self.finished
+        self.finished = []
+        return finished
+
+    def completed(self, index):
+        """Called by the runner once a case is done, however it finished."""
+        pass
+
+    def close(self):
+        pass
+
+
+def affinity_keys(cases):
+    """Returns a key for each case saying which cases must share a process.
+
+    A critical dependency usually exists because the prerequisite creates
+    state its dependents use, and methods of one class share an instance,
+    so both are kept together, as are cases using the same instance of a
+    fixture. Cases free to run in any process get None.
+
+    """
+    parents = list(range(len(cases)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    def union(first, second):
+        parents[find(first)] = find(second)
+
+    indexes = dict((case, index) for index, case in enumerate(cases))
+    states = {}
+    fixtures = {}
+    for index, case in enumerate(cases):
+        for dependent in case.dependents:
+            if dependent.critical and dependent.case in indexes:
+                union(index, indexes[dependent.case])
+        if case.state is not None:
+            union(index, states.setdefault(id(case.state), index))
+        for used in case.entry.info.fixtures:
+            union(index, fixtures.setdefault((used, used.key(case)), index))
+    sizes = {}
+    for index in range(len(cases)):
+        root = find(index)
+        sizes[root] = sizes.get(root, 0) + 1
+    keys = []
+    for index in range(len(cases)):
+        root = find(index)
+        if sizes[root] > 1:
+            keys.append(root)
+        else:
+            keys.append(None)
+    return keys
+
+
+def write_message(writer, message):
+    """Pickles message to a file, preceded by its length."""
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    writer.write(struct.pack("!I", len(data)) + data)
+    writer.flush()
+
+
+def _read_exactly(descriptor, size):
+    chunks = []
+    while size > 0:
+        chunk = os.read(descriptor, size)
+        if not chunk:
+            raise EOFError()
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_message(descriptor):
+    """Reads one message sent by write_message from a file descriptor.
+
+    This reads no further than the end of the message, so select still sees
+    any message following it.
+
+    """
+    size = struct.unpack("!I", _read_exactly(descriptor, 4))[0]
+    return pickle.loads(_read_exactly(descriptor, size))
+
+
+class _Worker(object):
+    """A forked process along with the pipes used to talk to it."""
+
+    def __init__(self, pid, reader, writer):
+        self.pid = pid
+        self.reader = reader
+        self.writer = writer
+        self.in_flight = []
+
+    def fileno(self):
+        return self.reader.fileno()
+
+
+class ForkServerExecutor(object):
+    """Runs batches in processes forked from this one.
+
+    Because the workers are forked after the tests were imported and the plan
+    was built, they inherit the populated registry copy-on-write and never pay
+    to import the test modules again. Each affinity group gets a process of
+    its own which lives until every case in the group is done; batches of
+    cases with no affinity get a fresh process which exits after the batch.
+    This keeps unrelated tests isolated from each other at the cost of a fork.
+
+    Observers are told when each case finishes, but since cases start in
+    another process case_started is never called. The values tests return
+    (see proboscis.results) are sent back along with the results.
+
+    """
+
+    def __init__(self, cases, workers=2, loader=None, observers=()):
+        if not self.is_supported():
+            raise RuntimeError("os.fork is not available on this platform.")
+        self.cases = cases
+        self.workers = workers
+        self.loader = loader
+        self.observers = observers
+        self.affinity = affinity_keys(cases)
+        self.remaining = {}
+        for key in self.affinity:
+            if key is not None:
+                self.remaining[key] = self.remaining.get(key, 0) + 1
+        self.by_key = {}
+        self.active = []
+
+    @staticmethod
+    def is_supported():
+        return hasattr(os, 'fork')
+
+    @property
+    def in_flight(self):
+        return sum(len(worker.in_flight) for worker in self.active)
+
+    @property
+    def has_capacity(self):
+        return self.in_flight < self.workers
+
+    @property
+    def busy(self):
+        return self.in_flight > 0
+
+    def _fork(self, batch, persistent, attempt=0):
+        to_child = os.pipe()
+        from_child = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                for worker in self.active:
+                    worker.reader.close()
+                    worker.writer.close()
+                os.close(to_child[1])
+                os.close(from_child[0])
+                reader = os.fdopen(to_child[0], 'rb')
+                writer = os.fdopen(from_child[1], 'wb')
+                fixtures = active_manager()
+                while True:
+                    results = run_batch(self.cases, batch, self.loader,
+                                        [fixtures], attempt)
+                    write_message(writer, (results,
+                                           active_store().take_new()))
+                    if not persistent:
+                        break
+                    try:
+                        batch, attempt = pickle.load(reader)
+                    except EOFError:
+                        break  # The parent has no more work for this group.
+                fixtures.run_finished()
+                status = 0
+            except Exception:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+        os.close(to_child[0])
+        os.close(from_child[1])
+        worker = _Worker(pid, os.fdopen(from_child[0], 'rb'),
+                         os.fdopen(to_child[1], 'wb'))
+        worker.in_flight.append(batch)
+        self.active.append(worker)
+        return worker
+
+    def submit(self, batch, attempt=0):
+        key = self.affinity[batch[0]]
+        if key is None:
+            self._fork(batch, False, attempt)
+        elif key in self.by_key:
+            worker = self.by_key[key]
+            pickle.dump((batch, attempt), worker.writer,
+                        pickle.HIGHEST_PROTOCOL)
+            worker.writer.flush()
+            worker.in_flight.append(batch)
+        else:
+            self.by_key[key] = self._fork(batch, True, attempt)
+
+    def _retire(self, worker):
+        if worker in self.active:
+            self.active.remove(worker)
+        for key, value in list(self.by_key.items()):
+            if value is worker:
+                del self.by_key[key]
+        try:
+            worker.writer.close()
+        except (IOError, OSError):
+            pass  # The worker may already be gone.
+        worker.reader.close()
+        os.waitpid(worker.pid, 0)
+
+    def collect(self, timeout=None):
+        """Waits for at least one batch to finish and returns the results.
+
+        Gives up and returns an empty list after timeout seconds, if given.
+
+        """
+        waiting = [worker for worker in self.active if worker.in_flight]
+        if not waiting:
+            return []
+        readable = select.select(waiting, [], [], timeout)[0]
+        finished = []
+        for worker in readable:
+            batch = worker.in_flight.pop(0)
+            try:
+                results, values = read_message(worker.fileno())
+                active_store().merge(values)
+                finished.append(results)
+            except (EOFError, pickle.UnpicklingError):
+                lost = [batch] + worker.in_flight
+                worker.in_flight = []
+                message = "Worker process %d exited unexpectedly." % worker.pid
+                finished.append([(index, ERROR, 0.0, 1, message)
+                                 for lost_batch in lost
+                                 for index in lost_batch])
+                self._retire(worker)
+                continue
+            if worker not in self.by_key.values() and not worker.in_flight:
+                self._retire(worker)
+        for results in finished:
+            for result in results:
+                for observer in self.observers:
+                    observer.case_finished(self.cases[result[0]], result[1],
+                                           result[2])
+        return finished
+
+    def completed(self, index):
+        key = self.affinity[index]
+        if key is None:
+            return
+        self.remaining[key] -= 1
+        if self.remaining[key] == 0 and key in self.by_key:
+            worker = self.by_key.pop(key)
+            if not worker.in_flight:
+                self._retire(worker)
+
+    def close(self):
+        for worker in list(self.active):
+            self._retire(worker)
+
+
+class BatchRunner(object):
+    """Runs the cases of a sorted plan through an executor.
+
+    Prints results in roughly the same format as unittest's text runner.
+
+    Cases reported as RETRY are run again once their backoff has passed.
+    They aren't completed until then, so their dependents wait, but any
+    other work carries on in the meantime.
+
+    """
+
+    def __init__(self, cases, executor=None, stream=None, verbosity=2,
+                 sizer=None, observers=(), relax=None):
+        self.cases = cases
+        self.relax = relax
+        self.observers = observers
+        self.executor = executor or LocalExecutor(cases)
+        self.stream = stream or sys.stdout
+        self.verbosity = verbosity
+        self.sizer = sizer or BatchSizer()
+        self.tests_run = 0
+        self.failures = []
+        self.errors = []
+        self.skipped = 0
+        self.attempts = {}
+        self.retries = []  # A heap of (time due, index) pairs.
+
+    def run(self):
+        """Runs every case. Returns True if nothing failed."""
+        scheduler = CaseScheduler(self.cases,
+                                  getattr(self.executor, 'affinity', None),
+                                  self.relax)
+        start = time.time()
+        try:
+            while not scheduler.finished:
+                stopping = self.should_stop()
+                if not stopping:
+                    self.submit_retries()
+                while not stopping and self.executor.has_capacity and \
+                      scheduler.has_ready:
+                    batch = scheduler.next_batch(self.sizer.size)
+                    resolved = scheduler.pop_resolved()
+                    self.notify_resolved(resolved)
+                    self.finish_batch(resolved)
+                    if batch:
+                        self.executor.submit(batch)
+                if scheduler.finished:
+                    break
+                if not self.executor.busy:
+                    if stopping:
+                        break
+                    if self.retries:
+                        time.sleep(max(0, self.retries[0][0] - time.time()))
+                        continue
+                    raise RuntimeError("No cases are ready to run but %d "
+                        "remain; is there a cycle?"
+                        % (len(self.cases) - scheduler.completed))
+                timeout = None
+                if self.retries:
+                    timeout = max(0, self.retries[0][0] - time.time())
+                for results in self.executor.collect(timeout):
+                    for result in results:
+                        self.sizer.record(result[2])
+                        if result[1] == RETRY:
+                            self.retry_later(result[0])
+                        else:
+                            scheduler.complete(result)
+                    self.finish_batch([result for result in results
+                                       if result[1] != RETRY])
+                    self.report_batch([result for result in results
+                                       if result[1] == RETRY])
+        finally:
+            self.executor.close()
+        self.report_summary(time.time() - start)
+        return self.was_successful
+
+    def retry_later(self, index):
+        attempt = self.attempts.get(index, 0)
+        self.attempts[index] = attempt + 1
+        delay = self.cases[index].entry.info.retry_delay(attempt)
+        heapq.heappush(self.retries, (time.time() + delay, index))
+
+    def submit_retries(self):
+        """Re-submits the cases whose backoff has passed, one per batch."""
+        while self.retries and self.executor.has_capacity and \
+              self.retries[0][0] <= time.time():
+            index = heapq.heappop(self.retries)[1]
+            self.executor.submit([index], self.attempts[index])
+
+    def should_stop(self):
+        """True once an observer asks to stop; running cases still finish."""
+        for observer in self.observers:
+            if observer.should_stop():
+                return True
+        return False
+
+    @property
+    def was_successful(self):
+        return not self.failures and not self.errors
+
+    def notify_resolved(self, results):
+        """Tells the observers about cases skipped without running.
+
+        Like the unittest runner, each test in a skipped class is reported.
+
+        """
+        for index, outcome, duration, tests_run, detail in results:
+            if tests_run == 0:
+                continue
+            case = self.cases[index]
+            for i in range(expected_tests(case)):
+                for observer in self.observers:
+                    observer.case_started(case)
+                    observer.case_finished(case, outcome, duration)
+
+    def finish_batch(self, results):
+        for result in results:
+            self.executor.completed(result[0])
+        self.report_batch(results)
+
+    def report_batch(self, results):
+        for index, outcome, duration, tests_run, detail in results:
+            if tests_run == 0:
+                continue
+            description = describe_case(self.cases[index])
+            if outcome == RETRY:
+                if self.verbosity > 1:
+                    self.stream.write("%s ... retrying (attempt %d failed)\n"
+                                      % (description, self.attempts[index]))
+                continue
+            self.tests_run += tests_run
+            if outcome == FAIL:
+                self.failures.append((description, detail))
+            elif outcome == ERROR:
+                self.errors.append((description, detail))
+            elif outcome == SKIP:
+                self.skipped += 1
+            if self.verbosity > 1:
+                if outcome == SKIP:
+                    self.stream.write("%s ... skipped %r\n"
+                                      % (description, detail))
+                else:
+                    word = {PASS: "ok", FAIL: "FAIL", ERROR: "ERROR"}[outcome]
+                    self.stream.write("%s ... %s\n" % (description, word))
+            elif self.verbosity == 1:
+                self.stream.write({PASS: ".", SKIP: "s", FAIL: "F",
+                                   ERROR: "E"}[outcome])
+        self.stream.flush()
+
+    def report_summary(self, elapsed):
+        if self.verbosity == 1:
+            self.stream.write("\n")
+        separator = "=" * 70
+        for label, items in (("ERROR", self.errors),
+                             ("FAIL", self.failures)):
+            for description, detail in items:
+                self.stream.write("%s\n%s: %s\n%s\n%s\n"
+                                  % (separator, label, description,
+                                     "-" * 70, detail))
+        self.stream.write("-" * 70 + "\n")
+        self.stream.write("Ran %d test%s in %.3fs\n\n"
+                          % (self.tests_run,
+                             self.tests_run != 1 and "s" or "",
+                             elapsed))
+        if self.was_successful:
+            extra = self.skipped and " (skipped=%d)" % self.skipped or ""
+            self.stream.write("OK%s\n" % extra)
+        else:
+            counts = []
+            if self.failures:
+                counts.append("failures=%d" % len(self.failures))
+            if self.errors:
+                counts.append("errors=%d" % len(self.errors))
+            if self.skipped:
+                counts.append("skipped=%d" % self.skipped)
+            self.stream.write("FAILED (%s)\n" % ", ".join(counts))
+        self.stream.flush()
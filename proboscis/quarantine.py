@@ -0,0 +1,165 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Runs flaky tests in a separate lane which can't fail the run.
+
+Running with "--quarantine" looks up which cases the results history says
+are flaky (see ResultHistory.flakiness). Those cases, and everything which
+critically depends on them, move out of the main plan into the quarantine
+lane, along with the prerequisites they need. Once the main plan finishes
+the lane runs in a forked process, so the prerequisites the two share never
+run twice at once, and its results are printed but don't change the exit
+status. Only the quarantined cases are added to the results history by the
+lane, as the main plan records its own.
+
+"""
+
+import os
+import sys
+import tempfile
+import traceback
+
+from proboscis.case import CaseObserver
+from proboscis.fixtures import activate
+from proboscis.fixtures import FixtureManager
+from proboscis.history import ResultHistory
+from proboscis.parallel import BatchRunner
+from proboscis.parallel import LocalExecutor
+from proboscis.sorting import critical_prerequisites
+from proboscis.sorting import prerequisite_closure
+
+
+def split_plan(plan, flaky):
+    """Moves the flaky cases and their dependents out of plan.
+
+    Returns the cases for the quarantine lane, in plan order, which also
+    includes whatever they critically depend on. Those prerequisites stay
+    in the main plan too.
+
+    """
+    downstream = set()
+    remaining = list(flaky)
+    while remaining:
+        case = remaining.pop()
+        if case not in downstream:
+            downstream.add(case)
+            remaining += [dependent.case for dependent in case.dependents
+                          if dependent.critical]
+    lane = prerequisite_closure(downstream,
+                                critical_prerequisites(plan.tests))
+    cases = [case for case in plan.tests if case in lane]
+    plan.tests = [case for case in plan.tests if case not in downstream]
+    return cases
+
+
+class RecordOnly(CaseObserver):
+    """Tells an observer about some cases only."""
+
+    def __init__(self, observer, cases):
+        self.observer = observer
+        self.cases = set(cases)
+
+    def case_started(self, case):
+        if case in self.cases:
+            self.observer.case_started(case)
+
+    def case_finished(self, case, outcome, duration):
+        if case in self.cases:
+            self.observer.case_finished(case, outcome, duration)
+
+    def run_finished(self):
+        self.observer.run_finished()
+
+
+class QuarantineLane(object):
+    """Runs the quarantined cases in a forked process, or in this one.
+
+    Only the results of the cases in recorded (by default, every case) are
+    saved to the results history.
+
+    """
+
+    def __init__(self, cases, loader=None, stream=None, recorded=None):
+        self.cases = cases
+        self.recorded = recorded is None and cases or recorded
+        self.loader = loader
+        self.stream = stream or sys.stdout
+        self.pid = None
+        self.output = None
+        self.passed = None
+
+    def run(self, stream):
+        """Runs the lane in this process, returning True if it passed."""
+        history = RecordOnly(ResultHistory(), self.recorded)
+        fixtures = FixtureManager(self.cases)
+        activate(fixtures)
+        observers = [history, fixtures]
+        executor = LocalExecutor(self.cases, self.loader, observers)
+        try:
+            return BatchRunner(self.cases, executor, stream=stream,
+                               observers=observers).run()
+        finally:
+            fixtures.run_finished()
+            history.run_finished()
+
+    def start(self):
+        """Starts running the lane in the background if os.fork exists.
+
+        Start it once the main plan has finished, so the two don't share
+        prerequisites or write the results history at the same time.
+
+        """
+        if not self.cases or not hasattr(os, 'fork'):
+            return
+        descriptor, self.output = tempfile.mkstemp(prefix="quarantine")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.pid = os.fork()
+        if self.pid == 0:
+            status = 1
+            try:
+                stream = os.fdopen(descriptor, 'w')
+                os.dup2(descriptor, 1)
+                os.dup2(descriptor, 2)
+                status = not self.run(stream) and 1 or 0
+                stream.flush()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+        os.close(descriptor)
+
+    def wait(self):
+        """Waits for the lane to finish and prints what happened."""
+        if not self.cases:
+            return
+        self.stream.write("\n%d test%s in the quarantine lane (not gating):\n"
+                          % (len(self.cases),
+                             len(self.cases) != 1 and "s" or ""))
+        self.stream.flush()
+        if self.pid is None:
+            self.passed = self.run(self.stream)
+            return
+        status = os.waitpid(self.pid, 0)[1]
+        self.passed = os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+        output = open(self.output, 'r')
+        try:
+            self.stream.write(output.read())
+        finally:
+            output.close()
+            os.remove(self.output)
+        self.stream.flush()
@@ -0,0 +1,149 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Notices when test modules change and re-imports them into a registry.
+
+Only modules whose files live beneath a root directory (by default the
+current working directory) are tracked; Proboscis itself and __main__ are
+never reloaded.
+
+"""
+
+import os
+import sys
+import types
+
+from proboscis import compatability
+
+
+def module_source(module):
+    """Returns the path of a module's source file, or None."""
+    path = getattr(module, '__file__', None)
+    if not path:
+        return None
+    if path.endswith(".pyc") or path.endswith(".pyo"):
+        path = path[:-1]
+    return os.path.abspath(path)
+
+
+def module_mtime(module):
+    path = module_source(module)
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+
+class ImportGraph(object):
+    """Records which tracked modules use which other tracked modules.
+
+    Python doesn't remember who imported what, so this looks through the
+    globals of each module: a module object, or a class or function defined
+    in another module, counts as a dependency on that module.
+
+    """
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.imports = {}
+        for name, module in modules.items():
+            self.imports[name] = self._find_imports(name, module)
+
+    def _find_imports(self, name, module):
+        found = set()
+        for value in list(vars(module).values()):
+            if isinstance(value, types.ModuleType):
+                other = value.__name__
+            else:
+                other = getattr(value, '__module__', None)
+            if other != name and other in self.modules:
+                found.add(other)
+        return found
+
+    def importers_of(self, names):
+        """Returns the given module names plus every module using them."""
+        affected = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for name, imports in self.imports.items():
+                if name not in affected and imports & affected:
+                    affected.add(name)
+                    changed = True
+        return affected
+
+    def in_import_order(self, names):
+        """Sorts names so that every module comes after those it uses."""
+        ordered = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered or name in visiting:
+                return
+            visiting.add(name)
+            for other in sorted(self.imports.get(name, ())):
+                if other in names:
+                    visit(other)
+            ordered.append(name)
+
+        for name in sorted(names):
+            visit(name)
+        return ordered
+
+
+class ModuleReloader(object):
+    """Tracks the modules under a directory and reloads the changed ones."""
+
+    def __init__(self, registry, root=None):
+        self.registry = registry
+        self.root = os.path.abspath(root or os.getcwd())
+        self.refresh()
+
+    def is_tracked(self, name, module):
+        if module is None or name == "__main__":
+            return False
+        if name == "proboscis" or name.startswith("proboscis."):
+            return False
+        path = module_source(module)
+        return path is not None and path.startswith(self.root + os.sep)
+
+    def refresh(self):
+        """Re-reads sys.modules, modification times and the import graph."""
+        self.modules = dict((name, module)
+                            for name, module in list(sys.modules.items())
+                            if self.is_tracked(name, module))
+        self.mtimes = dict((name, module_mtime(module))
+                           for name, module in self.modules.items())
+        self.graph = ImportGraph(self.modules)
+
+    def changed(self):
+        """Returns the names of tracked modules whose files were modified."""
+        return set(name for name, module in self.modules.items()
+                   if module_mtime(module) != self.mtimes[name])
+
+    def reload(self, names):
+        """Re-imports the named modules and every tracked module using them.
+
+        Tests defined in those modules are removed from the registry first so
+        their decorators can register the new versions. Returns the names of
+        all modules which were reloaded.
+
+        """
+        affected = self.graph.importers_of(names)
+        for name in self.graph.in_import_order(affected):
+            self.registry.remove_module(name)
+            compatability.reload(self.modules[name])
+        self.refresh()
+        return affected
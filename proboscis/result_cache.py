@@ -0,0 +1,153 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Skips deterministic tests which already passed with the same code.
+
+A test declared with @test(cacheable=True) gets a key hashing its identity,
+its declared inputs, the Python version, and the contents of its module and
+every module of the project that module uses, directly or not. The modules
+of the tests it critically depends on are included the same way. When the
+test passes the key is saved; a later run finding it replays the pass (and
+the value the test returned, see proboscis.results) without running it.
+Failures are never cached, so they always show a real traceback, and
+neither are passes returning a value which can't be pickled.
+
+The cache is kept in .proboscis/test_cache, or the directory named by the
+PROBOSCIS_TEST_CACHE environment variable so CI jobs can share one. Entries
+are evicted like those of proboscis.fixture_cache. Running with
+"--no-test-cache" runs everything.
+
+"""
+
+import hashlib
+import os
+import sys
+import types
+
+from proboscis.fixture_cache import FixtureCache
+from proboscis.sorting import critical_prerequisites
+from proboscis.sorting import prerequisite_closure
+from proboscis.storage import state_path
+
+
+def module_path(module):
+    path = getattr(module, '__file__', None)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if path.endswith((".pyc", ".pyo")) and os.path.exists(path[:-1]):
+        path = path[:-1]
+    return path
+
+
+def project_modules(modules, root):
+    """Returns the paths of modules under root which modules use.
+
+    A module uses the modules it holds, and those of the classes and
+    functions it holds.
+
+    """
+    paths = set()
+    seen = set()
+    remaining = list(modules)
+    while remaining:
+        module = remaining.pop()
+        if module.__name__ in seen:
+            continue
+        seen.add(module.__name__)
+        path = module_path(module)
+        if path is None or not path.startswith(root + os.sep):
+            continue
+        paths.add(path)
+        for value in list(vars(module).values()):
+            if isinstance(value, types.ModuleType):
+                remaining.append(value)
+                continue
+            name = getattr(value, '__module__', None)
+            if isinstance(name, str) and name in sys.modules:
+                remaining.append(sys.modules[name])
+    return paths
+
+
+class ResultCache(object):
+    """Finds and records the passes of cacheable cases."""
+
+    def __init__(self, cases=(), directory=None, root=None):
+        directory = directory or os.environ.get("PROBOSCIS_TEST_CACHE") \
+            or state_path("test_cache")
+        self.store = FixtureCache(directory)
+        self.root = os.path.abspath(root or os.getcwd())
+        self.prerequisites = critical_prerequisites(cases)
+        self._hashes = {}
+        self._keys = {}
+
+    def file_hash(self, path):
+        if path not in self._hashes:
+            source = open(path, 'rb')
+            try:
+                self._hashes[path] = hashlib.sha1(source.read()).hexdigest()
+            finally:
+                source.close()
+        return self._hashes[path]
+
+    def key(self, case):
+        """Returns the key a case's pass is saved under."""
+        if case in self._keys:
+            return self._keys[case]
+        modules = []
+        for member in prerequisite_closure([case], self.prerequisites):
+            name = getattr(member.entry.home, '__module__', None)
+            if name in sys.modules:
+                modules.append(sys.modules[name])
+        inputs = case.entry.info.inputs
+        if callable(inputs):
+            inputs = inputs()
+        lines = [case.identity, repr(inputs), sys.version]
+        for path in sorted(project_modules(modules, self.root)):
+            lines.append("%s %s" % (os.path.relpath(path, self.root),
+                                    self.file_hash(path)))
+        key = hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+        self._keys[case] = key
+        return key
+
+    def load(self, case):
+        """Returns a tuple of (found, value returned when it passed)."""
+        found, entry = self.store.load(self.key(case))
+        if not found:
+            return (False, None)
+        return (True, entry["value"])
+
+    def save(self, case, value):
+        """Notes that a case passed, returning value.
+
+        If value can't be pickled nothing is saved, so the case runs again
+        next time and its dependents still get the real value.
+
+        """
+        self.store.store(self.key(case), {"value": value})
+
+
+_active = None
+
+
+def active_cache():
+    """Returns the ResultCache in use, or None if tests aren't cached."""
+    return _active
+
+
+def activate(cache):
+    """Makes cacheable tests use cache, or run every time if it's None."""
+    global _active
+    _active = cache
@@ -0,0 +1,166 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Passes the values returned by tests to the tests depending on them.
+
+When a test function or method returns something other than None, the value
+is kept under the identity of its case. A test listing it in depends_on can
+ask for it by having an argument of the same name:
+
+    @test
+    def create_user():
+        return client.create_user("bob")
+
+    @test(depends_on=[create_user])
+    def delete_user(create_user):
+        client.delete_user(create_user.id)
+
+Values are kept in memory, except those over SPILL_BYTES once pickled which
+are written to .proboscis/results and read back when asked for. When running
+with workers, the values each worker stores are sent back to the main
+process with its results, so processes forked afterwards can see them too.
+Everything is thrown away at the end of the run.
+
+"""
+
+import hashlib
+import os
+
+from proboscis.storage import state_path
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+# Values bigger than this once pickled are kept on disk instead of in memory.
+SPILL_BYTES = 1024 * 1024
+
+
+def argument_names(func):
+    """Returns the names of the arguments a function takes."""
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return ()
+    return code.co_varnames[:code.co_argcount]
+
+
+class ResultStore(object):
+    """Holds the values returned by tests, keyed by case identity."""
+
+    def __init__(self, directory=None, spill_bytes=SPILL_BYTES):
+        self.directory = directory
+        self.spill_bytes = spill_bytes
+        self.values = {}
+        self.spilled = {}
+        self.new = []
+
+    def spill_path(self, identity):
+        if self.directory is None:
+            self.directory = state_path("results")
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        name = hashlib.sha1(identity.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "%s-%d.pickle"
+                            % (name, os.getpid()))
+
+    def put(self, identity, value):
+        """Keeps a value, writing it to disk if it's large."""
+        self.values.pop(identity, None)
+        self.spilled.pop(identity, None)
+        self.new.append(identity)
+        try:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            data = None  # Only this process can use it.
+        if data is None or len(data) <= self.spill_bytes:
+            self.values[identity] = value
+            return
+        path = self.spill_path(identity)
+        output = open(path, 'wb')
+        try:
+            output.write(data)
+        finally:
+            output.close()
+        self.spilled[identity] = path
+
+    def get(self, identity, default=None):
+        if identity in self.values:
+            return self.values[identity]
+        if identity not in self.spilled:
+            return default
+        source = open(self.spilled[identity], 'rb')
+        try:
+            return pickle.load(source)
+        finally:
+            source.close()
+
+    def __contains__(self, identity):
+        return identity in self.values or identity in self.spilled
+
+    def take_new(self):
+        """Returns what was stored since last called, to send elsewhere.
+
+        The result is a dict of identity to a tuple of ("value", pickled
+        value) or ("file", path of the spilled value). Values which can't be
+        pickled are left out.
+
+        """
+        exported = {}
+        for identity in self.new:
+            if identity in self.spilled:
+                exported[identity] = ("file", self.spilled[identity])
+            elif identity in self.values:
+                try:
+                    exported[identity] = ("value", pickle.dumps(
+                        self.values[identity], pickle.HIGHEST_PROTOCOL))
+                except Exception:
+                    pass
+        self.new = []
+        return exported
+
+    def merge(self, exported):
+        """Adds what take_new returned in another process."""
+        for identity, (kind, data) in exported.items():
+            self.values.pop(identity, None)
+            self.spilled.pop(identity, None)
+            if kind == "file":
+                self.spilled[identity] = data
+            else:
+                self.values[identity] = pickle.loads(data)
+
+    def clear(self):
+        """Forgets every value and removes the spilled ones."""
+        for path in self.spilled.values():
+            if os.path.exists(path):
+                os.remove(path)
+        self.values = {}
+        self.spilled = {}
+        self.new = []
+
+
+_active = ResultStore()
+
+
+def active_store():
+    """Returns the ResultStore tests currently put their values in."""
+    return _active
+
+
+def activate(store):
+    """Makes tests put their values in store."""
+    global _active
+    _active = store
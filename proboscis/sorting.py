@@ -16,17 +16,24 @@
 This module is home to Proboscis's sorting algorithms.
 """
 
+import heapq
+
 from collections import deque
 
 class Dependent(object):
 
+    __slots__ = ('case', 'critical')
+
     def __init__(self, case, critical):
         self.case = case
         self.critical = critical
 
 
-class TestNode:
+class TestNode(object):
     """Representation of a TestEntry used in sorting."""
+
+    __slots__ = ('case', 'dependencies', 'dependents')
+
     def __init__(self, case):
         self.case = case
         self.dependencies = []
@@ -137,3 +144,260 @@ class TestGraph:
             if not node.has_no_dependencies:
                 raise RuntimeError("Cycle found on node " + str(node.case))
         return list((n.case for n in ordered_nodes))
+
+
+def critical_prerequisites(cases):
+    """Returns a dict of each case to the cases it critically depends on."""
+    prerequisites = {}
+    for case in cases:
+        for dependent in case.dependents:
+            if dependent.critical:
+                prerequisites.setdefault(dependent.case, []).append(case)
+    return prerequisites
+
+
+def prerequisite_closure(roots, prerequisites, follow=None):
+    """Returns a set of roots and everything they critically depend on.
+
+    prerequisites is a dict made by critical_prerequisites. If follow is
+    given, only prerequisites for which it returns True are added (along
+    with what they depend on).
+
+    """
+    members = set(roots)
+    remaining = list(members)
+    while remaining:
+        for prerequisite in prerequisites.get(remaining.pop(), []):
+            if prerequisite not in members and \
+               (follow is None or follow(prerequisite)):
+                members.add(prerequisite)
+                remaining.append(prerequisite)
+    return members
+
+
+def add_class_teardowns(cases, chosen):
+    """Adds the after_class cases of instances chosen only partly uses.
+
+    chosen is a set of some of cases; once it holds any case of a class
+    instance, that instance's after_class methods are added too so whatever
+    was set up is cleaned up.
+
+    """
+    states = set(id(case.state) for case in chosen if case.state is not None)
+    for case in cases:
+        if case.entry.info.after_class and id(case.state) in states:
+            chosen.add(case)
+
+
+def sort_cases(cases, key):
+    """Re-orders already sorted cases, preferring those with the lowest key.
+
+    Only the order between cases which don't depend on each other changes,
+    so every dependency (critical or not) is still respected. A case's key
+    is also lent to the cases it depends on, so the prerequisites of an
+    urgent case are pulled forward with it. Ties keep their current order.
+
+    """
+    positions = dict((case, index) for index, case in enumerate(cases))
+    pending = dict((case, 0) for case in cases)
+    for case in cases:
+        for dependent in case.dependents:
+            if dependent.case in pending:
+                pending[dependent.case] += 1
+    keys = {}
+    for case in reversed(cases):  # Dependents come later in a sorted list.
+        keys[case] = min([key(case)] +
+                         [keys[dependent.case] for dependent in case.dependents
+                          if dependent.case in keys])
+    ready = [(keys[case], positions[case], case) for case in cases
+             if pending[case] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        case = heapq.heappop(ready)[2]
+        ordered.append(case)
+        for dependent in case.dependents:
+            if dependent.case in pending:
+                pending[dependent.case] -= 1
+                if pending[dependent.case] == 0:
+                    heapq.heappush(ready, (keys[dependent.case],
+                                           positions[dependent.case],
+                                           dependent.case))
+    return ordered
+
+
+def sort_cases_by_locality(cases):
+    """Re-orders sorted cases so each class instance is used contiguously.
+
+    Cases sharing a TestMethodState (the methods of one instance of a class)
+    are kept together as far as dependencies allow: whenever a case of an
+    instance already in use is free to run it goes next, the earliest
+    started instance first so it can be finished. Otherwise cases needing no
+    instance go before those which would start a new one, each in their
+    current order.
+
+    """
+    positions = dict((case, index) for index, case in enumerate(cases))
+    pending = dict((case, 0) for case in cases)
+    remaining = {}
+    for case in cases:
+        if case.state is not None:
+            remaining[id(case.state)] = remaining.get(id(case.state), 0) + 1
+        for dependent in case.dependents:
+            if dependent.case in pending:
+                pending[dependent.case] += 1
+    open_states = []  # In the order they were started.
+    started = set()
+    ready_by_state = {}
+    stateless = []
+    new_states = []  # (position, state key) of ready cases in new states.
+
+    def make_ready(case):
+        entry = (positions[case], case)
+        if case.state is None:
+            heapq.heappush(stateless, entry)
+            return
+        key = id(case.state)
+        heapq.heappush(ready_by_state.setdefault(key, []), entry)
+        if key not in started:
+            heapq.heappush(new_states, (entry[0], key))
+
+    def next_case():
+        for key in open_states:
+            if ready_by_state[key]:
+                return heapq.heappop(ready_by_state[key])[1]
+        if stateless:
+            return heapq.heappop(stateless)[1]
+        while new_states:
+            key = heapq.heappop(new_states)[1]
+            if key not in started:
+                started.add(key)
+                open_states.append(key)
+                return heapq.heappop(ready_by_state[key])[1]
+        return None
+
+    for case in cases:
+        if pending[case] == 0:
+            make_ready(case)
+    ordered = []
+    case = next_case()
+    while case is not None:
+        ordered.append(case)
+        if case.state is not None:
+            key = id(case.state)
+            remaining[key] -= 1
+            if remaining[key] == 0:
+                open_states.remove(key)
+        for dependent in case.dependents:
+            if dependent.case in pending:
+                pending[dependent.case] -= 1
+                if pending[dependent.case] == 0:
+                    make_ready(dependent.case)
+        case = next_case()
+    return ordered
+
+
+def peak_live_states(cases):
+    """Returns the most class instances in use at once running cases in order.
+
+    An instance is in use from its first case until its last.
+
+    """
+    last = {}
+    for index, case in enumerate(cases):
+        if case.state is not None:
+            last[id(case.state)] = index
+    live = set()
+    peak = 0
+    for index, case in enumerate(cases):
+        if case.state is None:
+            continue
+        key = id(case.state)
+        live.add(key)
+        peak = max(peak, len(live))
+        if last[key] == index:
+            live.remove(key)
+    return peak
+
+
+def sort_cases_by_resources(cases):
+    """Re-orders sorted cases so those sharing resources run together.
+
+    Resources are the names given to the "resources" argument of @test.
+    After each case, the next is one which is free to run and shares as
+    many of its resources as possible (the earliest such case if several
+    do). If none share any, the earliest case free to run goes next. This
+    keeps each resource in use for long stretches, so it needs setting up
+    fewer times.
+
+    """
+    positions = dict((case, index) for index, case in enumerate(cases))
+    pending = dict((case, 0) for case in cases)
+    for case in cases:
+        for dependent in case.dependents:
+            if dependent.case in pending:
+                pending[dependent.case] += 1
+    ready = []
+    ready_by_resource = {}
+    done = set()
+
+    def make_ready(case):
+        entry = (positions[case], case)
+        heapq.heappush(ready, entry)
+        for resource in case.entry.info.resources:
+            heapq.heappush(ready_by_resource.setdefault(resource, []), entry)
+
+    def first_ready(heap):
+        while heap and heap[0][1] in done:
+            heapq.heappop(heap)
+        return heap and heap[0] or None
+
+    for case in cases:
+        if pending[case] == 0:
+            make_ready(case)
+    ordered = []
+    active = set()
+    while True:
+        best = None
+        for resource in active:
+            entry = first_ready(ready_by_resource.get(resource, []))
+            if entry is None:
+                continue
+            shared = len(active.intersection(entry[1].entry.info.resources))
+            if best is None or (-shared, entry[0]) < best[0]:
+                best = ((-shared, entry[0]), entry[1])
+        if best is None:
+            entry = first_ready(ready)
+            if entry is None:
+                break
+            case = entry[1]
+        else:
+            case = best[1]
+        done.add(case)
+        ordered.append(case)
+        active = set(case.entry.info.resources)
+        for dependent in case.dependents:
+            if dependent.case in pending:
+                pending[dependent.case] -= 1
+                if pending[dependent.case] == 0:
+                    make_ready(dependent.case)
+    return ordered
+
+
+def count_resource_setups(cases):
+    """Returns a dict of how many times each resource is set up.
+
+    A resource is taken to be set up at the start of each unbroken run of
+    cases which use it.
+
+    """
+    setups = {}
+    previous = set()
+    for case in cases:
+        if case.entry.home is None:
+            continue  # Groups of groups don't run anything.
+        current = set(case.entry.info.resources)
+        for resource in current - previous:
+            setups[resource] = setups.get(resource, 0) + 1
+        previous = current
+    return setups
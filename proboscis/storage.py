@@ -0,0 +1,71 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Decides where Proboscis keeps the files it needs between runs.
+
+Everything lives in a single directory, ".proboscis" in the current working
+directory unless the PROBOSCIS_STATE_DIR environment variable says otherwise.
+It's only created once something is written to it.
+
+"""
+
+import json
+import os
+import tempfile
+
+
+def state_directory():
+    """Returns the directory used for state, which may not exist yet."""
+    return os.environ.get("PROBOSCIS_STATE_DIR", ".proboscis")
+
+
+def state_path(name):
+    """Returns the path of a file or directory inside the state directory."""
+    return os.path.join(state_directory(), name)
+
+
+def make_parent_directory(path):
+    """Creates the directory a file is about to be written to, if needed."""
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+
+def load_json(path, default=None):
+    """Reads a JSON file, returning default if it's missing or unreadable."""
+    try:
+        source = open(path, 'r')
+    except IOError:
+        return default
+    try:
+        try:
+            return json.load(source)
+        except ValueError:
+            return default
+    finally:
+        source.close()
+
+
+def save_json(path, data):
+    """Writes data to a JSON file without ever leaving half a file behind."""
+    make_parent_directory(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    output = os.fdopen(handle, 'w')
+    try:
+        json.dump(data, output, sort_keys=True)
+    finally:
+        output.close()
+    os.rename(temp_path, path)
@@ -0,0 +1,109 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Re-runs the tests affected by changes to source files as they happen.
+
+Started by passing "--watch" to a script which calls TestProgram. Files are
+polled for changes; when one changes, its module and every module using it
+are re-imported, and only tests defined in those modules run (along with the
+tests they depend on).
+
+"""
+
+import os
+import sys
+import time
+import traceback
+
+from proboscis.case import TestPlan
+from proboscis.case import TestProgram
+from proboscis.reloading import ModuleReloader
+
+
+class Watcher(object):
+    """Polls the modules of a registry and runs the tests affected."""
+
+    def __init__(self, registry, argv, groups=None, interval=1.0, root=None):
+        self.registry = registry
+        self.argv = argv
+        self.groups = groups or []
+        self.interval = interval
+        self.reloader = ModuleReloader(registry, root)
+
+    def homes_in_modules(self, module_names):
+        """Returns the registered classes and functions defined in modules."""
+        self.registry.flush()
+        return [entry.home for entry in self.registry.tests
+                if getattr(entry.home, '__module__', None) in module_names]
+
+    def run(self, homes=None):
+        """Runs the tests, limited to homes and their dependencies if given.
+
+        Returns the exit status of the run.
+
+        """
+        def run_program():
+            plan = TestPlan.create_from_registry(self.registry)
+            if homes is not None:
+                plan.filter(classes=homes)
+            program = TestProgram(registry=self.registry,
+                                  groups=list(self.groups),
+                                  argv=list(self.argv), plan=plan)
+            program.run_and_exit()
+
+        if hasattr(os, 'fork'):
+            from proboscis.daemon import run_in_child
+            return run_in_child(run_program)
+        from proboscis.daemon import exit_code
+        try:
+            run_program()
+        except SystemExit:
+            return exit_code(sys.exc_info()[1])
+        return 0
+
+    def poll(self):
+        """Reloads changed modules and runs affected tests.
+
+        Returns the names of the modules reloaded, which is empty if nothing
+        changed.
+
+        """
+        changed = self.reloader.changed()
+        if not changed:
+            return set()
+        try:
+            reloaded = self.reloader.reload(changed)
+        except Exception:
+            traceback.print_exc()
+            self.reloader.refresh()
+            return changed
+        homes = self.homes_in_modules(reloaded)
+        print("\nChanged: %s" % ", ".join(sorted(changed)))
+        if homes:
+            self.run(homes)
+        else:
+            print("No tests are affected.")
+        return reloaded
+
+    def watch_forever(self):
+        """Runs everything once, then re-runs affected tests as files change."""
+        self.run()
+        print("\nWatching for changes (press Ctrl+C to stop)...")
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass
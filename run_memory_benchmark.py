@@ -0,0 +1,109 @@
+"""
+
+Measures how much memory Proboscis needs for each registered test and for
+each case a factory creates, to catch changes which make the core objects
+bigger. Run it like this:
+
+    python run_memory_benchmark.py [COUNT]
+
+COUNT defaults to 100000. The numbers include everything allocated while
+registering or planning, such as the dependency links between cases, but
+not the test functions themselves. Requires tracemalloc (Python 3.4+).
+
+"""
+import gc
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from proboscis import TestPlan
+from proboscis import TestRegistry
+
+
+def measure(func):
+    """Returns (bytes allocated and kept, seconds, result) for func."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    kept = func()
+    elapsed = time.time() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, elapsed, kept
+
+
+def make_functions(count):
+    functions = []
+    for index in range(count):
+        def func():
+            pass
+        func.__name__ = "test_%d" % index
+        functions.append(func)
+    return functions
+
+
+def register_functions(functions):
+    registry = TestRegistry()
+    for func in functions:
+        registry.register(func, groups=["benchmark"])
+    return registry
+
+
+def make_factory_registry(count):
+    registry = TestRegistry()
+
+    class Scenario(object):
+        def create(self):
+            pass
+
+        def check(self):
+            pass
+
+        def delete(self):
+            pass
+
+    registry.register(Scenario.create)
+    registry.register(Scenario.check)
+    registry.register(Scenario.delete)
+    registry.register(Scenario, groups=["benchmark"])
+
+    def scenarios():
+        return [Scenario() for index in range(count)]
+    registry.register_factory(scenarios)
+    return registry, 3 * count
+
+
+def report(label, count, size, elapsed):
+    print("%-32s %9d %12.1f %10.2fs" % (label, count, size / float(count),
+                                        elapsed))
+
+
+def main(argv):
+    if tracemalloc is None:
+        print("tracemalloc is needed to measure memory.")
+        return 1
+    count = len(argv) > 1 and int(argv[1]) or 100000
+    print("%-32s %9s %12s %11s" % ("", "count", "bytes each", "time"))
+
+    functions = make_functions(count)
+    size, elapsed, registry = measure(lambda: register_functions(functions))
+    report("Registered test functions", count, size, elapsed)
+    size, elapsed, plan = measure(
+        lambda: TestPlan.create_from_registry(registry))
+    report("Cases planned from functions", count, size, elapsed)
+    del registry, plan, functions
+
+    registry, cases = make_factory_registry(count // 3)
+    size, elapsed, plan = measure(
+        lambda: TestPlan.create_from_registry(registry))
+    report("Cases planned from a factory", cases, size, elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
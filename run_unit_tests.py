@@ -1,12 +1,25 @@
 import unittest
 import sys
 from tests.unit.test_asserts import *
+from tests.unit.test_audit import *
+from tests.unit.test_budget import *
 if sys.version >= "2.6":  # These tests use "with".
     from tests.unit.test_check import *
 from tests.unit.test_core import *
 if sys.version >= "2.6":  # These tests use "with".
     from tests.unit.test_check import *
     from tests.unit.test_core_with import *
+from tests.unit.test_discovery import *
+from tests.unit.test_fixtures import *
+from tests.unit.test_history import *
+from tests.unit.test_impact import *
+from tests.unit.test_journal import *
+from tests.unit.test_parallel import *
+from tests.unit.test_quarantine import *
+from tests.unit.test_reloading import *
+from tests.unit.test_result_cache import *
+from tests.unit.test_results import *
+from tests.unit.test_retry import *
 from tests.unit.test_sorting import *
 
 
@@ -0,0 +1,74 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests the isolation audit."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestIsolationAudit(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_undeclared_dependencies_are_found(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.audit import IsolationAudit
+        if not IsolationAudit.is_supported():
+            return
+        registry = TestRegistry()
+        shared = {}
+
+        def creates():
+            shared["user"] = "bob"
+
+        def reads():
+            assert_equal("bob", shared.get("user"))
+
+        def independent():
+            pass
+
+        registry.register(creates)
+        registry.register(reads, runs_after=[creates])
+        registry.register(independent)
+        plan = TestPlan.create_from_registry(registry)
+        stream = StringIO()
+        audit = IsolationAudit(plan, runs=2, seed=1, stream=stream,
+                               path=os.path.join(self.directory, "a.json"))
+        assert_equal(False, audit.run())
+        reads_id = [case.identity for case in plan.tests
+                    if case.entry.home is reads][0]
+        creates_id = [case.identity for case in plan.tests
+                      if case.entry.home is creates][0]
+        assert_equal([reads_id], list(audit.unstable.keys()))
+        assert_equal([creates_id], audit.unstable[reads_id]["needs"])
+        assert_equal(2, len(audit.safe))
+        assert_true("Passed only when these ran first:" in stream.getvalue())
+        assert_equal({}, shared)  # Every run happened in another process.
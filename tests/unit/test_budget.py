@@ -0,0 +1,154 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests fitting runs into a time budget."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_raises
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestParseDuration(unittest.TestCase):
+
+    def test_units(self):
+        from proboscis.budget import parse_duration
+        assert_equal(90.0, parse_duration("90"))
+        assert_equal(45.0, parse_duration("45s"))
+        assert_equal(1800.0, parse_duration("30m"))
+        assert_equal(5400.0, parse_duration("1h30m"))
+        assert_equal(1.5, parse_duration("1.5"))
+
+    def test_nonsense_is_rejected(self):
+        from proboscis.budget import parse_duration
+        assert_raises(ValueError, parse_duration, "")
+        assert_raises(ValueError, parse_duration, "30 minutes")
+
+
+class StopAfter(object):
+    """An observer asking to stop once some cases have finished."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def case_started(self, case):
+        pass
+
+    def case_finished(self, case, outcome, duration):
+        self.count -= 1
+
+    def should_stop(self):
+        return self.count <= 0
+
+    def run_finished(self):
+        pass
+
+
+class TestTimeBudget(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.history import ResultHistory
+        self.directory = tempfile.mkdtemp()
+        self.history = ResultHistory(os.path.join(self.directory,
+                                                  "results.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_plan(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+
+        def slow_setup():
+            pass
+
+        def needs_slow_setup():
+            pass
+
+        def cheap():
+            pass
+
+        def important():
+            pass
+
+        def cheap_but_dull():
+            pass
+
+        registry.register(slow_setup)
+        registry.register(needs_slow_setup, depends_on=[slow_setup])
+        registry.register(cheap)
+        registry.register(important, priority=3)
+        registry.register(cheap_but_dull, priority=-1)
+        plan = TestPlan.create_from_registry(registry)
+        cases = dict((case.entry.home.__name__, case) for case in plan.tests)
+        durations = {"slow_setup": 8.0, "needs_slow_setup": 1.0,
+                     "cheap": 1.0, "important": 4.0, "cheap_but_dull": 1.0}
+        for name, duration in durations.items():
+            self.history.case_finished(cases[name], "pass", duration)
+        self.history.run_finished()
+        return plan
+
+    def names(self, cases):
+        return sorted(case.entry.home.__name__ for case in cases)
+
+    def test_most_valuable_cases_and_their_prerequisites_are_chosen(self):
+        from proboscis.budget import TimeBudget
+        plan = self.make_plan()
+        budget = TimeBudget(6.0, self.history, StringIO())
+        budget.select(plan)
+        assert_equal(["cheap", "cheap_but_dull", "important"],
+                     self.names(plan.tests))
+        assert_equal(["needs_slow_setup", "slow_setup"],
+                     self.names(budget.left_out))
+
+    def test_dependency_closures_are_kept_whole(self):
+        from proboscis.budget import TimeBudget
+        plan = self.make_plan()
+        TimeBudget(9.5, self.history, StringIO()).select(plan)
+        names = self.names(plan.tests)
+        assert_true("needs_slow_setup" not in names or "slow_setup" in names,
+                    names)
+
+    def test_left_out_cases_are_reported(self):
+        from proboscis.budget import TimeBudget
+        plan = self.make_plan()
+        stream = StringIO()
+        budget = TimeBudget(6.0, self.history, stream)
+        budget.select(plan)
+        budget.run_finished()
+        assert_true("Left out 2 tests which didn't fit:" in stream.getvalue())
+
+    def test_batch_runner_stops_starting_cases_when_asked(self):
+        from proboscis.parallel import BatchRunner
+        from proboscis.parallel import BatchSizer
+        from proboscis.parallel import LocalExecutor
+        plan = self.make_plan()
+        observers = [StopAfter(2)]
+        executor = LocalExecutor(plan.tests, observers=observers)
+        runner = BatchRunner(plan.tests, executor, stream=StringIO(),
+                             sizer=BatchSizer(maximum=1),
+                             observers=observers)
+        assert_true(runner.run())
+        assert_equal(2, runner.tests_run)
@@ -278,3 +278,430 @@ class TestCannotApplyDecoratorTwice(ProboscisRegistryTest):
             def hi():
                 pass
         assert_raises(RuntimeError, reg)
+
+
+class TestCaseIdentity(ProboscisRegistryTest):
+
+    def test_identity_is_module_and_name(self):
+        from proboscis import test
+        from proboscis import TestPlan
+
+        @test
+        def some_function():
+            pass
+
+        @test
+        class SomeClass(object):
+            @test
+            def some_method(self):
+                pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        identities = sorted(case.identity for case in plan.tests)
+        for identity in identities:
+            assert_true(identity.startswith(__name__ + ":"), identity)
+        assert_true(identities[0].endswith("SomeClass.some_method"))
+        assert_true(identities[1].endswith("some_function"))
+
+    def test_factory_instances_are_numbered(self):
+        from proboscis import factory
+        from proboscis import test
+        from proboscis import TestPlan
+
+        @test
+        class Made(object):
+            @test
+            def check(self):
+                pass
+
+        @factory
+        def make():
+            return [Made(), Made()]
+
+        plan = TestPlan.create_from_registry(self.registry)
+        identities = sorted(case.identity for case in plan.tests)
+        assert_equal(2, len(identities))
+        assert_true(identities[0].endswith("Made.check[0]"), identities[0])
+        assert_true(identities[1].endswith("Made.check[1]"), identities[1])
+
+
+class TestPlanSelect(ProboscisRegistryTest):
+
+    def test_keeps_only_the_chosen_instance_and_its_prerequisites(self):
+        from proboscis import after_class
+        from proboscis import before_class
+        from proboscis import factory
+        from proboscis import test
+        from proboscis import TestPlan
+
+        @test
+        def unrelated():
+            pass
+
+        @test
+        class Made(object):
+            @before_class
+            def set_up(self):
+                pass
+
+            @test
+            def check(self):
+                pass
+
+            @test
+            def other(self):
+                pass
+
+            @after_class
+            def tear_down(self):
+                pass
+
+        @factory
+        def make():
+            return [Made(), Made()]
+
+        plan = TestPlan.create_from_registry(self.registry)
+        chosen = [case for case in plan.tests
+                  if case.identity.endswith("Made.check[1]")]
+        plan.select(chosen)
+        identities = [case.identity.split(".")[-1] for case in plan.tests]
+        # The graph makes each instance's methods depend on every instance's
+        # before_class method, so both set_up cases are prerequisites, and
+        # each instance set up is torn down again.
+        assert_equal(["set_up[0]", "set_up[1]", "check[1]", "tear_down[0]",
+                      "tear_down[1]"], identities)
+
+    def test_keeps_the_after_class_method_of_a_chosen_method(self):
+        from proboscis import after_class
+        from proboscis import before_class
+        from proboscis import test
+        from proboscis import TestPlan
+
+        @test
+        class Example(object):
+            @before_class
+            def set_up(self):
+                pass
+
+            @test
+            def first(self):
+                pass
+
+            @test
+            def second(self):
+                pass
+
+            @after_class(always_run=True)
+            def tear_down(self):
+                pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        plan.select([case for case in plan.tests
+                     if case.identity.endswith(".first")])
+        assert_equal(["set_up", "first", "tear_down"],
+                     [case.identity.split(".")[-1] for case in plan.tests])
+
+
+class TestPlanLocality(ProboscisRegistryTest):
+
+    def test_class_instances_are_finished_before_others_start(self):
+        from proboscis import test
+        from proboscis import TestPlan
+        from proboscis.sorting import peak_live_states
+
+        @test
+        class First(object):
+            @test
+            def one(self):
+                pass
+
+            @test(depends_on=[one])
+            def two(self):
+                pass
+
+        @test
+        class Second(object):
+            @test
+            def one(self):
+                pass
+
+            @test(depends_on=[one])
+            def two(self):
+                pass
+
+        @test
+        def free():
+            pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        interleaved = [First.one, Second.one, free, First.two, Second.two]
+        plan.reorder(lambda case: interleaved.index(case.entry.home))
+        assert_equal(2, peak_live_states(plan.tests))
+        plan.reorder_by_locality()
+        names = [case.entry.home.__name__ for case in plan.tests]
+        assert_equal(["free", "one", "two", "one", "two"], names)
+        assert_equal(1, peak_live_states(plan.tests))
+
+    def test_show_plan_reports_instances_only_for_classes(self):
+        from proboscis import test
+        from proboscis import TestProgram
+        try:
+            from StringIO import StringIO
+        except ImportError:
+            from io import StringIO
+
+        def show_plan():
+            stdout = sys.stdout
+            sys.stdout = StringIO()
+            try:
+                TestProgram(registry=self.registry,
+                            argv=["prog", "--show-plan"]).run_and_exit()
+                return sys.stdout.getvalue()
+            finally:
+                sys.stdout = stdout
+
+        @test
+        def free():
+            pass
+
+        assert_false("Most class instances" in show_plan())
+
+        @test
+        class Example(object):
+            @test
+            def one(self):
+                pass
+
+        assert_true("Most class instances alive at once: 1" in show_plan())
+
+
+class TestPlanResources(ProboscisRegistryTest):
+
+    def test_cases_sharing_resources_are_clustered(self):
+        from proboscis import test
+        from proboscis import TestPlan
+        from proboscis.sorting import count_resource_setups
+
+        @test(resources=["server"])
+        class UsesServer(object):
+            @test
+            def first(self):
+                pass
+
+        @test(resources=["dataset"])
+        def uses_dataset():
+            pass
+
+        @test(resources=["server"])
+        def also_uses_server():
+            pass
+
+        @test(resources=["dataset", "server"])
+        def uses_both():
+            pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        plan.reorder(lambda case: [UsesServer.first, uses_dataset,
+                                   also_uses_server,
+                                   uses_both].index(case.entry.home))
+        assert_equal({"server": 2, "dataset": 2},
+                     count_resource_setups(plan.tests))
+        plan.reorder_by_resources()
+        assert_equal({"server": 1, "dataset": 1},
+                     count_resource_setups(plan.tests))
+        assert_equal(["first", "also_uses_server", "uses_both",
+                      "uses_dataset"],
+                     [case.entry.home.__name__ for case in plan.tests])
+
+
+class TestCoreObjectsAreSlotted(ProboscisRegistryTest):
+
+    def test_entries_and_cases_have_no_dict(self):
+        from proboscis import test
+        from proboscis import TestPlan
+
+        @test(groups=["slots"])
+        class Example(object):
+
+            @test
+            def method(self):
+                pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        entry = plan.tests[0].entry
+        for obj in (entry, entry.info, entry.parent, plan.tests[0],
+                    self.registry.groups["slots"]):
+            assert_false(hasattr(obj, '__dict__'), repr(obj))
+        assert_true(Example in entry.homes)
+
+
+class TestEntryInfoInherit(unittest.TestCase):
+
+    def test_keeps_order_and_skips_duplicates(self):
+        from proboscis.core import TestEntryInfo
+        parent = TestEntryInfo(groups=["a", "b", "c"],
+                               depends_on_groups=["x", "y"],
+                               resources=["db"])
+        child = TestEntryInfo(groups=["b", "d"], depends_on_groups=["y"],
+                              resources=["cache", "db"])
+        added = child.inherit(parent)
+        assert_equal(["a", "c"], added)
+        assert_equal(["b", "d", "a", "c"], child.groups)
+        assert_equal(["y", "x"], child.depends_on_groups)
+        assert_equal(["cache", "db"], child.resources)
+
+    def test_entry_may_not_depend_on_its_own_group(self):
+        from proboscis.core import TestEntry
+        from proboscis.core import TestEntryInfo
+        info = TestEntryInfo(groups=["a", "b"], depends_on_groups=["c", "b"])
+        assert_raises(RuntimeError, TestEntry, ExampleTest, info)
+
+
+class TestClassRegistrationReadsOnlyDicts(ProboscisRegistryTest):
+
+    def test_properties_are_not_evaluated(self):
+        from proboscis import test
+        from proboscis import TestPlan
+
+        class Base(object):
+
+            @test
+            def inherited(self):
+                pass
+
+        @test
+        class Example(Base):
+
+            @property
+            def broken(self):
+                fail("Properties shouldn't be read when registering.")
+
+            @test
+            def own(self):
+                pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        assert_equal(["inherited", "own"],
+                     sorted(case.entry.home.__name__ for case in plan.tests))
+
+    def test_before_and_after_class_methods_are_wired(self):
+        from proboscis import test
+        from proboscis import before_class
+        from proboscis import after_class
+
+        @test
+        class Example(object):
+
+            @before_class
+            def set_up(self):
+                pass
+
+            @test
+            def middle(self):
+                pass
+
+            @after_class
+            def tear_down(self):
+                pass
+
+        entries = dict((entry.home.__name__, entry)
+                       for entry in Example._proboscis_entry_.children)
+        assert_equal(set(), entries["set_up"].info.depends_on)
+        assert_equal(set([Example.set_up]),
+                     entries["middle"].info.depends_on)
+        assert_equal(set([Example.set_up, Example.middle]),
+                     entries["tear_down"].info.depends_on)
+
+
+class TestLazyRegistry(ProboscisRegistryTest):
+
+    def setUp(self):
+        super(TestLazyRegistry, self).setUp()
+        self.registry.lazy = True
+
+    def test_nothing_is_registered_until_planned(self):
+        from proboscis import test
+        from proboscis import before_class
+        from proboscis import TestPlan
+
+        @test(groups=["lazy"])
+        def first():
+            pass
+
+        @test(groups=["lazy"], depends_on=[first])
+        class Example(object):
+
+            @before_class
+            def set_up(self):
+                pass
+
+            @test
+            def check(self):
+                pass
+
+        assert_equal([], self.registry.tests)
+        assert_false(hasattr(first, '_proboscis_entry_'))
+        plan = TestPlan.create_from_registry(self.registry)
+        assert_equal([], self.registry.pending)
+        assert_equal(["first", "set_up", "check"],
+                     [case.entry.home.__name__ for case in plan.tests])
+        assert_equal(4, len(self.registry.groups["lazy"].entries))
+
+    def test_applying_twice_is_reported_when_flushed(self):
+        from proboscis import test
+
+        def twice():
+            pass
+        test(twice)
+        test(twice)
+        assert_raises(RuntimeError, self.registry.flush)
+
+
+class TestRegistryForks(ProboscisRegistryTest):
+
+    def test_forks_only_see_what_was_registered_before(self):
+        from proboscis import TestPlan
+
+        def first():
+            pass
+
+        def second():
+            pass
+
+        def third():
+            pass
+        self.registry.register(first, groups=["shared"])
+        fork = self.registry.fork()
+        fork.register(second, groups=["shared"])
+        self.registry.register(third, groups=["shared"])
+
+        def names(registry):
+            plan = TestPlan.create_from_registry(registry)
+            return [case.entry.home.__name__ for case in plan.tests]
+        assert_equal(["first", "third"], names(self.registry))
+        assert_equal(["first", "second"], names(fork))
+        assert_equal(2, len(fork.groups["shared"].entries))
+        assert_equal(2, len(self.registry.groups["shared"].entries))
+
+    def test_snapshots_cannot_change(self):
+        def first():
+            pass
+        snapshot = self.registry.snapshot()
+        assert_raises(RuntimeError, snapshot.register, first)
+        assert_raises(RuntimeError, snapshot.reset)
+        self.registry.register(first)
+        assert_equal([], snapshot.tests)
+
+    def test_factories_of_a_fork_do_not_hide_classes_elsewhere(self):
+        from proboscis import TestPlan
+
+        class Example(object):
+            def check(self):
+                pass
+        self.registry.register(Example.check)
+        self.registry.register(Example)
+        fork = self.registry.fork()
+        fork.register_factory(lambda: [Example(), Example()])
+        assert_equal(2, len(TestPlan.create_from_registry(fork).tests))
+        assert_equal(1,
+                     len(TestPlan.create_from_registry(self.registry).tests))
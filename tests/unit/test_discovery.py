@@ -0,0 +1,200 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests finding tests by parsing modules instead of importing them."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_false
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+SOURCE = '''
+import proboscis
+from proboscis import test, before_class, register
+
+GROUPS = ["computed"]
+
+@test(groups=["users"], depends_on_groups=["setup"])
+def create_user():
+    pass
+
+@test(groups=["servers"])
+class ServerTests(object):
+
+    @before_class
+    def set_up(self):
+        pass
+
+    @proboscis.test(groups=["slow"])
+    def reboot(self):
+        pass
+
+    def helper(self):
+        pass
+
+@test(groups=GROUPS)
+def computed():
+    pass
+
+register(groups=["everything"], depends_on_groups=["users", "servers"])
+'''
+
+
+class TestParseSource(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.discovery import parse_source
+        self.records = dict((record["name"], record)
+                            for record in parse_source(SOURCE))
+
+    def test_finds_decorated_functions_classes_and_methods(self):
+        assert_equal(set(["create_user", "ServerTests", "ServerTests.set_up",
+                          "ServerTests.reboot", "computed", None]),
+                     set(self.records.keys()))
+        assert_equal("before_class",
+                     self.records["ServerTests.set_up"]["kind"])
+        assert_equal(8, self.records["create_user"]["line"])
+
+    def test_methods_inherit_the_groups_of_their_class(self):
+        assert_equal(["servers"], self.records["ServerTests.set_up"]["groups"])
+        assert_equal(["slow", "servers"],
+                     self.records["ServerTests.reboot"]["groups"])
+
+    def test_reads_literal_arguments_only(self):
+        assert_equal(["setup"],
+                     self.records["create_user"]["depends_on_groups"])
+        assert_equal(None, self.records["computed"]["groups"])
+        assert_equal(["users", "servers"],
+                     self.records[None]["depends_on_groups"])
+
+
+def record(groups, depends_on_groups=(), kind="test"):
+    return {"kind": kind, "name": "x", "line": 1, "groups": groups,
+            "depends_on_groups": list(depends_on_groups)}
+
+
+class TestSelectModules(unittest.TestCase):
+
+    def test_follows_the_groups_tests_depend_on(self):
+        from proboscis.discovery import select_modules
+        files = {"a.py": [record(["users"], ["setup"])],
+                 "b.py": [record(["setup"])],
+                 "c.py": [record(["servers"])]}
+        assert_equal(["a.py", "b.py"], select_modules(files, ["users"]))
+        assert_equal(["a.py", "b.py", "c.py"], select_modules(files, []))
+
+    def test_imports_what_it_cannot_read(self):
+        from proboscis.discovery import select_modules
+        files = {"a.py": [record(["users"])],
+                 "b.py": [record(None)],
+                 "c.py": [record([], kind="factory")],
+                 "d.py": None,
+                 "e.py": [record(["servers"])]}
+        assert_equal(["a.py", "b.py", "c.py", "d.py"],
+                     select_modules(files, ["users"]))
+        files["e.py"][0]["depends_on_groups"] = None
+        assert_equal(["a.py", "b.py", "c.py", "d.py", "e.py"],
+                     select_modules(files, ["users"]))
+
+
+class TestDiscoveryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.package = os.path.join(self.root, "discovered")
+        os.makedirs(self.package)
+        self.write("__init__.py", "")
+        self.write("test_users.py", SOURCE)
+        self.write("helpers.py", "def helper():\n    pass\n")
+        self.index_path = os.path.join(self.root, "discovery.json")
+        self.old_state_dir = os.environ.get("PROBOSCIS_STATE_DIR")
+        os.environ["PROBOSCIS_STATE_DIR"] = os.path.join(self.root, "state")
+
+    def tearDown(self):
+        if self.old_state_dir is None:
+            del os.environ["PROBOSCIS_STATE_DIR"]
+        else:
+            os.environ["PROBOSCIS_STATE_DIR"] = self.old_state_dir
+        if self.root in sys.path:
+            sys.path.remove(self.root)
+        sys.modules.pop("discovered", None)
+        sys.modules.pop("discovered.imported", None)
+        shutil.rmtree(self.root)
+
+    def write(self, name, source, mtime=None):
+        path = os.path.join(self.package, name)
+        output = open(path, 'w')
+        output.write(source)
+        output.close()
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_only_files_holding_tests_are_returned(self):
+        from proboscis.discovery import DiscoveryIndex
+        files = DiscoveryIndex(self.index_path).scan(self.package)
+        assert_equal([os.path.join(self.package, "test_users.py")],
+                     list(files.keys()))
+
+    def test_files_are_parsed_again_only_once_changed(self):
+        from proboscis.discovery import DiscoveryIndex
+        path = self.write("test_users.py", SOURCE, mtime=1000)
+        DiscoveryIndex(self.index_path).scan(self.package)
+        index = DiscoveryIndex(self.index_path)
+        index.scan(self.package)
+        assert_false(index.changed)
+        assert_equal(1000, index.files[path]["mtime"])
+        self.write("test_users.py", "@test\ndef only():\n    pass\n",
+                   mtime=2000)
+        files = DiscoveryIndex(self.index_path).scan(self.package)
+        assert_equal(["only"], [item["name"] for item in files[path]])
+
+    def test_imports_modules_by_path(self):
+        from proboscis.discovery import import_modules
+        path = self.write("imported.py", "VALUE = 5\n")
+        import_modules([path], self.root)
+        assert_equal(5, sys.modules["discovered.imported"].VALUE)
+
+    def test_lists_groups_and_a_provisional_plan(self):
+        from proboscis.discovery import DiscoveryIndex
+        from proboscis.discovery import write_groups
+        from proboscis.discovery import write_plan
+        files = DiscoveryIndex(self.index_path).scan(self.package)
+        output = StringIO()
+        write_groups(files, output)
+        assert_equal("servers (3)\nslow (1)\nusers (1)\n", output.getvalue())
+        output = StringIO()
+        write_plan(files, sorted(files), output, self.root)
+        assert_true("create_user  groups: users" in output.getvalue())
+        assert_true("computed  groups: ?" in output.getvalue())
+
+    def test_program_lists_groups_without_importing(self):
+        from proboscis import TestProgram
+        from proboscis import TestRegistry
+        TestProgram(registry=TestRegistry(),
+                    argv=["prog", "--discover=%s" % self.package,
+                          "--list-groups"])
+        assert_false("discovered.test_users" in sys.modules)
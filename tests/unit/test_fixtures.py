@@ -0,0 +1,316 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Tests building and tearing down fixtures shared by tests."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_raises
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestFixtures(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.fixtures import active_manager
+        self.old_manager = active_manager()
+        self.events = []
+
+    def tearDown(self):
+        from proboscis.fixtures import activate
+        activate(self.old_manager)
+
+    def run_plan(self, registry, workers=1):
+        from proboscis import TestPlan
+        from proboscis.fixtures import activate
+        from proboscis.fixtures import FixtureManager
+        from proboscis.parallel import BatchRunner
+        from proboscis.parallel import ForkServerExecutor
+        from proboscis.parallel import LocalExecutor
+        plan = TestPlan.create_from_registry(registry)
+        manager = FixtureManager(plan.tests)
+        activate(manager)
+        if workers > 1:
+            executor = ForkServerExecutor(plan.tests, workers)
+        else:
+            executor = LocalExecutor(plan.tests, observers=[manager])
+        runner = BatchRunner(plan.tests, executor, stream=StringIO())
+        try:
+            return runner.run()
+        finally:
+            manager.run_finished()
+
+    def make_server(self):
+        from proboscis import fixture
+        events = self.events
+
+        @fixture
+        def server():
+            events.append("start")
+            yield "server"
+            events.append("stop")
+        return server
+
+    def test_built_on_first_use_and_torn_down_after_the_last(self):
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        server = self.make_server()
+        events = self.events
+
+        def first():
+            events.append("first")
+
+        def second():
+            events.append("second uses %s" % server())
+
+        def third():
+            events.append("third uses %s" % server())
+
+        def last():
+            events.append("last")
+
+        registry.register(first)
+        registry.register(second, depends_on=[first], fixtures=[server])
+        registry.register(third, depends_on=[second], fixtures=[server])
+        registry.register(last, depends_on=[third])
+        assert_true(self.run_plan(registry))
+        assert_equal(["first", "start", "second uses server",
+                      "third uses server", "stop", "last"], self.events)
+
+    def test_never_built_if_not_called(self):
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        server = self.make_server()
+
+        def ignores_server():
+            pass
+
+        registry.register(ignores_server, fixtures=[server])
+        assert_true(self.run_plan(registry))
+        assert_equal([], self.events)
+
+    def test_class_scope_builds_one_per_instance(self):
+        from proboscis import fixture
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        made = []
+
+        @fixture(scope="class")
+        def connection():
+            made.append(object())
+            return made[-1]
+
+        class First(object):
+            def one(self):
+                self.connection = connection()
+
+            def two(self):
+                assert_true(connection() is self.connection)
+
+        class Second(object):
+            def one(self):
+                connection()
+
+        registry.register(First.one)
+        registry.register(First.two, depends_on=[First.one])
+        registry.register(First, fixtures=[connection])
+        registry.register(Second.one)
+        registry.register(Second, fixtures=[connection])
+        assert_true(self.run_plan(registry))
+        assert_equal(2, len(made))
+
+    def test_group_scope_builds_one_per_group(self):
+        from proboscis import fixture
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        made = []
+
+        @fixture(scope="group")
+        def data():
+            made.append(len(made))
+            return made[-1]
+
+        def a1():
+            assert_equal(0, data())
+
+        def a2():
+            assert_equal(0, data())
+
+        def b1():
+            assert_equal(1, data())
+
+        registry.register(a1, groups=["a"], fixtures=[data])
+        registry.register(a2, groups=["a"], depends_on=[a1], fixtures=[data])
+        registry.register(b1, groups=["b"], depends_on=[a2], fixtures=[data])
+        assert_true(self.run_plan(registry))
+        assert_equal([0, 1], made)
+
+    def test_errors_building_are_raised_to_each_user(self):
+        from proboscis import fixture
+        from proboscis.fixtures import FixtureManager
+        calls = []
+
+        @fixture
+        def broken():
+            calls.append(None)
+            raise RuntimeError("Can't start.")
+
+        manager = FixtureManager()
+        assert_raises(RuntimeError, manager.get, broken)
+        assert_raises(RuntimeError, manager.get, broken)
+        assert_equal(1, len(calls))
+
+    def test_unknown_scope_is_an_error(self):
+        from proboscis import fixture
+        assert_raises(ValueError, fixture(scope="module"), lambda: None)
+
+    def test_fixtures_count_as_resources(self):
+        from proboscis.core import TestEntryInfo
+        server = self.make_server()
+        info = TestEntryInfo(resources=["dataset"], fixtures=[server])
+        assert_equal(["dataset", "server"], info.resources)
+
+    def test_users_share_a_worker_process(self):
+        from proboscis import fixture
+        from proboscis import TestRegistry
+        from proboscis.parallel import affinity_keys
+        from proboscis.parallel import ForkServerExecutor
+        if not ForkServerExecutor.is_supported():
+            return
+        registry = TestRegistry()
+        descriptor, path = tempfile.mkstemp()
+        os.close(descriptor)
+
+        def note(text):
+            log = open(path, 'a')
+            try:
+                log.write("%s %d\n" % (text, os.getpid()))
+            finally:
+                log.close()
+
+        @fixture
+        def server():
+            note("start")
+            yield "server"
+            note("stop")
+
+        def one():
+            server()
+            note("one")
+
+        def two():
+            server()
+            note("two")
+
+        def unrelated():
+            pass
+
+        registry.register(one, fixtures=[server])
+        registry.register(two, fixtures=[server])
+        registry.register(unrelated)
+        try:
+            from proboscis import TestPlan
+            plan = TestPlan.create_from_registry(registry)
+            keys = affinity_keys(plan.tests)
+            assert_true(keys[0] is not None)
+            assert_equal(keys[0], keys[1])
+            assert_equal(None, keys[2])
+            assert_true(self.run_plan(registry, workers=2))
+            lines = [line.split() for line in open(path).read().splitlines()]
+        finally:
+            os.remove(path)
+        assert_equal(["start", "one", "two", "stop"],
+                     [line[0] for line in lines])
+        assert_equal(1, len(set(line[1] for line in lines)))
+
+
+class TestFixtureCache(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.fixture_cache import FixtureCache
+        self.directory = tempfile.mkdtemp()
+        self.cache = FixtureCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_values_are_pickled(self):
+        assert_equal((False, None), self.cache.load("key"))
+        self.cache.store("key", {"users": [1, 2]})
+        assert_equal((True, {"users": [1, 2]}), self.cache.load("key"))
+
+    def test_buffers_come_back_memory_mapped(self):
+        import mmap
+        self.cache.store("key", b"abc" * 1000)
+        found, value = self.cache.load("key")
+        assert_true(found)
+        assert_true(isinstance(value, mmap.mmap))
+        assert_equal(b"abcabc", value[:6])
+        value.close()
+
+    def test_old_entries_are_evicted(self):
+        self.cache.store("old", "value")
+        self.cache.store("new", "value")
+        old = time.time() - self.cache.max_age - 60
+        os.utime(self.cache.path("old", ".pickle"), (old, old))
+        self.cache.evict()
+        assert_equal(False, self.cache.load("old")[0])
+        assert_equal(True, self.cache.load("new")[0])
+
+    def test_least_recently_used_are_evicted_to_fit(self):
+        self.cache.store("first", b"x" * 100)
+        self.cache.store("second", b"x" * 100)
+        earlier = time.time() - 60
+        os.utime(self.cache.path("first", ".bin"), (earlier, earlier))
+        self.cache.max_bytes = 150
+        self.cache.evict()
+        assert_equal(False, self.cache.load("first")[0])
+        assert_equal(True, self.cache.load("second")[0])
+
+    def test_manager_builds_only_on_a_miss(self):
+        from proboscis import fixture
+        from proboscis.fixtures import FixtureManager
+        calls = []
+        version = [1]
+
+        @fixture(cache=True, inputs=lambda: version[0])
+        def dataset():
+            calls.append(version[0])
+            return list(range(version[0]))
+
+        assert_equal([0], FixtureManager(cache=self.cache).get(dataset))
+        assert_equal([0], FixtureManager(cache=self.cache).get(dataset))
+        version[0] = 2
+        assert_equal([0, 1], FixtureManager(cache=self.cache).get(dataset))
+        assert_equal([1, 2], calls)
+
+    def test_cached_fixtures_may_not_yield(self):
+        from proboscis import fixture
+
+        def server():
+            yield None
+
+        assert_raises(ValueError, fixture(cache=True), server)
@@ -0,0 +1,244 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests the results kept between runs."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_false
+from proboscis.asserts import assert_true
+
+
+class FakeEntry(object):
+
+    def __init__(self, home):
+        self.home = home
+
+
+class FakeCase(object):
+
+    def __init__(self, identity, home=None):
+        self.identity = identity
+        self.entry = FakeEntry(home)
+
+
+class HistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "results.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def history(self):
+        from proboscis.history import ResultHistory
+        return ResultHistory(self.path)
+
+
+class TestResultHistory(HistoryTest):
+
+    def test_outcomes_survive_between_runs(self):
+        history = self.history()
+        history.case_finished(FakeCase("m:a"), "pass", 0.5)
+        history.case_finished(FakeCase("m:b"), "fail", 0.25)
+        history.run_finished()
+        loaded = self.history()
+        assert_equal("pass", loaded.last_outcome("m:a"))
+        assert_equal("fail", loaded.last_outcome("m:b"))
+        assert_equal(None, loaded.last_outcome("m:c"))
+
+    def test_worst_outcome_of_a_case_wins(self):
+        history = self.history()
+        case = FakeCase("m:TestCaseClass")
+        history.case_finished(case, "pass", 1.0)
+        history.case_finished(case, "error", 1.0)
+        history.case_finished(case, "pass", 1.0)
+        history.run_finished()
+        assert_equal([("error", 3.0)],
+                     [(record["outcome"], record["duration"])
+                      for record in self.history().records(case.identity)])
+
+    def test_history_length_is_limited(self):
+        from proboscis.history import HISTORY_LENGTH
+        for i in range(HISTORY_LENGTH + 5):
+            history = self.history()
+            history.case_finished(FakeCase("m:a"), "pass", 0.0)
+            history.run_finished()
+        assert_equal(HISTORY_LENGTH, len(self.history().records("m:a")))
+
+    def test_failed_cases(self):
+        history = self.history()
+        history.case_finished(FakeCase("m:ok"), "pass", 0.0)
+        history.case_finished(FakeCase("m:failed"), "fail", 0.0)
+        history.case_finished(FakeCase("m:error"), "error", 0.0)
+        history.case_finished(FakeCase("m:skipped"), "skip", 0.0)
+        history.run_finished()
+        cases = [FakeCase(name) for name in
+                 ("m:ok", "m:failed", "m:error", "m:skipped", "m:new")]
+        assert_equal(["m:failed", "m:error"],
+                     [case.identity for case in
+                      self.history().failed_cases(cases)])
+
+
+def first_function():
+    pass
+
+
+def second_function():
+    pass
+
+
+class TestHistoryOrder(HistoryTest):
+
+    def make_plan(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+
+        def setup():
+            pass
+
+        def stable():
+            pass
+
+        def flaky():
+            pass
+
+        def needs_setup():
+            pass
+
+        registry.register(setup)
+        registry.register(stable)
+        registry.register(flaky)
+        registry.register(needs_setup, depends_on=[setup])
+        plan = TestPlan.create_from_registry(registry)
+        return plan, dict((case.entry.home.__name__, case)
+                          for case in plan.tests)
+
+    def record(self, outcomes, cases):
+        history = self.history()
+        for name, outcome in outcomes.items():
+            history.case_finished(cases[name], outcome, 0.0)
+        history.run_finished()
+
+    def names(self, plan):
+        return [case.entry.home.__name__ for case in plan.tests]
+
+    def test_recent_failures_and_their_prerequisites_go_first(self):
+        from proboscis.history import HistoryOrder
+        plan, cases = self.make_plan()
+        self.record({"setup": "pass", "stable": "fail", "flaky": "pass",
+                     "needs_setup": "pass"}, cases)
+        self.record({"setup": "pass", "stable": "pass", "flaky": "pass",
+                     "needs_setup": "error"}, cases)
+        plan.reorder(HistoryOrder(self.history()))
+        assert_equal(["setup", "needs_setup", "stable", "flaky"],
+                     self.names(plan))
+
+    def test_changed_first_prefers_cases_without_matching_source(self):
+        from proboscis.history import HistoryOrder
+        plan, cases = self.make_plan()
+        self.record({"setup": "pass", "stable": "fail", "flaky": "pass",
+                     "needs_setup": "pass"}, cases)
+        history = self.history()
+        # Pretend flaky was edited since it last ran.
+        history.records(cases["flaky"].identity)[-1]["source"] = "out of date"
+        plan.reorder(HistoryOrder(history, changed_first=True))
+        assert_equal(["flaky", "stable"], self.names(plan)[:2])
+
+    def test_source_changed(self):
+        history = self.history()
+        history.case_finished(FakeCase("m:first", first_function), "pass", 0)
+        history.run_finished()
+        history = self.history()
+        assert_false(history.source_changed(FakeCase("m:first",
+                                                     first_function)))
+        assert_true(history.source_changed(FakeCase("m:first",
+                                                    second_function)))
+        assert_true(history.source_changed(FakeCase("m:new", first_function)))
+
+
+class TestFlakiness(HistoryTest):
+
+    def record_runs(self, outcomes, source="same"):
+        for outcome in outcomes:
+            history = self.history()
+            history.case_finished(FakeCase("m:a"), outcome, 0.0)
+            history.current["m:a"]["source"] = source
+            history.run_finished()
+
+    def test_flips_under_the_same_source_are_flaky(self):
+        self.record_runs(["pass", "fail", "pass", "pass", "error"])
+        assert_equal(0.75, self.history().flakiness("m:a"))
+        assert_equal(["m:a"], [case.identity for case in
+                               self.history().flaky_cases([FakeCase("m:a")])])
+
+    def test_too_few_runs_are_not_judged(self):
+        self.record_runs(["pass", "fail", "pass"])
+        assert_equal(None, self.history().flakiness("m:a"))
+
+    def test_skips_and_source_changes_are_ignored(self):
+        self.record_runs(["pass", "pass"], source="old")
+        self.record_runs(["fail", "skip", "fail", "fail", "fail"],
+                         source="new")
+        assert_equal(0.0, self.history().flakiness("m:a"))
+
+
+class TestProgramSavesHistoryOnlyWhenAsked(unittest.TestCase):
+
+    def setUp(self):
+        self.old_state_dir = os.environ.get("PROBOSCIS_STATE_DIR")
+        self.directory = tempfile.mkdtemp()
+        self.state = os.path.join(self.directory, "state")
+        os.environ["PROBOSCIS_STATE_DIR"] = self.state
+
+    def tearDown(self):
+        if self.old_state_dir is None:
+            del os.environ["PROBOSCIS_STATE_DIR"]
+        else:
+            os.environ["PROBOSCIS_STATE_DIR"] = self.old_state_dir
+        shutil.rmtree(self.directory)
+
+    def program(self, *args):
+        from proboscis import TestProgram
+        from proboscis import TestRegistry
+        from proboscis.history import ResultHistory
+        from proboscis.journal import Journal
+        registry = TestRegistry()
+
+        def passes():
+            pass
+        registry.register(passes)
+        program = TestProgram(registry=registry,
+                              argv=["prog", "--show-plan"] + list(args))
+        kinds = [type(observer) for observer in program.observers]
+        return ResultHistory in kinds, Journal in kinds
+
+    def test_nothing_is_saved_by_default(self):
+        assert_equal((False, False), self.program())
+        assert_false(os.path.exists(self.state))
+
+    def test_history_switch_saves_results_and_journal(self):
+        assert_equal((True, True), self.program("--history"))
+        assert_false(os.path.exists(self.state))  # Only once written.
+
+    def test_options_reading_history_add_to_it(self):
+        assert_equal((True, False), self.program("--last-failed"))
+        assert_equal((False, True), self.program("--resume"))
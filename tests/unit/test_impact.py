@@ -0,0 +1,195 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests test impact analysis."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_false
+from proboscis.asserts import assert_true
+
+
+DIFF = """diff --git a/pkg/lib.py b/pkg/lib.py
+--- a/pkg/lib.py
++++ b/pkg/lib.py
+@@ -10,2 +10,3 @@ def thing():
+     pass
++    more()
+"""
+
+
+DELETE_AND_RENAME = """diff --git a/pkg/old.py b/pkg/old.py
+deleted file mode 100644
+--- a/pkg/old.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-def gone():
+-    pass
+diff --git a/pkg/before.py b/pkg/after.py
+similarity index 100%
+rename from pkg/before.py
+rename to pkg/after.py
+"""
+
+
+class TempDirTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+class TestParseChanges(unittest.TestCase):
+
+    def test_list_of_files(self):
+        from proboscis.impact import parse_changes
+        assert_equal({"a.py": None, os.path.join("b", "c.py"): None},
+                     parse_changes("a.py\nb/c.py\n\n"))
+
+    def test_unified_diff(self):
+        from proboscis.impact import parse_changes
+        assert_equal({os.path.join("pkg", "lib.py"): [(9, 13)]},
+                     parse_changes(DIFF))
+
+    def test_deleted_and_renamed_files_are_wholly_changed(self):
+        from proboscis.impact import parse_changes
+        assert_equal({os.path.join("pkg", "old.py"): None,
+                      os.path.join("pkg", "before.py"): None,
+                      os.path.join("pkg", "after.py"): None},
+                     parse_changes(DELETE_AND_RENAME))
+
+
+class TestImpactIndex(TempDirTest):
+
+    def test_impacted_when_ranges_overlap(self):
+        from proboscis.impact import ImpactIndex
+        index = ImpactIndex(os.path.join(self.directory, "impact.json"))
+        index.record("m:f", {"lib.py": [[1, 5]]})
+        assert_true(index.is_impacted("m:f", {"lib.py": None}))
+        assert_true(index.is_impacted("m:f", {"lib.py": [(5, 7)]}))
+        assert_false(index.is_impacted("m:f", {"lib.py": [(6, 7)]}))
+        assert_false(index.is_impacted("m:f", {"other.py": None}))
+
+    def test_unknown_cases_are_impacted(self):
+        from proboscis.impact import ImpactIndex
+        index = ImpactIndex(os.path.join(self.directory, "impact.json"))
+        assert_true(index.is_impacted("m:never_seen", {}))
+
+    def test_survives_save_and_load(self):
+        from proboscis.impact import ImpactIndex
+        path = os.path.join(self.directory, "impact.json")
+        index = ImpactIndex(path)
+        index.record("m:f", {"lib.py": [[1, 5]]})
+        index.save()
+        assert_equal({"m:f": {"lib.py": [[1, 5]]}}, ImpactIndex(path).cases)
+
+
+def helper_called_by_test():
+    return 42
+
+
+def other_helper_called_by_test():
+    return 43
+
+
+class TestImpactRecorder(TempDirTest):
+
+    def test_records_functions_called_during_case(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.impact import ImpactIndex
+        from proboscis.impact import ImpactRecorder
+        from proboscis.parallel import run_case
+        registry = TestRegistry()
+
+        def uses_helper():
+            helper_called_by_test()
+
+        registry.register(uses_helper)
+        case = TestPlan.create_from_registry(registry).tests[0]
+        index = ImpactIndex(os.path.join(self.directory, "impact.json"))
+        root = os.path.dirname(os.path.abspath(__file__))
+        recorder = ImpactRecorder(index, root=root)
+        run_case(case, observers=[recorder])
+        touched = index.cases[case.identity]
+        this_file = os.path.basename(__file__).replace(".pyc", ".py")
+        lines = helper_called_by_test.__code__.co_firstlineno
+        assert_true(any(first == lines for first, last
+                        in touched[this_file]), str(touched))
+
+    def test_merges_what_each_method_of_a_class_touched(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.case import PASS
+        from proboscis.impact import ImpactIndex
+        from proboscis.impact import ImpactRecorder
+        registry = TestRegistry()
+
+        class Methods(unittest.TestCase):
+            def test_a(self):
+                pass
+
+        registry.register(Methods)
+        case = TestPlan.create_from_registry(registry).tests[0]
+        index = ImpactIndex(os.path.join(self.directory, "impact.json"))
+        root = os.path.dirname(os.path.abspath(__file__))
+        recorder = ImpactRecorder(index, root=root)
+        for helper in (helper_called_by_test, other_helper_called_by_test):
+            recorder.case_started(case)
+            helper()
+            recorder.case_finished(case, PASS, 0.0)
+        this_file = os.path.basename(__file__).replace(".pyc", ".py")
+        firsts = [first for first, last
+                  in index.cases[case.identity][this_file]]
+        for helper in (helper_called_by_test, other_helper_called_by_test):
+            assert_true(helper.__code__.co_firstlineno in firsts, str(firsts))
+
+    def test_keeps_the_trace_function_already_installed(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.impact import ImpactIndex
+        from proboscis.impact import ImpactRecorder
+        from proboscis.parallel import run_case
+        registry = TestRegistry()
+        called = []
+
+        def tracer(frame, event, arg):
+            if frame.f_code is helper_called_by_test.__code__:
+                called.append(event)
+            return None
+
+        def uses_helper():
+            helper_called_by_test()
+
+        registry.register(uses_helper)
+        case = TestPlan.create_from_registry(registry).tests[0]
+        index = ImpactIndex(os.path.join(self.directory, "impact.json"))
+        recorder = ImpactRecorder(index, root=self.directory)
+        original = sys.gettrace()
+        sys.settrace(tracer)
+        try:
+            run_case(case, observers=[recorder])
+            assert_true(sys.gettrace() is tracer)
+        finally:
+            sys.settrace(original)
+        if getattr(sys, 'monitoring', None) is None:
+            assert_equal(["call"], called)
@@ -0,0 +1,191 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests checkpointing and resuming runs with the journal."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        import proboscis
+        from proboscis import TestRegistry
+        self.old_default_registry = proboscis.decorators.DEFAULT_REGISTRY
+        self.registry = TestRegistry()
+        proboscis.decorators.DEFAULT_REGISTRY = self.registry
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "journal.jsonl")
+
+    def tearDown(self):
+        import proboscis
+        proboscis.decorators.DEFAULT_REGISTRY = self.old_default_registry
+        shutil.rmtree(self.directory)
+
+    def make_plan(self):
+        import proboscis
+        from proboscis import after_class
+        from proboscis import before_class
+        from proboscis import test
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        self.registry = TestRegistry()
+        proboscis.decorators.DEFAULT_REGISTRY = self.registry
+
+        @test
+        def broken():
+            pass
+
+        @test(depends_on=[broken])
+        def needs_broken():
+            pass
+
+        @test
+        class Partly(object):
+            @before_class
+            def set_up(self):
+                pass
+
+            @test
+            def first(self):
+                pass
+
+            @test(depends_on=[first])
+            def second(self):
+                pass
+
+            @after_class
+            def tear_down(self):
+                pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        return plan, dict((case.identity.split(".")[-1], case)
+                          for case in plan.tests)
+
+    def write(self, text):
+        journal = open(self.path, 'w')
+        journal.write(text)
+        journal.close()
+
+    def read(self):
+        journal = open(self.path, 'r')
+        try:
+            return journal.read()
+        finally:
+            journal.close()
+
+
+class TestReadJournal(JournalTest):
+
+    def test_partial_and_corrupt_lines_are_ignored(self):
+        from proboscis.journal import read_journal
+        self.write('{"case": "m:a", "outcome": "pass"}\n'
+                   'garbage\n'
+                   '{"case": "m:b", "outcome": "fail"}\n'
+                   '{"case": "m:c", "outc')
+        assert_equal({"m:a": ("pass", 1), "m:b": ("fail", 1)},
+                     read_journal(self.path))
+
+    def test_missing_journal_is_empty(self):
+        from proboscis.journal import read_journal
+        assert_equal({}, read_journal(self.path))
+
+
+class TestJournal(JournalTest):
+
+    def test_new_run_starts_a_new_journal(self):
+        from proboscis.journal import Journal
+        plan, cases = self.make_plan()
+        self.write('{"case": "m:old", "outcome": "pass"}\n')
+        journal = Journal(self.path)
+        journal.case_finished(cases["broken"], "fail", 0.0)
+        journal.run_finished()
+        assert_equal('{"case": "%s", "outcome": "fail"}\n'
+                     % cases["broken"].identity, self.read())
+
+    def test_resuming_appends_after_a_partial_line(self):
+        from proboscis.journal import Journal
+        plan, cases = self.make_plan()
+        self.write('{"case": "m:old", "outcome": "pass"}\n{"case": "m:')
+        journal = Journal(self.path, resume=True)
+        journal.case_finished(cases["broken"], "fail", 0.0)
+        journal.run_finished()
+        lines = self.read().splitlines()
+        assert_equal(2, len(lines))
+        assert_true(lines[1].startswith('{"case": "%s"'
+                                        % cases["broken"].identity))
+
+    def test_resume_rebuilds_state_for_partly_finished_classes(self):
+        from proboscis.journal import Journal
+        plan, cases = self.make_plan()
+        journal = Journal(self.path)
+        for name in ("broken", "set_up", "first"):
+            outcome = name == "broken" and "fail" or "pass"
+            journal.case_finished(cases[name], outcome, 0.0)
+        journal.run_finished()
+        plan, cases = self.make_plan()
+        Journal(self.path, resume=True).resume(plan)
+        names = sorted(case.identity.split(".")[-1] for case in plan.tests)
+        assert_equal(["first", "needs_broken", "second", "set_up",
+                      "tear_down"], names)
+        assert_true(cases["needs_broken"].dependency_failure is not None)
+        assert_equal(None, cases["second"].dependency_failure)
+
+    def test_resume_runs_passed_function_prerequisites_again(self):
+        from proboscis import test
+        from proboscis import TestPlan
+        from proboscis.journal import Journal
+        created = []
+
+        @test
+        def setup_db():
+            created.append("db")
+
+        @test(depends_on=[setup_db])
+        def use_db():
+            assert_equal(["db"], created)
+
+        @test
+        def unrelated():
+            pass
+
+        plan = TestPlan.create_from_registry(self.registry)
+        cases = dict((case.entry.home.__name__, case) for case in plan.tests)
+        journal = Journal(self.path)
+        for name in ("setup_db", "unrelated"):
+            journal.case_finished(cases[name], "pass", 0.0)
+        journal.run_finished()
+        Journal(self.path, resume=True).resume(plan)
+        assert_equal(["setup_db", "use_db"],
+                     [case.entry.home.__name__ for case in plan.tests])
+
+    def test_resume_without_a_journal_warns_and_keeps_everything(self):
+        from proboscis.journal import Journal
+        plan, cases = self.make_plan()
+        stream = StringIO()
+        Journal(self.path, resume=True).resume(plan, stream)
+        assert_equal(len(cases), len(plan.tests))
+        assert_true("No journal found" in stream.getvalue())
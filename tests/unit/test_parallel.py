@@ -0,0 +1,322 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests the batching scheduler and runner in proboscis.parallel."""
+
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestBatchSizer(unittest.TestCase):
+
+    def test_starts_with_single_case_batches(self):
+        from proboscis.parallel import BatchSizer
+        assert_equal(1, BatchSizer().size)
+
+    def test_grows_for_tiny_cases_up_to_maximum(self):
+        from proboscis.parallel import BatchSizer
+        sizer = BatchSizer(target=0.1, maximum=20)
+        sizer.record(0.01)
+        assert_equal(10, sizer.size)
+        for i in range(100):
+            sizer.record(0.0)
+        assert_equal(20, sizer.size)
+
+    def test_shrinks_for_slow_cases(self):
+        from proboscis.parallel import BatchSizer
+        sizer = BatchSizer(target=0.1)
+        sizer.record(0.001)
+        for i in range(100):
+            sizer.record(5.0)
+        assert_equal(1, sizer.size)
+
+
+class TestCaseScheduler(unittest.TestCase):
+
+    def make_plan(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        calls = []
+
+        def setup():
+            calls.append("setup")
+
+        def uses_setup():
+            calls.append("uses_setup")
+
+        def tiny_1():
+            calls.append("tiny_1")
+
+        def tiny_2():
+            calls.append("tiny_2")
+
+        def broken():
+            raise RuntimeError("broken")
+
+        def after_broken():
+            calls.append("after_broken")
+
+        registry.register(setup)
+        registry.register(uses_setup, depends_on=[setup])
+        registry.register(tiny_1)
+        registry.register(tiny_2)
+        registry.register(broken)
+        registry.register(after_broken, depends_on=[broken])
+        plan = TestPlan.create_from_registry(registry)
+        return plan, calls
+
+    def test_cases_with_dependents_are_dispatched_alone(self):
+        from proboscis.parallel import CaseScheduler
+        plan, calls = self.make_plan()
+        scheduler = CaseScheduler(plan.tests)
+        while scheduler.has_ready:
+            batch = scheduler.next_batch(10)
+            names = [plan.tests[i].entry.home.__name__ for i in batch]
+            if "setup" in names or "broken" in names:
+                assert_equal(1, len(batch))
+            for index in batch:
+                scheduler.complete((index, "pass"))
+        assert_true(scheduler.finished)
+
+    def test_leaves_are_batched(self):
+        from proboscis.parallel import CaseScheduler
+        plan, calls = self.make_plan()
+        scheduler = CaseScheduler(plan.tests)
+        sizes = []
+        while scheduler.has_ready:
+            batch = scheduler.next_batch(10)
+            sizes.append(len(batch))
+            for index in batch:
+                scheduler.complete((index, "pass"))
+        assert_true(max(sizes) > 1, "Expected a batch of leaves: %s" % sizes)
+        assert_equal(len(plan.tests), sum(sizes))
+
+    def test_runner_skips_dependents_of_failures(self):
+        from proboscis.parallel import BatchRunner
+        plan, calls = self.make_plan()
+        stream = StringIO()
+        runner = BatchRunner(plan.tests, stream=stream)
+        assert_equal(False, runner.run())
+        assert_true("after_broken" not in calls)
+        assert_equal(4, len(calls))
+        assert_true(calls.index("setup") < calls.index("uses_setup"))
+        assert_equal(1, len(runner.errors))
+        assert_equal(1, runner.skipped)
+        assert_true("FAILED (errors=1, skipped=1)" in stream.getvalue())
+
+    def test_observers_hear_about_dependents_skipped_without_running(self):
+        from proboscis.case import CaseObserver
+        from proboscis.parallel import BatchRunner
+        from proboscis.parallel import LocalExecutor
+        plan, calls = self.make_plan()
+        finished = []
+
+        class Recorder(CaseObserver):
+            def case_finished(self, case, outcome, duration):
+                finished.append((case.entry.home.__name__, outcome))
+
+        observers = [Recorder()]
+        executor = LocalExecutor(plan.tests, observers=observers)
+        runner = BatchRunner(plan.tests, executor, stream=StringIO(),
+                             observers=observers)
+        runner.run()
+        assert_equal(len(plan.tests), len(finished))
+        assert_true(("after_broken", "skip") in finished)
+
+
+class TestAffinityKeys(unittest.TestCase):
+
+    def test_critical_dependencies_and_class_methods_share_a_key(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.parallel import affinity_keys
+        registry = TestRegistry()
+
+        def first():
+            pass
+
+        def second():
+            pass
+
+        def loner():
+            pass
+
+        def ordered():
+            pass
+
+        registry.register(first)
+        registry.register(second, depends_on=[first])
+        registry.register(loner)
+        registry.register(ordered, runs_after=[loner])
+        plan = TestPlan.create_from_registry(registry)
+        keys = dict((case.entry.home, key) for case, key
+                    in zip(plan.tests, affinity_keys(plan.tests)))
+        assert_true(keys[first] is not None)
+        assert_equal(keys[first], keys[second])
+        assert_equal(None, keys[loner])
+        assert_equal(None, keys[ordered])
+
+    def test_group_rooted_at_the_first_case_has_a_key(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.parallel import affinity_keys
+        registry = TestRegistry()
+
+        class Example(object):
+
+            def first(self):
+                pass
+
+            def second(self):
+                pass
+
+        registry.register(Example.first)
+        registry.register(Example.second)
+        registry.register(Example)
+        plan = TestPlan.create_from_registry(registry)
+        keys = affinity_keys(plan.tests)
+        assert_equal(2, len(keys))
+        assert_true(keys[0] is not None)
+        assert_equal(keys[0], keys[1])
+
+
+class TestForkServerExecutor(unittest.TestCase):
+
+    def test_groups_share_a_process_and_others_are_isolated(self):
+        import os
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.parallel import BatchRunner
+        from proboscis.parallel import ForkServerExecutor
+        if not ForkServerExecutor.is_supported():
+            return
+        registry = TestRegistry()
+        pids = {}
+
+        def creator():
+            pids["creator"] = os.getpid()
+
+        def user():
+            assert_equal(pids["creator"], os.getpid())
+
+        def elsewhere():
+            assert_equal({}, pids)  # State from other groups isn't seen.
+
+        registry.register(creator)
+        registry.register(user, depends_on=[creator])
+        registry.register(elsewhere, runs_after=[user])
+        plan = TestPlan.create_from_registry(registry)
+        executor = ForkServerExecutor(plan.tests, workers=2)
+        runner = BatchRunner(plan.tests, executor, stream=StringIO())
+        assert_true(runner.run(), runner.stream.getvalue())
+        assert_equal({}, pids)  # Tests ran in forked processes only.
+        assert_equal(3, runner.tests_run)
+
+    def test_results_of_batches_sent_together_all_arrive(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        from proboscis.parallel import ForkServerExecutor
+        if not ForkServerExecutor.is_supported():
+            return
+        registry = TestRegistry()
+
+        def first():
+            pass
+
+        def second():
+            pass
+
+        registry.register(first)
+        registry.register(second, depends_on=[first])
+        plan = TestPlan.create_from_registry(registry)
+        executor = ForkServerExecutor(plan.tests, workers=2)
+        try:
+            executor.submit([0])
+            executor.submit([1])  # Queued for the same worker.
+            results = []
+            while len(results) < 2:
+                for batch in executor.collect():
+                    results += [result[0] for result in batch]
+        finally:
+            executor.close()
+        assert_equal([0, 1], results)
+
+
+class TestRelaxedScheduling(unittest.TestCase):
+
+    def make_plan(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+
+        def first():
+            pass
+
+        def second():
+            pass
+
+        def needs_first():
+            pass
+
+        registry.register(first)
+        registry.register(second, runs_after=[first])
+        registry.register(needs_first, depends_on=[first])
+        return TestPlan.create_from_registry(registry)
+
+    def names(self, plan, batch):
+        return [plan.tests[index].entry.home.__name__ for index in batch]
+
+    def test_soft_edges_are_barriers_by_default(self):
+        from proboscis.parallel import CaseScheduler
+        plan = self.make_plan()
+        scheduler = CaseScheduler(plan.tests)
+        assert_equal(["first"], self.names(plan, scheduler.next_batch(10)))
+        assert_equal(False, scheduler.has_ready)
+
+    def test_hints_ignore_soft_edges(self):
+        from proboscis.parallel import CaseScheduler
+        from proboscis.parallel import RELAX_HINTS
+        plan = self.make_plan()
+        scheduler = CaseScheduler(plan.tests, relax=RELAX_HINTS)
+        assert_equal(["first"], self.names(plan, scheduler.next_batch(10)))
+        assert_equal(["second"], self.names(plan, scheduler.next_batch(10)))
+        assert_equal(False, scheduler.has_ready)  # needs_first is critical.
+
+    def test_idle_releases_soft_edges_only_when_nothing_is_ready(self):
+        from proboscis.parallel import CaseScheduler
+        from proboscis.parallel import RELAX_IDLE
+        plan = self.make_plan()
+        scheduler = CaseScheduler(plan.tests, relax=RELAX_IDLE)
+        first = scheduler.next_batch(10)
+        assert_true(scheduler.has_ready)
+        assert_equal(["second"], self.names(plan, scheduler.next_batch(10)))
+        for index in first:
+            scheduler.complete((index, "pass"))
+        assert_equal(["needs_first"],
+                     self.names(plan, scheduler.next_batch(10)))
+
+    def test_unknown_mode_is_rejected(self):
+        from proboscis.parallel import CaseScheduler
+        from proboscis.asserts import assert_raises
+        plan = self.make_plan()
+        assert_raises(ValueError, CaseScheduler, plan.tests, None, "never")
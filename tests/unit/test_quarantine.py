@@ -0,0 +1,111 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests moving flaky tests into the quarantine lane."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestQuarantine(unittest.TestCase):
+
+    def setUp(self):
+        self.old_state_dir = os.environ.get("PROBOSCIS_STATE_DIR")
+        self.directory = tempfile.mkdtemp()
+        os.environ["PROBOSCIS_STATE_DIR"] = self.directory
+
+    def tearDown(self):
+        if self.old_state_dir is None:
+            del os.environ["PROBOSCIS_STATE_DIR"]
+        else:
+            os.environ["PROBOSCIS_STATE_DIR"] = self.old_state_dir
+        shutil.rmtree(self.directory)
+
+    def make_plan(self):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+
+        def setup():
+            pass
+
+        def flaky():
+            raise RuntimeError("Flaky!")
+
+        def after_flaky():
+            pass
+
+        def after_setup():
+            pass
+
+        registry.register(setup)
+        registry.register(flaky, depends_on=[setup])
+        registry.register(after_flaky, depends_on=[flaky])
+        registry.register(after_setup, depends_on=[setup])
+        plan = TestPlan.create_from_registry(registry)
+        return plan, dict((case.entry.home.__name__, case)
+                          for case in plan.tests)
+
+    def names(self, cases):
+        return [case.entry.home.__name__ for case in cases]
+
+    def test_flaky_cases_and_dependents_move_to_the_lane(self):
+        from proboscis.quarantine import split_plan
+        plan, cases = self.make_plan()
+        lane = split_plan(plan, [cases["flaky"]])
+        assert_equal(["setup", "after_setup"], self.names(plan.tests))
+        assert_equal(["setup", "flaky", "after_flaky"], self.names(lane))
+
+    def test_lane_failures_are_reported_but_not_gating(self):
+        from proboscis.parallel import BatchRunner
+        from proboscis.quarantine import QuarantineLane
+        from proboscis.quarantine import split_plan
+        plan, cases = self.make_plan()
+        stream = StringIO()
+        lane = QuarantineLane(split_plan(plan, [cases["flaky"]]),
+                              stream=stream)
+        assert_true(BatchRunner(plan.tests, stream=StringIO()).run())
+        lane.start()
+        lane.wait()
+        assert_equal(False, lane.passed)
+        output = stream.getvalue()
+        assert_true("3 tests in the quarantine lane (not gating)" in output,
+                    output)
+        assert_true("FAILED (errors=1, skipped=1)" in output, output)
+
+    def test_lane_records_only_the_quarantined_cases(self):
+        from proboscis.history import ResultHistory
+        from proboscis.quarantine import QuarantineLane
+        from proboscis.quarantine import split_plan
+        plan, cases = self.make_plan()
+        cases = split_plan(plan, [cases["flaky"]])
+        lane = QuarantineLane(cases, stream=StringIO(),
+                              recorded=[case for case in cases
+                                        if case not in plan.tests])
+        lane.start()
+        lane.wait()
+        recorded = ResultHistory().cases
+        assert_equal(["after_flaky", "flaky"],
+                     sorted(identity.split(".")[-1] for identity in recorded))
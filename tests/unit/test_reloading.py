@@ -0,0 +1,171 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests the module tracking used by the daemon."""
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+from proboscis.asserts import assert_equal
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def make_module(name, **values):
+    module = types.ModuleType(name)
+    for key, value in values.items():
+        setattr(module, key, value)
+    return module
+
+
+class TestImportGraph(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.reloading import ImportGraph
+        self.base = make_module("base")
+
+        def helper():
+            pass
+        helper.__module__ = "base"
+        self.uses_module = make_module("uses_module", base=self.base)
+        self.uses_function = make_module("uses_function", helper=helper)
+        self.unrelated = make_module("unrelated", types=types)
+        self.graph = ImportGraph({"base": self.base,
+                                  "uses_module": self.uses_module,
+                                  "uses_function": self.uses_function,
+                                  "unrelated": self.unrelated})
+
+    def test_module_and_function_references_count_as_imports(self):
+        assert_equal(set(["base"]), self.graph.imports["uses_module"])
+        assert_equal(set(["base"]), self.graph.imports["uses_function"])
+        assert_equal(set(), self.graph.imports["unrelated"])
+
+    def test_importers_of(self):
+        assert_equal(set(["base", "uses_module", "uses_function"]),
+                     self.graph.importers_of(["base"]))
+
+    def test_import_order_puts_dependencies_first(self):
+        order = self.graph.in_import_order(["uses_module", "base"])
+        assert_equal(["base", "uses_module"], order)
+
+
+class TestRemoveModule(unittest.TestCase):
+
+    def test_forgets_tests_and_factories_from_module(self):
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+
+        def kept():
+            pass
+
+        def removed():
+            pass
+        removed.__module__ = "going_away"
+
+        def factory():
+            return []
+        factory.__module__ = "going_away"
+
+        registry.register(kept, groups=["g"])
+        registry.register(removed, groups=["g"])
+        registry.register_factory(factory)
+        registry.remove_module("going_away")
+        assert_equal([kept], [entry.home for entry in registry.tests])
+        assert_equal([kept],
+                     [entry.home for entry in registry.groups["g"].entries])
+        assert_equal([kept], list(registry.classes.keys()))
+        assert_equal([], registry.factories)
+
+
+class FakeReloader(object):
+
+    def __init__(self, changed, reloaded):
+        self._changed = changed
+        self._reloaded = reloaded
+
+    def changed(self):
+        return self._changed
+
+    def reload(self, names):
+        return self._reloaded
+
+
+class TestWatcher(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis import TestRegistry
+        from proboscis.watch import Watcher
+        self.registry = TestRegistry()
+
+        def in_a():
+            pass
+        in_a.__module__ = "a"
+
+        def in_b():
+            pass
+        in_b.__module__ = "b"
+        self.in_a, self.in_b = in_a, in_b
+        self.registry.register(in_a)
+        self.registry.register(in_b)
+        self.watcher = Watcher(self.registry, ["run_tests.py"])
+        self.runs = []
+        self.run = self.watcher.run
+        self.watcher.run = self.runs.append
+        self.old_stdout = sys.stdout
+        sys.stdout = StringIO()  # poll says what changed.
+
+    def tearDown(self):
+        sys.stdout = self.old_stdout
+
+    def test_homes_in_modules(self):
+        assert_equal([self.in_b], self.watcher.homes_in_modules(set(["b"])))
+
+    def test_poll_runs_tests_in_modules_using_the_change(self):
+        self.watcher.reloader = FakeReloader(set(["a"]), set(["a", "b"]))
+        self.watcher.poll()
+        assert_equal([[self.in_a, self.in_b]], self.runs)
+
+    def test_poll_does_nothing_without_changes(self):
+        self.watcher.reloader = FakeReloader(set(), set())
+        self.watcher.poll()
+        assert_equal([], self.runs)
+
+    def test_run_without_fork_returns_the_exit_status(self):
+        def failing():
+            raise AssertionError("fails")
+        self.registry.register(failing)
+        old_state_dir = os.environ.get("PROBOSCIS_STATE_DIR")
+        directory = tempfile.mkdtemp()
+        os.environ["PROBOSCIS_STATE_DIR"] = directory
+        fork = getattr(os, 'fork', None)
+        if fork is not None:
+            del os.fork
+        try:
+            assert_equal(1, self.run([failing]))
+        finally:
+            if fork is not None:
+                os.fork = fork
+            if old_state_dir is None:
+                del os.environ["PROBOSCIS_STATE_DIR"]
+            else:
+                os.environ["PROBOSCIS_STATE_DIR"] = old_state_dir
+            shutil.rmtree(directory)
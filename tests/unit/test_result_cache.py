@@ -0,0 +1,145 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Tests skipping cacheable tests which already passed."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_false
+from proboscis.asserts import assert_not_equal
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestProjectModules(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        for name, source in (("cache_first", "import cache_second\n"),
+                             ("cache_second", "from os import path\n")):
+            output = open(os.path.join(self.root, name + ".py"), 'w')
+            output.write(source)
+            output.close()
+        sys.path.insert(0, self.root)
+
+    def tearDown(self):
+        sys.path.remove(self.root)
+        for name in ("cache_first", "cache_second"):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.root)
+
+    def test_follows_imports_within_the_root(self):
+        from proboscis.result_cache import project_modules
+        import cache_first
+        assert_equal(set([os.path.join(self.root, "cache_first.py"),
+                          os.path.join(self.root, "cache_second.py")]),
+                     project_modules([cache_first], self.root))
+
+
+class Unpicklable(object):
+
+    def __reduce__(self):
+        raise TypeError("Can't pickle this.")
+
+    def __str__(self):
+        return "unpicklable"
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.result_cache import active_cache
+        self.old_cache = active_cache()
+        self.directory = tempfile.mkdtemp()
+        self.calls = []
+
+    def tearDown(self):
+        from proboscis.result_cache import activate
+        activate(self.old_cache)
+        shutil.rmtree(self.directory)
+
+    def make_registry(self, inputs=None, fail=False, value=42):
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        calls = self.calls
+
+        def compute():
+            calls.append("compute")
+            assert_false(fail)
+            return value
+
+        def use(compute):
+            calls.append("use %s" % compute)
+
+        registry.register(compute, cacheable=True, inputs=inputs)
+        registry.register(use, depends_on=[compute])
+        return registry
+
+    def run_plan(self, registry):
+        from proboscis import TestPlan
+        from proboscis.parallel import BatchRunner
+        from proboscis.result_cache import activate
+        from proboscis.result_cache import ResultCache
+        plan = TestPlan.create_from_registry(registry)
+        cache = ResultCache(plan.tests, self.directory)
+        activate(cache)
+        BatchRunner(plan.tests, stream=StringIO()).run()
+        return cache, plan
+
+    def test_passes_are_replayed_with_their_value(self):
+        self.run_plan(self.make_registry())
+        self.run_plan(self.make_registry())
+        assert_equal(["compute", "use 42", "use 42"], self.calls)
+
+    def test_failures_are_not_cached(self):
+        self.run_plan(self.make_registry(fail=True))
+        self.run_plan(self.make_registry(fail=True))
+        assert_equal(["compute", "compute"], self.calls)
+
+    def test_passes_returning_values_which_cannot_be_pickled_run_again(self):
+        value = Unpicklable()
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.run_plan(self.make_registry(value=value))
+            self.run_plan(self.make_registry(value=value))
+        finally:
+            sys.stderr = stderr
+        assert_equal(["compute", "use unpicklable"] * 2, self.calls)
+
+    def test_inputs_are_part_of_the_key(self):
+        first, plan = self.run_plan(self.make_registry(inputs="v1"))
+        second, plan_2 = self.run_plan(self.make_registry(inputs="v2"))
+        assert_not_equal(first.key(plan.tests[0]),
+                         second.key(plan_2.tests[0]))
+        assert_equal(["compute", "use 42", "compute", "use 42"],
+                     self.calls)
+
+    def test_key_covers_the_test_module(self):
+        from proboscis import result_cache
+        cache, plan = self.run_plan(self.make_registry())
+        paths = result_cache.project_modules(
+            [sys.modules[plan.tests[0].entry.home.__module__]], cache.root)
+        assert_true(os.path.abspath(__file__).rstrip("c") in paths)
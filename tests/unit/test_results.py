@@ -0,0 +1,150 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Tests passing the values tests return to their dependents."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_false
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.results import ResultStore
+        self.directory = tempfile.mkdtemp()
+        self.store = ResultStore(self.directory, spill_bytes=100)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_small_values_stay_in_memory(self):
+        self.store.put("case", [1, 2])
+        assert_equal([1, 2], self.store.get("case"))
+        assert_equal([], os.listdir(self.directory))
+
+    def test_large_values_spill_to_disk(self):
+        self.store.put("case", "x" * 1000)
+        assert_equal(1, len(os.listdir(self.directory)))
+        assert_equal("x" * 1000, self.store.get("case"))
+        self.store.clear()
+        assert_false("case" in self.store)
+        assert_equal([], os.listdir(self.directory))
+
+    def test_values_are_sent_to_other_stores(self):
+        from proboscis.results import ResultStore
+        self.store.put("small", 5)
+        self.store.put("large", "x" * 1000)
+        self.store.put("unpicklable", lambda: None)
+        other = ResultStore()
+        other.merge(self.store.take_new())
+        assert_equal(5, other.get("small"))
+        assert_equal("x" * 1000, other.get("large"))
+        assert_false("unpicklable" in other)
+        assert_equal({}, self.store.take_new())
+
+
+class TestPassingResults(unittest.TestCase):
+
+    def setUp(self):
+        from proboscis.results import active_store
+        from proboscis.results import activate
+        from proboscis.results import ResultStore
+        self.old_store = active_store()
+        self.store = ResultStore()
+        activate(self.store)
+
+    def tearDown(self):
+        from proboscis.results import activate
+        self.store.clear()
+        activate(self.old_store)
+
+    def run_plan(self, registry, workers=1):
+        from proboscis import TestPlan
+        from proboscis.parallel import BatchRunner
+        from proboscis.parallel import ForkServerExecutor
+        plan = TestPlan.create_from_registry(registry)
+        executor = None
+        if workers > 1:
+            executor = ForkServerExecutor(plan.tests, workers)
+        runner = BatchRunner(plan.tests, executor, stream=StringIO())
+        assert_true(runner.run(), runner.stream.getvalue())
+        return plan
+
+    def test_functions_receive_values_by_name(self):
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        seen = []
+
+        def create_user():
+            return {"name": "bob"}
+
+        def check_user(create_user):
+            seen.append(create_user)
+
+        registry.register(create_user)
+        registry.register(check_user, depends_on=[create_user])
+        self.run_plan(registry)
+        assert_equal([{"name": "bob"}], seen)
+
+    def test_methods_receive_values_from_the_same_instance(self):
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        seen = []
+
+        class Users(object):
+            def __init__(self):
+                self.name = "user%d" % len(seen)
+
+            def create(self):
+                return self.name
+
+            def check(self, create):
+                seen.append((self.name, create))
+
+        registry.register(Users.create)
+        registry.register(Users.check, depends_on=[Users.create])
+        registry.register(Users)
+        self.run_plan(registry)
+        assert_equal([("user0", "user0")], seen)
+
+    def test_values_come_back_from_workers(self):
+        from proboscis import TestRegistry
+        from proboscis.parallel import ForkServerExecutor
+        if not ForkServerExecutor.is_supported():
+            return
+        registry = TestRegistry()
+
+        def create_user():
+            return "bob"
+
+        def check_user(create_user):
+            assert_equal("bob", create_user)
+
+        registry.register(create_user)
+        registry.register(check_user, depends_on=[create_user])
+        plan = self.run_plan(registry, workers=2)
+        assert_equal("bob", self.store.get(plan.tests[0].identity))
@@ -0,0 +1,121 @@
+# Copyright (c) 2011 Rackspace
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests retrying flaky tests."""
+
+import unittest
+
+from proboscis.asserts import assert_equal
+from proboscis.asserts import assert_true
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class Transient(Exception):
+    pass
+
+
+def flaky(calls, name, failures, exception=Transient):
+    """Returns a test which raises exception the first few times it runs."""
+    def test():
+        calls.append(name)
+        if calls.count(name) <= failures:
+            raise exception("%s failed" % name)
+    test.__name__ = name
+    return test
+
+
+class RetryTest(unittest.TestCase):
+
+    def make_plan(self, failures, exception=Transient, retries=2,
+                  backoff=None):
+        from proboscis import TestPlan
+        from proboscis import TestRegistry
+        registry = TestRegistry()
+        self.calls = []
+        service = flaky(self.calls, "service", failures, exception)
+        registry.register(service, retries=retries, retry_on=Transient,
+                          backoff=backoff)
+        registry.register(flaky(self.calls, "client", 0),
+                          depends_on=[service])
+        registry.register(flaky(self.calls, "unrelated", 0))
+        return TestPlan.create_from_registry(registry)
+
+
+class TestRetryDelay(unittest.TestCase):
+
+    def test_backoff_doubles(self):
+        from proboscis.core import TestEntryInfo
+        info = TestEntryInfo(backoff=0.5)
+        assert_equal([0.5, 1.0, 2.0],
+                     [info.retry_delay(attempt) for attempt in range(3)])
+
+    def test_backoff_may_be_a_function(self):
+        from proboscis.core import TestEntryInfo
+        info = TestEntryInfo(backoff=lambda attempt: attempt + 10)
+        assert_equal(11, info.retry_delay(1))
+
+
+class TestRetriesInUnittest(RetryTest):
+
+    def run_plan(self, plan):
+        from proboscis.case import TestResult
+        suite = unittest.TestSuite(plan.create_test_suite(None,
+                                                          unittest.TestLoader()))
+        result = TestResult(StringIO(), True, 0)
+        suite.run(result)
+        return result
+
+    def test_dependents_run_once_retries_succeed(self):
+        result = self.run_plan(self.make_plan(failures=2))
+        assert_true(result.wasSuccessful())
+        assert_equal(3, self.calls.count("service"))
+        assert_true("client" in self.calls)
+
+    def test_dependents_are_skipped_once_retries_run_out(self):
+        result = self.run_plan(self.make_plan(failures=3))
+        assert_equal(1, len(result.errors))
+        assert_equal(1, len(result.skipped))
+        assert_true("client" not in self.calls)
+
+    def test_other_exceptions_are_not_retried(self):
+        self.run_plan(self.make_plan(failures=1, exception=ValueError))
+        assert_equal(1, self.calls.count("service"))
+
+
+class TestRetriesInBatches(RetryTest):
+
+    def test_retries_wait_without_blocking_other_work(self):
+        from proboscis.parallel import BatchRunner
+        plan = self.make_plan(failures=1, backoff=0.2)
+        stream = StringIO()
+        runner = BatchRunner(plan.tests, stream=stream)
+        assert_true(runner.run(), stream.getvalue())
+        assert_equal(["service", "unrelated", "service", "client"],
+                     self.calls)
+        assert_equal(3, runner.tests_run)
+        assert_true("retrying (attempt 1 failed)" in stream.getvalue())
+
+    def test_dependents_are_skipped_once_retries_run_out(self):
+        from proboscis.parallel import BatchRunner
+        plan = self.make_plan(failures=3, retries=1)
+        runner = BatchRunner(plan.tests, stream=StringIO())
+        assert_equal(False, runner.run())
+        assert_equal(2, self.calls.count("service"))
+        assert_true("client" not in self.calls)
+        assert_equal(1, runner.skipped)